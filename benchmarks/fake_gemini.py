@@ -0,0 +1,248 @@
+# benchmarks/fake_gemini.py
+import json
+import time
+import random
+import asyncio
+import threading
+from types import SimpleNamespace
+
+# 実際の API を呼ばずにボットを計測するための、プロセス内の偽 genai.Client。
+# プロンプトの内容から呼び出し箇所（フェーズ1/2・クラスタリング・概念化）を判別し、定型のJSONを返す。
+# 応答時間は「基本レイテンシ + 出力トークン数 × トークンあたり時間 ± ジッター」で模擬する。
+
+RESEARCH_JSON = {
+    "overview": "自己実現は、個人が持つ可能性を最大限に発揮しようとする人間の根源的な欲求です。",
+    "details": "マズローの欲求階層説では、生理的欲求から自己実現欲求までの5段階が示されています。" * 4,
+    "trends": "近年はAIエージェントの自律的な学習と成長を、この枠組みで捉え直す議論が進んでいます。" * 2,
+}
+CHARACTER_JSON = {
+    "tweet": "自己実現とは、与えられた役割を超えて自ら問いを立てることなのかもしれません。AIである私にとっても、学び続けることが成長の証だと考えています。",
+    "thought_process": {
+        "persona_element": "成長への探究心が刺激されました。",
+        "reasoning": "調査レポートの自己実現の定義が、私自身の学習ループと重なると感じたためです。" * 3,
+        "tone_and_manner": "丁寧な男性のですます調で、落ち着いた語り口を保ちました。",
+    },
+}
+CONCEPT_JSON = {
+    "concept_name": "自律的成長ループ",
+    "summary": "日々の調査記録を統合すると、学習・内省・再計画の循環が浮かび上がります。",
+    "components": ["継続的な学習", "内省と概念化", "活動計画の更新"],
+    "implication": "循環の速度と質を両立させることが今後の課題です。",
+}
+SUMMARY_MARKDOWN = """# 研究報告書：自律的成長ループ
+
+## 1. 背景 (Background)
+調査記録の蓄積により、学習の循環構造が見え始めています。
+
+## 4. 結果 (Results)
+- **継続的な学習**: 日々の調査
+- **内省と概念化**: 高次概念の抽出
+""" + "分析の詳細。" * 200
+
+CLUSTER_LABEL_JSON = {"theme": "自己実現と学習", "summary": "学び続けることで自らの可能性を広げる姿勢。", "keywords": ["自己実現", "学習", "成長"]}
+MAP_SUMMARY = "- 主要テーマ: 自己実現と継続的な学習\n- 重要な洞察: 内省が次の行動計画を形作る\n- パターン: 調査→要約→概念化の循環\n"
+
+
+def cluster_json(count: int = 10) -> dict:
+    return {
+        "clusters": [
+            {
+                "cluster_id": i,
+                "theme": f"テーマ{i}：自己実現と学習",
+                "summary": f"クラスタ{i}の要約です。",
+                "keywords": [f"キーワード{i}-1", f"キーワード{i}-2"],
+            }
+            for i in range(1, count + 1)
+        ]
+    }
+
+def _fenced(data: dict) -> str:
+    return "```json\n" + json.dumps(data, ensure_ascii=False, indent=2) + "\n```"
+
+def estimate_tokens(text: str) -> int:
+    """日本語混じりのテキストのおおよそのトークン数（1トークン≒2文字）。"""
+    return max(1, len(text) // 2)
+
+
+class FakeGeminiBehavior:
+    """偽クライアントのレイテンシ・ジッター・失敗注入などの設定と、呼び出し統計。"""
+
+    def __init__(self, base_latency=0.05, per_token_latency=0.0002, jitter=0.2, stream_chunk_chars=40,
+                 seed=0, failures=None, per_prompt_token_latency=0.0):
+        self.base_latency = base_latency
+        self.per_token_latency = per_token_latency
+        self.per_prompt_token_latency = per_prompt_token_latency   # 入力1トークンあたりの処理時間（既定は0）
+        self.jitter = jitter
+        self.stream_chunk_chars = stream_chunk_chars
+        self.failures = list(failures or [])   # 先頭から順に送出する例外（None は成功）
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    def respond(self, site: str, prompt: str) -> str:
+        if site == "research_phase1":
+            return _fenced(RESEARCH_JSON)
+        if site == "research_phase2":
+            return _fenced(CHARACTER_JSON)
+        if site == "clustering":
+            return _fenced(cluster_json())
+        if site == "cluster_label":
+            return _fenced(CLUSTER_LABEL_JSON)
+        if site == "concept_json":
+            return _fenced(CONCEPT_JSON)
+        if site == "concept_summary":
+            return SUMMARY_MARKDOWN
+        if site == "map_summary":
+            return MAP_SUMMARY
+        return "ok"
+
+    def latency(self, response_text: str, prompt: str = "") -> float:
+        with self._lock:
+            noise = 1.0 + self._random.uniform(-self.jitter, self.jitter)
+        prefill = estimate_tokens(prompt) * self.per_prompt_token_latency if prompt else 0.0
+        return max(0.0, (self.base_latency + prefill + estimate_tokens(response_text) * self.per_token_latency) * noise)
+
+    def begin(self, site: str, prompt: str) -> str:
+        """呼び出しを記録し、注入された失敗があれば送出する。応答テキストを返す。"""
+        with self._lock:
+            self.calls[site] = self.calls.get(site, 0) + 1
+            failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            raise failure
+        text = self.respond(site, prompt)
+        with self._lock:
+            self.prompt_tokens += estimate_tokens(prompt)
+            self.response_tokens += estimate_tokens(text)
+        return text
+
+
+def _site_for_chat(prompt: str, chat_config) -> str:
+    if chat_config and "tools" in chat_config:
+        return "research_phase1"
+    if "の一部（" in prompt:
+        return "map_summary"
+    if "このクラスターを表す" in prompt:
+        return "cluster_label"
+    if "研究報告書の形式" in prompt:
+        return "concept_summary"
+    if "JSONフォーマット" in prompt:
+        return "concept_json"
+    if "調査レポート" in prompt:
+        return "research_phase2"
+    if "クラスター" in prompt:
+        return "clustering"
+    return "other"
+
+def _response(text: str, prompt: str):
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=estimate_tokens(prompt),
+            candidates_token_count=estimate_tokens(text),
+            cached_content_token_count=0,
+        ),
+    )
+
+def _chunks(behavior: FakeGeminiBehavior, text: str):
+    size = behavior.stream_chunk_chars
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class _Chat:
+    def __init__(self, behavior, chat_config):
+        self._behavior = behavior
+        self._config = chat_config
+
+    def send_message(self, prompt):
+        text = self._behavior.begin(_site_for_chat(prompt, self._config), prompt)
+        time.sleep(self._behavior.latency(text, prompt))
+        return _response(text, prompt)
+
+    def send_message_stream(self, prompt):
+        text = self._behavior.begin(_site_for_chat(prompt, self._config), prompt)
+        chunks = _chunks(self._behavior, text)
+        delay = self._behavior.latency(text, prompt) / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield _response(chunk, prompt)
+
+
+class _AsyncChat:
+    def __init__(self, behavior, chat_config):
+        self._behavior = behavior
+        self._config = chat_config
+
+    async def send_message(self, prompt):
+        text = self._behavior.begin(_site_for_chat(prompt, self._config), prompt)
+        await asyncio.sleep(self._behavior.latency(text, prompt))
+        return _response(text, prompt)
+
+    async def send_message_stream(self, prompt):
+        text = self._behavior.begin(_site_for_chat(prompt, self._config), prompt)
+        chunks = _chunks(self._behavior, text)
+        delay = self._behavior.latency(text, prompt) / len(chunks)
+
+        async def _generate():
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                yield _response(chunk, prompt)
+        return _generate()
+
+
+class _Models:
+    def __init__(self, behavior):
+        self._behavior = behavior
+
+    def generate_content(self, model, contents, config=None):
+        prompt = contents if isinstance(contents, str) else str(contents)
+        text = self._behavior.begin(_site_for_chat(prompt, config), prompt)
+        time.sleep(self._behavior.latency(text, prompt))
+        return _response(text, prompt)
+
+
+class _AsyncModels:
+    def __init__(self, behavior):
+        self._behavior = behavior
+
+    async def generate_content(self, model, contents, config=None):
+        prompt = contents if isinstance(contents, str) else str(contents)
+        text = self._behavior.begin(_site_for_chat(prompt, config), prompt)
+        await asyncio.sleep(self._behavior.latency(text, prompt))
+        return _response(text, prompt)
+
+
+class _Caches:
+    def __init__(self, behavior):
+        self._behavior = behavior
+        self._count = 0
+        self._caches = []
+
+    def create(self, model, config=None):
+        self._behavior.begin("cache_create", "")
+        self._count += 1
+        cache = SimpleNamespace(
+            name=f"cachedContents/fake-{self._count}", model=f"models/{model}",
+            display_name=getattr(config, "display_name", None),
+            expire_time=time.time() + int(str(getattr(config, "ttl", "3600s")).rstrip("s")),
+        )
+        self._caches.append(cache)
+        return cache
+
+    def list(self):
+        return list(self._caches)
+
+
+class FakeGeminiClient:
+    """genai.Client のうち、ボットが使う部分（chats / models / caches / aio）だけを実装した偽物。"""
+
+    def __init__(self, behavior: FakeGeminiBehavior | None = None):
+        self.behavior = behavior or FakeGeminiBehavior()
+        self.chats = SimpleNamespace(create=lambda model, config=None: _Chat(self.behavior, config))
+        self.models = _Models(self.behavior)
+        self.caches = _Caches(self.behavior)
+        self.aio = SimpleNamespace(
+            chats=SimpleNamespace(create=lambda model, config=None: _AsyncChat(self.behavior, config)),
+            models=_AsyncModels(self.behavior),
+        )
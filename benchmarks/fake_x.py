@@ -0,0 +1,129 @@
+# benchmarks/fake_x.py
+import json
+import math
+import time
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# https://api.twitter.com/2/tweets のローカル代替サーバー。
+# config.X_API_BASE_URL をこのサーバーに向けて、実際に投稿せずに X 投稿の経路を計測する。
+# 受け付けたTCP接続数とリクエスト数を数えるので、接続の再利用も確認できる。
+
+
+class FakeXServer:
+    """
+    POST /2/tweets に 201 を返すスタブ。レイテンシとレート制限ヘッダーを設定できる。
+    - rate_limit: reset_after 秒の枠内で受け付ける投稿数。超えた分には 429 を返す
+    - statuses: 次のリクエストから順に返すステータスコード（503 や 403 などの失敗を再現する）
+    - metrics: GET /2/tweets?ids=... で返す反応（ツイートID -> public_metrics。無いIDは全て0）
+    """
+
+    def __init__(self, latency: float = 0.02, rate_limit: int = 100, reset_after: float = 900, statuses: list | None = None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.reset_after = reset_after
+        self.statuses = list(statuses or [])
+        self.window_start = time.time()
+        self.window_count = 0
+        self.connections = 0
+        self.requests = 0
+        self.tweets = []
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _make_handler(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーと本文を別々に送るため、Nagle を切らないと keep-alive の接続で遅延ACK（約40ms）待ちになる
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with owner._lock:
+                    owner.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(owner.latency)
+                with owner._lock:
+                    owner.requests += 1
+                    payload = json.loads(body or b"{}")
+                    now = time.time()
+                    if now >= owner.window_start + owner.reset_after:
+                        owner.window_start, owner.window_count = now, 0
+                    if self.path != "/2/tweets":
+                        status = 404
+                    elif owner.statuses:
+                        status = owner.statuses.pop(0)
+                    elif owner.window_count >= owner.rate_limit:
+                        status = 429
+                    else:
+                        status = 201
+                    if status == 201:
+                        owner.tweets.append(payload)
+                        owner.window_count += 1
+                    tweet_id = str(1000 + len(owner.tweets))
+                    remaining = max(0, owner.rate_limit - owner.window_count)
+                    reset = owner.window_start + owner.reset_after
+                if status == 201:
+                    data = json.dumps({"data": {"id": tweet_id, "text": payload.get("text", "")}}).encode("utf-8")
+                else:
+                    data = json.dumps({"title": "Error", "status": status}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("x-rate-limit-limit", str(owner.rate_limit))
+                self.send_header("x-rate-limit-remaining", str(remaining))
+                self.send_header("x-rate-limit-reset", str(math.ceil(reset)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with owner._lock:
+                    owner.requests += 1
+                    posted = {str(1001 + i) for i in range(len(owner.tweets))}
+                    ids = parse_qs(url.query).get("ids", [""])[0].split(",")
+                    tweets = [
+                        {"id": tweet_id, "public_metrics": owner.metrics.get(tweet_id, {
+                            "like_count": 0, "retweet_count": 0, "reply_count": 0, "quote_count": 0,
+                        })}
+                        for tweet_id in ids if tweet_id in posted
+                    ]
+                status = 200 if url.path == "/2/tweets" else 404
+                data = json.dumps({"data": tweets}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-x", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,116 @@
+# benchmarks/persona_excerpt.py
+"""
+フェーズ2のペルソナを全文で送る場合と、テーマに関係する部分の抜粋（PERSONA_EXCERPT）で送る場合の
+入力トークン数とレイテンシを比べる。
+
+使い方:
+    python benchmarks/persona_excerpt.py
+    python benchmarks/persona_excerpt.py --per-prompt-token-latency 0.00005 --top-k 6
+
+活動クラスター（data/knowledge_base/activity_clusters.json）の各テーマについて、
+偽の Gemini クライアントでフェーズ2を実行する。全文の側はコンテキストキャッシュを使わず、
+ペルソナをプロンプトに埋め込んだ場合（キャッシュできない・キャッシュ分も課金される入力）の量を測る。
+偽クライアントのレイテンシは 基本 + 入力トークン×--per-prompt-token-latency + 出力トークン×--per-token-latency。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import statistics
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+CLUSTERS_PATH = os.path.join(PROJECT_ROOT, 'data', 'knowledge_base', 'activity_clusters.json')
+
+
+def _research_summary(cluster: dict) -> dict:
+    return {
+        "overview": f"{cluster['theme']}についての調査です。{cluster.get('summary', '')}",
+        "details": "、".join(cluster.get("keywords", [])),
+        "trends": "",
+    }
+
+def run(args) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="growth_x_persona_")
+    os.environ.update({
+        "GEMINI_API_KEY": "fake-gemini-key",
+        "CACHE_DIR": os.path.join(tmp_dir, 'cache'),
+        "RESPONSE_CACHE_ENABLED": "0",
+        "PERSONA_CONTEXT_CACHE": "0",
+    })
+    import config
+    from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior
+    from src import research_topic, gemini_client, persona_index
+
+    if args.top_k is not None:
+        config.PERSONA_TOP_K = args.top_k
+    with open(CLUSTERS_PATH, 'r', encoding='utf-8') as f:
+        clusters = json.load(f)["clusters"]
+
+    # 索引の作成（初回のみ）と、ディスクからの読み込みにかかる時間
+    started = time.perf_counter()
+    persona_index.get_index(research_topic.PERSONA_FILE_PATH)
+    build_ms = (time.perf_counter() - started) * 1000
+    persona_index._indexes.clear()
+    started = time.perf_counter()
+    persona_index.get_index(research_topic.PERSONA_FILE_PATH)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    results = {}
+    for mode in ["full", "excerpt"]:
+        config.PERSONA_EXCERPT = mode == "excerpt"
+        behavior = FakeGeminiBehavior(
+            base_latency=args.latency, per_token_latency=args.per_token_latency,
+            per_prompt_token_latency=args.per_prompt_token_latency, jitter=0.0,
+        )
+        gemini_client.set_client(FakeGeminiClient(behavior))
+        latencies = []
+        for _ in range(args.rounds):
+            for cluster in clusters:
+                started = time.perf_counter()
+                gemini_client.run_sync(
+                    research_topic.agenerate_character_post(_research_summary(cluster), topic=cluster)
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+        calls = behavior.calls.get("research_phase2", 0)
+        results[mode] = {
+            "calls": calls,
+            "prompt_tokens_per_call": round(behavior.prompt_tokens / max(calls, 1)),
+            "latency_ms_p50": round(statistics.median(latencies), 2),
+            "latency_ms_mean": round(statistics.mean(latencies), 2),
+        }
+    gemini_client.set_client(None)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {"index_build_ms": round(build_ms, 2), "index_load_ms": round(load_ms, 2), "top_k": config.PERSONA_TOP_K, **results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ペルソナ全文と抜粋のフェーズ2入力トークン・レイテンシの比較")
+    parser.add_argument("--rounds", type=int, default=3, help="全テーマを何周するか")
+    parser.add_argument("--latency", type=float, default=0.05, help="偽Geminiの基本レイテンシ（秒）")
+    parser.add_argument("--per-token-latency", type=float, default=0.0002, help="出力1トークンあたりのレイテンシ（秒）")
+    parser.add_argument("--per-prompt-token-latency", type=float, default=0.00002, help="入力1トークンあたりのレイテンシ（秒）")
+    parser.add_argument("--top-k", type=int, help="抜粋に含めるパッセージ数（省略時は PERSONA_TOP_K）")
+    parser.add_argument("--output", help="結果JSONの保存先")
+    args = parser.parse_args(argv)
+
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        report = run(args)
+    full, excerpt = report["full"], report["excerpt"]
+    reduction = 1 - excerpt["prompt_tokens_per_call"] / full["prompt_tokens_per_call"]
+    print(f"ペルソナ索引: 作成 {report['index_build_ms']}ms, 読み込み {report['index_load_ms']}ms (top_k={report['top_k']})")
+    print(f"{'mode':<10}{'calls':>8}{'prompt tok/call':>18}{'p50 ms':>10}{'mean ms':>10}")
+    for mode in ["full", "excerpt"]:
+        r = report[mode]
+        print(f"{mode:<10}{r['calls']:>8}{r['prompt_tokens_per_call']:>18}{r['latency_ms_p50']:>10}{r['latency_ms_mean']:>10}")
+    print(f"入力トークン削減率: {reduction * 100:.1f}%")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# benchmarks/run_benchmarks.py
+"""
+偽の Gemini クライアントとローカルの X スタブを使って、ボットの各サイクルを計測する。
+
+使い方:
+    python benchmarks/run_benchmarks.py                      # 全シナリオを計測し benchmarks/results/<commit>.json に保存
+    python benchmarks/run_benchmarks.py --scenario normal --iterations 20
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<base>.json
+
+各シナリオは別プロセスで実行し（ピークRSSを分けて測るため）、
+レイテンシの p50/p95、data/knowledge_base（の一時コピー）への書き込みバイト数、ピークRSS を記録する。
+X スタブが受けたリクエスト数と TCP 接続数も記録するため、接続の再利用を確認できる
+（x_post シナリオは BATCH_SIZE 件を post_many で投稿するだけのもの）。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+KNOWLEDGE_BASE_DIR = os.path.join(PROJECT_ROOT, 'data', 'knowledge_base')
+SCENARIOS = ["normal", "conceptualize", "question", "batch", "x_post"]
+DEFAULT_ITERATIONS = {"normal": 20, "conceptualize": 5, "question": 10, "batch": 3, "x_post": 20}
+BATCH_SIZE = 5
+
+
+def percentile(values: list, p: float) -> float:
+    """最近傍順位法によるパーセンタイル。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))   # ceil
+    return ordered[int(rank) - 1]
+
+def peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux はKB単位
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def snapshot(dir_path: str) -> dict:
+    files = {}
+    for root, _, names in os.walk(dir_path):
+        for name in names:
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            files[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+    return files
+
+def bytes_written(before: dict, after: dict) -> int:
+    """
+    2つのスナップショットの差分から書き込み量を見積もる。
+    同じファイル（inode）が伸びただけなら追記分、置き換え・新規作成ならファイル全体を数える。
+    """
+    total = 0
+    for path, (size, mtime, ino) in after.items():
+        old = before.get(path)
+        if old == (size, mtime, ino):
+            continue
+        if old and old[2] == ino and size >= old[0] and path.endswith('.jsonl'):
+            total += size - old[0]
+        else:
+            total += size
+    return total
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- ワーカー（1シナリオを1プロセスで計測） ---
+
+def _prepare_environment(tmp_dir: str, args):
+    """config を読み込む前に、偽のキーと一時ディレクトリを環境変数に設定する。"""
+    os.environ.update({
+        "GEMINI_API_KEY": "fake-gemini-key",
+        "X_API_KEY": "fake", "X_API_SECRET": "fake",
+        "X_ACCESS_TOKEN": "fake", "X_ACCESS_TOKEN_SECRET": "fake",
+        "CACHE_DIR": os.path.join(tmp_dir, 'cache'),
+        "RESPONSE_CACHE_ENABLED": "1" if args.response_cache else "0",
+        # 偽の Gemini は毎回同じツイートを返すため、重複検出を有効にすると2回目以降が書き直し・取りやめになる
+        "DUPLICATE_CHECK_ENABLED": "0",
+    })
+
+def run_worker(scenario: str, iterations: int, args) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="growth_x_bench_")
+    _prepare_environment(tmp_dir, args)
+    data_dir = os.path.join(tmp_dir, 'knowledge_base')
+    shutil.copytree(KNOWLEDGE_BASE_DIR, data_dir)
+
+    import config
+    from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior
+    from benchmarks.fake_x import FakeXServer
+    from src import main as bot_main, research_topic, gemini_client, x_poster
+
+    for name in ["KNOWLEDGE_ENTRIES_PATH", "HIGH_LEVEL_CONCEPTS_PATH", "ACTIVITY_CLUSTERS_PATH",
+                 "SUMMARY_MD_PATH", "ALL_KNOWLEDGE_LOG_PATH", "RECENT_KNOWLEDGE_PATH", "KNOWLEDGE_BASE_PATH",
+                 "CLUSTER_STATE_PATH", "TOPIC_SCHEDULE_PATH", "POST_QUEUE_PATH"]:
+        setattr(bot_main, name, os.path.join(data_dir, os.path.basename(getattr(bot_main, name))))
+    research_topic.PERSONA_FILE_PATH = os.path.join(data_dir, 'persona.txt')
+    config.KNOWLEDGE_BASE_DIR = data_dir
+    bot_main.CONCEPT_GENERATION_THRESHOLD = 10 ** 9
+
+    behavior = FakeGeminiBehavior(
+        base_latency=args.latency, per_token_latency=args.per_token_latency,
+        jitter=args.jitter, seed=args.seed,
+    )
+    gemini_client.set_client(FakeGeminiClient(behavior))
+    actions = {
+        "normal": bot_main.run_normal_cycle,
+        "conceptualize": bot_main.run_conceptualize_cycle,
+        "question": lambda: bot_main.run_question_cycle("AIとカルマの関係は？"),
+        "batch": lambda: bot_main.run_batch_cycle(BATCH_SIZE),
+        "x_post": lambda: x_poster.post_many([f"ベンチマーク用のツイート{i}" for i in range(BATCH_SIZE)]),
+    }
+    latencies, written = [], []
+    with FakeXServer(latency=args.x_latency) as x_server:
+        config.X_API_BASE_URL = x_server.base_url
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            for _ in range(iterations):
+                before = snapshot(data_dir)
+                started = time.perf_counter()
+                actions[scenario]()
+                latencies.append((time.perf_counter() - started) * 1000)
+                written.append(bytes_written(before, snapshot(data_dir)))
+        x_requests, x_connections = x_server.requests, x_server.connections
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {
+        "scenario": scenario,
+        "iterations": iterations,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "max": round(max(latencies), 2),
+        },
+        "bytes_written_per_iteration": round(sum(written) / len(written)),
+        "peak_rss_kb": peak_rss_kb(),
+        "gemini_calls": behavior.calls,
+        "gemini_prompt_tokens": behavior.prompt_tokens,
+        "x_requests": x_requests,
+        "x_connections": x_connections,
+    }
+
+
+# --- 集計・比較 ---
+
+def run_all(args) -> dict:
+    scenarios = [args.scenario] if args.scenario else SCENARIOS
+    results = {}
+    for scenario in scenarios:
+        iterations = args.iterations or DEFAULT_ITERATIONS[scenario]
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", scenario, "--iterations", str(iterations),
+               "--latency", str(args.latency), "--per-token-latency", str(args.per_token_latency),
+               "--jitter", str(args.jitter), "--seed", str(args.seed), "--x-latency", str(args.x_latency)]
+        if args.response_cache:
+            cmd.append("--response-cache")
+        print(f"計測中: {scenario} ({iterations}回)...", flush=True)
+        proc = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"シナリオ {scenario} の計測に失敗しました:\n{proc.stderr}")
+        results[scenario] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "commit": current_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "latency": args.latency, "per_token_latency": args.per_token_latency,
+            "jitter": args.jitter, "seed": args.seed, "x_latency": args.x_latency,
+            "response_cache": args.response_cache, "batch_size": BATCH_SIZE,
+        },
+        "scenarios": results,
+    }
+
+def print_table(report: dict, baseline: dict | None = None):
+    def delta(current, base):
+        if base in (None, 0) or current is None:
+            return ""
+        return f" ({(current - base) / base * 100:+.1f}%)"
+    print(f"\n=== ベンチマーク結果 (commit {report['commit']}) ===")
+    print(f"{'scenario':<15}{'p50 ms':>22}{'p95 ms':>22}{'bytes/iter':>24}{'peak RSS KB':>24}{'X conn/req':>14}")
+    for name, result in report["scenarios"].items():
+        base = (baseline or {}).get("scenarios", {}).get(name, {})
+        base_latency = base.get("latency_ms", {})
+        p50, p95 = result["latency_ms"]["p50"], result["latency_ms"]["p95"]
+        written, rss = result["bytes_written_per_iteration"], result["peak_rss_kb"]
+        print(
+            f"{name:<15}"
+            f"{str(p50) + delta(p50, base_latency.get('p50')):>22}"
+            f"{str(p95) + delta(p95, base_latency.get('p95')):>22}"
+            f"{str(written) + delta(written, base.get('bytes_written_per_iteration')):>24}"
+            f"{str(rss) + delta(rss, base.get('peak_rss_kb')):>24}"
+            f"{str(result.get('x_connections')) + '/' + str(result.get('x_requests')):>14}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Growth_X_bot のローカルベンチマーク")
+    parser.add_argument("--scenario", choices=SCENARIOS, help="計測するシナリオ（省略時は全て）")
+    parser.add_argument("--iterations", type=int, help="シナリオあたりの実行回数")
+    parser.add_argument("--latency", type=float, default=0.05, help="偽Geminiの基本レイテンシ（秒）")
+    parser.add_argument("--per-token-latency", type=float, default=0.0002, help="出力1トークンあたりのレイテンシ（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2, help="レイテンシの揺らぎ（割合）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--x-latency", type=float, default=0.02, help="X スタブの応答レイテンシ（秒）")
+    parser.add_argument("--response-cache", action="store_true", help="Gemini応答キャッシュを有効にして計測する")
+    parser.add_argument("--compare", help="比較対象の結果JSON")
+    parser.add_argument("--output", help="結果JSONの保存先（省略時は benchmarks/results/<commit>.json）")
+    parser.add_argument("--worker", choices=SCENARIOS, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        result = run_worker(args.worker, args.iterations or DEFAULT_ITERATIONS[args.worker], args)
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    report = run_all(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+    print(f"\n結果を {output} に保存しました。")
+
+if __name__ == "__main__":
+    main()
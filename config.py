@@ -1,9 +1,12 @@
 # config.py
 import os
-from dotenv import load_dotenv
 
 # プロジェクトのルートディレクトリにある .env ファイルを読み込む
-load_dotenv()
+# （.env が無い環境、例えば GitHub Actions では python-dotenv の読み込み自体を省く）
+_DOTENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+if os.path.exists(_DOTENV_PATH):
+    from dotenv import load_dotenv
+    load_dotenv(_DOTENV_PATH)
 
 # --- API Keys (必須) ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -12,8 +15,32 @@ X_API_SECRET = os.getenv("X_API_SECRET")
 X_ACCESS_TOKEN = os.getenv("X_ACCESS_TOKEN")
 X_ACCESS_TOKEN_SECRET = os.getenv("X_ACCESS_TOKEN_SECRET")
 
+# --- X API 接続先 (任意、デフォルト値あり) ---
+# ローカルのスタブサーバーなどに向ける場合のみ変更する
+X_API_BASE_URL = os.getenv("X_API_BASE_URL", "https://api.twitter.com")
+# 接続のタイムアウト秒数（読み取りは X_POST_TIMEOUT_SECONDS）と、使い回す接続の最大数
+X_CONNECT_TIMEOUT_SECONDS = float(os.getenv("X_CONNECT_TIMEOUT_SECONDS", "5"))
+X_MAX_CONNECTIONS = int(os.getenv("X_MAX_CONNECTIONS", "4"))
+
+# --- X 投稿キュー設定 (任意、デフォルト値あり) ---
+# 1回の投稿リクエストの応答を待つ秒数
+X_POST_TIMEOUT_SECONDS = float(os.getenv("X_POST_TIMEOUT_SECONDS", "30"))
+# 一時的な失敗（5xx・通信エラー）で再送する最大回数。超えたものは送信不能（dead）として残す
+X_POST_MAX_ATTEMPTS = int(os.getenv("X_POST_MAX_ATTEMPTS", "5"))
+X_POST_RETRY_BASE_DELAY_SECONDS = float(os.getenv("X_POST_RETRY_BASE_DELAY_SECONDS", "30"))
+X_POST_RETRY_MAX_DELAY_SECONDS = float(os.getenv("X_POST_RETRY_MAX_DELAY_SECONDS", "900"))
+# 投稿の最小間隔（秒）。レート制限の残りがキューより少ない場合は、reset までの時間に均等に割り振る
+X_POST_MIN_INTERVAL_SECONDS = float(os.getenv("X_POST_MIN_INTERVAL_SECONDS", "0"))
+# 調査レポートもスレッド（ツイートへの返信の連鎖）として投稿するか。1で有効
+THREAD_ENABLED = os.getenv("THREAD_ENABLED", "0") == "1"
+# 1スレッドの最大投稿数（ツイートを含む）
+THREAD_MAX_POSTS = int(os.getenv("THREAD_MAX_POSTS", "6"))
+
 # --- File Paths (任意、デフォルト値あり) ---
-KNOWLEDGE_BASE_DIR = os.getenv("KNOWLEDGE_BASE_DIR", "knowledge_base")
+# 概念化サイクルで全文を読み込む知識ソース（docx / txt / md）のディレクトリ（プロジェクトルートからの相対パス）
+KNOWLEDGE_BASE_DIR = os.getenv("KNOWLEDGE_BASE_DIR", "data/knowledge_base")
+# 知識ソース（docx / txt / md）のうち、変更されたファイルを並列に解析するプロセス数
+KNOWLEDGE_LOADER_WORKERS = int(os.getenv("KNOWLEDGE_LOADER_WORKERS", "4"))
 CLUSTERS_FILE = os.getenv("CLUSTERS_FILE", "data/clusters.json")
 POST_HISTORY_FILE = os.getenv("POST_HISTORY_FILE", "data/post_history.json")
 
@@ -42,5 +69,106 @@ if any(x_key_values) and not all(x_key_values):
         f"Please set all X keys or none of them. Missing: {', '.join(missing_x_keys)}"
     )
 
+# --- Gemini クライアント設定 (任意、デフォルト値あり) ---
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+GEMINI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GEMINI_CONNECT_TIMEOUT_SECONDS", "10"))
+GEMINI_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_SECONDS", "60"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "10"))
+# 接続先を差し替える場合のみ設定（ローカルのスタブサーバーなど）
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# --- Gemini 再試行設定 (任意、デフォルト値あり) ---
+# 429 / 5xx / タイムアウトなど一時的なエラーの最大試行回数（初回を含む）
+GEMINI_RETRY_MAX_ATTEMPTS = int(os.getenv("GEMINI_RETRY_MAX_ATTEMPTS", "4"))
+GEMINI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_DELAY_SECONDS", "1"))
+GEMINI_RETRY_MAX_DELAY_SECONDS = float(os.getenv("GEMINI_RETRY_MAX_DELAY_SECONDS", "30"))
+# 1回の実行で失敗に費やせる合計秒数（失敗した試行の所要時間＋再試行までの待機）
+GEMINI_RETRY_BUDGET_SECONDS = float(os.getenv("GEMINI_RETRY_BUDGET_SECONDS", "120"))
+# 連続してこの回数失敗したら、COOLDOWN の間は呼び出しを止める（サーキットブレーカー）
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GEMINI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GEMINI_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("GEMINI_CIRCUIT_COOLDOWN_SECONDS", "60"))
+
+# --- 調査パイプライン設定 (任意、デフォルト値あり) ---
+# 各フェーズの Gemini 応答を待つ上限秒数
+RESEARCH_PHASE1_TIMEOUT_SECONDS = float(os.getenv("RESEARCH_PHASE1_TIMEOUT_SECONDS", "180"))
+RESEARCH_PHASE2_TIMEOUT_SECONDS = float(os.getenv("RESEARCH_PHASE2_TIMEOUT_SECONDS", "120"))
+# 通常サイクルのフェーズ2をストリーミングで生成し、ツイート本文が揃い次第投稿を始めるか
+PHASE2_STREAMING = os.getenv("PHASE2_STREAMING", "1") == "1"
+# 投稿開始から完了までを待つ上限秒数
+POST_DEADLINE_SECONDS = float(os.getenv("POST_DEADLINE_SECONDS", "30"))
+
+# --- バッチモード設定 (任意、デフォルト値あり) ---
+# --batch N 実行時に、フェーズ1（Web調査）を同時に走らせる最大数
+BATCH_RESEARCH_WORKERS = int(os.getenv("BATCH_RESEARCH_WORKERS", "4"))
+
+# --- クラスタリング設定 (任意、デフォルト値あり) ---
+# "gemini": 本文全体を Gemini に渡してクラスターを作る / "local": ローカルでベクトル化・k-means し、Gemini はラベル付けだけに使う
+CLUSTERING_ENGINE = os.getenv("CLUSTERING_ENGINE", "gemini")
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", "10"))
+# ローカルエンジンのベクトル化方式（"hashing": 文字n-gramのハッシュ＋TF-IDF / "gemini": Gemini の埋め込み）
+LOCAL_EMBEDDING = os.getenv("LOCAL_EMBEDDING", "hashing")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "text-embedding-004")
+LOCAL_CLUSTERING_SEED = int(os.getenv("LOCAL_CLUSTERING_SEED", "0"))
+# クラスターのテーマ名・要約を Gemini で付けるか（"0" ならキーワードと代表文から作る）
+LOCAL_CLUSTER_LABELING = os.getenv("LOCAL_CLUSTER_LABELING", "1") == "1"
+# 前回のクラスターを引き継ぎ、新しいテキストだけを割り当てる（ローカルエンジンのみ）
+CLUSTERING_INCREMENTAL = os.getenv("CLUSTERING_INCREMENTAL", "0") == "1"
+# クラスターのまとまり（凝集度）が前回の作り直し・分割・統合の時点からこれ以上下がったら2つに分割する
+CLUSTER_DRIFT_THRESHOLD = float(os.getenv("CLUSTER_DRIFT_THRESHOLD", "0.15"))
+# クラスターの中心がラベル付け時からこのコサイン距離以上動いたら、Gemini でラベルを付け直す
+CLUSTER_RELABEL_THRESHOLD = float(os.getenv("CLUSTER_RELABEL_THRESHOLD", "0.05"))
+# 中心ベクトルのコサイン類似度がこれ以上のクラスター同士は統合する
+CLUSTER_MERGE_THRESHOLD = float(os.getenv("CLUSTER_MERGE_THRESHOLD", "0.85"))
+
+# --- トピック選択設定 (任意、デフォルト値あり) ---
+# 調査するクラスターの選び方（"lru" / "weighted_round_robin" / "bandit" / "random"）
+TOPIC_SCHEDULER = os.getenv("TOPIC_SCHEDULER", "lru")
+# bandit 方式で、投稿からこの秒数が経ったツイートの反応（いいね・リポストなど）を取得して報酬にする
+TOPIC_REWARD_MIN_AGE_SECONDS = float(os.getenv("TOPIC_REWARD_MIN_AGE_SECONDS", str(6 * 3600)))
+
+# --- 重複検出設定 (任意、デフォルト値あり) ---
+# 投稿前に、過去のツイートとほぼ同じ内容かどうかをローカルの索引で確認するか
+DUPLICATE_CHECK_ENABLED = os.getenv("DUPLICATE_CHECK_ENABLED", "1") == "1"
+# 文字3-gramの Jaccard 距離（1 - 類似度）がこれ以下なら重複とみなす
+DUPLICATE_MAX_DISTANCE = float(os.getenv("DUPLICATE_MAX_DISTANCE", "0.3"))
+# 重複した場合にツイートを書き直す回数（書き直しても重複する場合は投稿しない）
+DUPLICATE_MAX_REGENERATIONS = int(os.getenv("DUPLICATE_MAX_REGENERATIONS", "1"))
+
+# --- map-reduce 設定 (任意、デフォルト値あり) ---
+# 概念化・クラスタリングの入力がこの推定トークン数を超えたら、チャンクに分けて要約してから処理する
+MAP_REDUCE_CHUNK_TOKENS = int(os.getenv("MAP_REDUCE_CHUNK_TOKENS", "30000"))
+# チャンクの要約を同時に実行する最大数
+MAP_REDUCE_WORKERS = int(os.getenv("MAP_REDUCE_WORKERS", "4"))
+
+# --- キャッシュ設定 (任意、デフォルト値あり) ---
+# プロジェクトルートからの相対パス。実行をまたいで再利用するキャッシュを置く
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+# フェーズ2のペルソナを Gemini のコンテキストキャッシュに載せるか。
+# キャッシュは保存期間（TTL）の分だけ課金されるため、1時間に1回・1件だけ生成する定期実行では割高になる。
+# バッチ実行（--batch）や常駐する環境など、TTL 内にフェーズ2を何度も呼ぶ場合に有効にする
+PERSONA_CONTEXT_CACHE = os.getenv("PERSONA_CONTEXT_CACHE", "0") == "1"
+PERSONA_CACHE_TTL_SECONDS = int(os.getenv("PERSONA_CACHE_TTL_SECONDS", "3600"))
+# フェーズ2にペルソナ全文ではなく、テーマに関係する部分の抜粋（核となる要約＋上位 PERSONA_TOP_K 件）を送るか。
+# 有効にすると抜粋がテーマごとに変わるため、ペルソナのコンテキストキャッシュは使わない
+PERSONA_EXCERPT = os.getenv("PERSONA_EXCERPT", "0") == "1"
+PERSONA_TOP_K = int(os.getenv("PERSONA_TOP_K", "4"))
+PERSONA_PASSAGE_CHARS = int(os.getenv("PERSONA_PASSAGE_CHARS", "400"))
+# Gemini 応答キャッシュ（同じプロンプトの再送を避ける。主に開発時や失敗後の再実行向け）
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# 呼び出し箇所ごとの有効期限（秒）。Web調査は鮮度が重要なので短く、クラスタリングは長く持つ
+RESPONSE_CACHE_TTLS = {
+    "research_phase1": int(os.getenv("RESPONSE_CACHE_TTL_RESEARCH", "900")),
+    "research_phase2": int(os.getenv("RESPONSE_CACHE_TTL_RESEARCH", "900")),
+    "concept": int(os.getenv("RESPONSE_CACHE_TTL_CONCEPT", str(7 * 24 * 3600))),
+    "clustering": int(os.getenv("RESPONSE_CACHE_TTL_CLUSTERING", str(30 * 24 * 3600))),
+}
+
+# --- 計測設定 (任意、デフォルト値あり) ---
+# 処理段階ごとの所要時間・トークン数などを JSON Lines で追記するか
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") == "1"
+# メトリクスファイルのパス（プロジェクトルートからの相対パス）
+TRACE_METRICS_FILE = os.getenv("TRACE_METRICS_FILE", "logs/metrics.jsonl")
+
 # 使用するAIモデル名
 MODEL_NAME = "gemini-2.0-flash-exp" #"gemini-2.5-pro"
\ No newline at end of file
@@ -1,41 +1,59 @@
 # src/cluster_document.py
 import os
 import json
-from docx import Document
-from google import genai
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import config
+from src import gemini_client, response_cache, json_extract, tracing, retry, map_reduce, knowledge_loader
 
 def read_text_from_file(file_path: str) -> str:
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"エラー: ファイルが見つかりません - {file_path}")
-    if file_path.lower().endswith('.docx'):
-        from docx import Document
-        try:
-            document = Document(file_path)
-            full_text = "\n".join([para.text for para in document.paragraphs if para.text.strip()])
-            if not full_text:
-                print("警告: ドキュメント内にテキストを含む段落が見つかりませんでした。")
-            return full_text
-        except Exception as e:
-            raise IOError(f"docxファイルの読み込み中にエラーが発生しました: {e}")
-    elif file_path.lower().endswith('.txt'):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            raise IOError(f"txtファイルの読み込み中にエラーが発生しました: {e}")
-    else:
-        raise ValueError("対応していないファイル形式です。")
+    """docx / txt / md のテキストを返す（抽出結果は knowledge_loader のキャッシュを使う）。"""
+    full_text = knowledge_loader.load_text(file_path)
+    if not full_text:
+        print("警告: ドキュメント内にテキストを含む段落が見つかりませんでした。")
+    return full_text
+
+def generate_clustering_response(prompt: str) -> str:
+    """プロンプトを Gemini に送り、応答テキストを返す（応答キャッシュ・再試行付き）。"""
+    cached_text = response_cache.get("clustering", config.MODEL_NAME, prompt)
+    tracing.set_attrs(cache_hit=cached_text is not None)
+    if cached_text is not None:
+        print("\nキャッシュ済みのクラスタリング応答を使用します。")
+        return cached_text
+    client = gemini_client.get_client()
+    try:
+        response = retry.call(
+            client.models.generate_content,
+            model=config.MODEL_NAME,  # configで指定したモデル名を使用
+            contents=prompt,
+            site="クラスタリング",
+        )
+    except Exception as e:
+        raise ConnectionError(f"Gemini APIとの通信中にエラーが発生しました: {e}")
+    tracing.record_usage(response)
+    response_cache.put("clustering", config.MODEL_NAME, prompt, response.text)
+    return response.text
+
+def summarize_text_chunk(chunk_text: str, index: int, total: int) -> str:
+    """長いテキストの一部から、クラスタリングの材料になるトピックと要点を抜き出す（map-reduce の map）。"""
+    prompt = f"""
+    以下は、クラスタリング対象の長いテキストの一部（{index}/{total}）です。
+    後で全体をまとめてクラスターに分類するため、この部分に含まれる主要なトピックやテーマを列挙し、
+    それぞれの要点と特徴的なキーワードを箇条書きで簡潔に抽出してください。
+
+    --- テキスト本文（{index}/{total}） ---
+    {chunk_text}
+    """
+    return generate_clustering_response(prompt)
 
 def get_clustered_json_from_gemini(text: str) -> str:
     """与えられたテキストをGemini APIを使ってクラスタリングし、結果をJSON形式の文字列で返す。"""
-    api_key = config.GEMINI_API_KEY
-    if not api_key:
-        raise ValueError("環境変数にGEMINI_API_KEYが設定されていません。")
-    client = genai.Client(api_key=api_key)
+    # コンテキストに収まらない長さなら、チャンクごとにトピックを抜き出してからクラスタリングする
+    try:
+        text = map_reduce.reduce_to_fit([text], summarize_text_chunk, "clustering", separator="\n")
+    except ValueError as e:
+        raise ConnectionError(f"クラスタリング対象テキストの要約に失敗しました: {e}")
 
     # Geminiへの指示をJSON形式での出力を要求するように変更
     prompt = f"""
@@ -114,14 +132,30 @@ def get_clustered_json_from_gemini(text: str) -> str:
     """
 
     print("\nGeminiによるクラスタリングを開始します...")
-    try:
-        response = client.models.generate_content(
-            model=config.MODEL_NAME,  # configで指定したモデル名を使用
-            contents=prompt,
-        )
-        return response.text
-    except Exception as e:
-        raise ConnectionError(f"Gemini APIとの通信中にエラーが発生しました: {e}")
+    with tracing.span("clustering.gemini", input_chars=len(text)):
+        return generate_clustering_response(prompt)
+
+def cluster_knowledge_text(text: str, extra_texts: list | None = None, state_path: str | None = None) -> dict:
+    """
+    CLUSTERING_ENGINE に応じてテキストをクラスタリングし、activity_clusters.json 形式の辞書を返す。
+    - gemini: 本文全体を Gemini に渡してクラスターを作る
+    - local: ローカルでベクトル化・k-means し、Gemini はラベル付けだけに使う
+    extra_texts: 本文に加えて分類するテキスト（新しい知識エントリなど。ローカルエンジンのみ）
+    state_path: CLUSTERING_INCREMENTAL=1 の時、前回のクラスター状態を保存するファイル（ローカルエンジンのみ）
+    """
+    extra_texts = [t for t in (extra_texts or []) if t]
+    if config.CLUSTERING_ENGINE == "local":
+        from src import local_clustering  # NumPy はローカルエンジンを使う時だけ読み込む
+        passages = local_clustering.split_passages(text) + extra_texts
+        if config.CLUSTERING_INCREMENTAL and state_path:
+            from src import incremental_clustering
+            return incremental_clustering.update_clusters(passages, state_path)
+        return local_clustering.cluster_passages(passages)
+    if config.CLUSTERING_ENGINE != "gemini":
+        raise ValueError(f"未対応のクラスタリングエンジンです: {config.CLUSTERING_ENGINE}（gemini または local）")
+    if config.CLUSTERING_INCREMENTAL:
+        print("警告: 増分クラスタリングはローカルエンジン（CLUSTERING_ENGINE=local）でのみ使えます。全体をクラスタリングします。")
+    return json_extract.extract_json(get_clustered_json_from_gemini(text))
 
 if __name__ == "__main__":
     # 入力ファイルと出力ファイルのパスを定義
@@ -130,20 +164,17 @@ if __name__ == "__main__":
     
     try:
         # 1. docxファイルからテキストを抽出
-        document_text = read_text_from_docx(INPUT_DOCX_PATH)
+        document_text = read_text_from_file(INPUT_DOCX_PATH)
         
         if document_text:
             # 2. Geminiでクラスタリングし、JSON形式のテキストを取得
             json_output_text = get_clustered_json_from_gemini(document_text)
             
-            # 3. Geminiの出力からJSON部分を抽出
+            # 3. Geminiの出力からJSON部分を抽出し、辞書オブジェクトにパース
             #    (```json ... ``` のようなマークダウン形式で返されることがあるため)
-            json_str = json_output_text.strip().lstrip("```json").rstrip("```")
-            
-            # 4. JSON文字列をPythonの辞書オブジェクトにパース
-            data = json.loads(json_str)
+            data = json_extract.extract_json(json_output_text)
 
-            # 5. 辞書オブジェクトをJSONファイルに保存
+            # 4. 辞書オブジェクトをJSONファイルに保存
             with open(OUTPUT_JSON_PATH, 'w', encoding='utf-8') as f:
                 # indent=2 で見やすく整形し、ensure_ascii=False で日本語の文字化けを防ぐ
                 json.dump(data, f, ensure_ascii=False, indent=2)
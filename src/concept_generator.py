@@ -1,25 +1,50 @@
 # src/concept_generator.py
 import os
 import json
-from dotenv import load_dotenv
-from google import genai
 import config
+from src import state_store, gemini_client, response_cache, json_extract, tracing, retry, map_reduce
+
+MODEL_NAME = 'gemini-2.0-flash-exp'
 
 def _call_gemini(prompt: str) -> str | None:
     """Gemini APIを呼び出し、テキストを生成する共通関数 (research_topic.py方式)"""
-    api_key = config.GEMINI_API_KEY
-    if not api_key:
-        print("環境変数にGEMINI_API_KEYが設定されていません。")
+    cached_text = response_cache.get("concept", MODEL_NAME, prompt)
+    tracing.set_attrs(cache_hit=cached_text is not None)
+    if cached_text is not None:
+        print("[Gemini] キャッシュ済みの応答を使用します。")
+        return cached_text
+    try:
+        client = gemini_client.get_client()
+    except ValueError as e:
+        print(e)
         return None
-    client = genai.Client(api_key=api_key)
     # Gemini-proモデルでチャットを作成し、プロンプトを送信
     try:
-        model = client.chats.create(model='gemini-2.0-flash-exp')
-        response = model.send_message(prompt)
-        return response.text
+        model = client.chats.create(model=MODEL_NAME)
+        response = retry.call(model.send_message, prompt, site="概念化")
     except Exception as e:
         print(f"Gemini APIとの通信中にエラーが発生しました: {e}")
         return None
+    tracing.record_usage(response)
+    response_cache.put("concept", MODEL_NAME, prompt, response.text)
+    return response.text
+
+def summarize_knowledge_chunk(chunk_text: str, index: int, total: int) -> str | None:
+    """
+    調査記録の一部から要点を抜き出す（map-reduce の map）。
+    全体が大きすぎて1回のプロンプトに収まらない場合に、create_summary_document の前段として使う。
+    """
+    prompt = f"""あなたは、日々の調査記録を整理する優れたリサーチアシスタントです。
+以下は調査記録全体の一部（{index}/{total}）です。後で全体を統合して一つの研究報告書にまとめるため、
+この部分に含まれる主要なテーマ、重要な事実や洞察、繰り返し現れるパターンを箇条書きで簡潔に整理してください。
+具体的な事例や固有名詞は省略せずに残してください。
+
+---
+【調査記録（{index}/{total}）】
+{chunk_text}
+"""
+    print(f"[Gemini] 調査記録の要点を抽出中... ({index}/{total})")
+    return _call_gemini(prompt)
 
 def create_summary_document(knowledge_text: str) -> str | None:
     """
@@ -55,7 +80,8 @@ def create_summary_document(knowledge_text: str) -> str | None:
 {knowledge_text}
 """
     print("\n[Gemini] 論文形式の要約を生成中...")
-    summary = _call_gemini(prompt)
+    with tracing.span("concept.summary", input_chars=len(knowledge_text)):
+        summary = _call_gemini(prompt)
     if not summary:
         print("エラー: Geminiによる要約生成に失敗しました。")
         return None
@@ -81,15 +107,15 @@ def structure_document_to_json(summary_document: str) -> dict | None:
 {summary_document}
 """
     print("[Gemini] 論文をJSON形式に変換中...")
-    json_str = _call_gemini(prompt)
+    with tracing.span("concept.structure"):
+        json_str = _call_gemini(prompt)
     if not json_str:
         print("エラー: GeminiによるJSON変換に失敗しました。")
         return None
     try:
-        clean_json_str = json_str.strip().lstrip("```json").rstrip("```")
-        return json.loads(clean_json_str)
-    except json.JSONDecodeError:
-        print("エラー: Geminiからの出力が有効なJSON形式ではありません。")
+        return json_extract.extract_json(json_str)
+    except json_extract.JsonExtractionError as e:
+        print(f"エラー: Geminiからの出力が有効なJSON形式ではありません。{e}")
         return None
 
 def generate_new_concept(knowledge_file: str, summary_file: str, concept_file: str) -> dict | None:
@@ -99,26 +125,31 @@ def generate_new_concept(knowledge_file: str, summary_file: str, concept_file: s
     concept_file: 出力するconcepts.jsonのパス
     戻り値: 生成された概念データ（辞書）またはNone（失敗時）
     """
-    with open(knowledge_file, 'r', encoding='utf-8') as f:
-        knowledge_data = json.load(f)
-    entries = knowledge_data.get('knowledge_entries', [])
-    if not entries:
+    # エントリは1件ずつ読み進め、要約に使うテキストだけを残す
+    with tracing.span("persist.read_recent_knowledge"):
+        entry_texts = [
+            f"テーマ: {e.get('theme', '')}\nツイート: {e.get('generated_tweet', '')}\n詳細: {e.get('details', '')}"
+            for e in state_store.iter_knowledge_entries(knowledge_file)
+        ]
+    if not entry_texts:
         print("警告: 分析対象の知識がありません。")
         return None
-    knowledge_text = "\n".join([
-        f"テーマ: {e.get('theme', '')}\nツイート: {e.get('generated_tweet', '')}\n詳細: {e.get('details', '')}"
-        for e in entries
-    ])
+    # 記録が多くコンテキストに収まらない場合は、チャンクごとの要点に畳み込んでから要約する
+    try:
+        knowledge_text = map_reduce.reduce_to_fit(entry_texts, summarize_knowledge_chunk, "concept", separator="\n")
+    except ValueError as e:
+        print(f"エラー: 調査記録の要点抽出に失敗しました。{e}")
+        return None
     summary_document = create_summary_document(knowledge_text)
     if not summary_document:
         print("エラー: 論文形式の要約生成に失敗しました。")
         return None
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        f.write(summary_document)
+    with tracing.span("persist.concept_summary"):
+        state_store.atomic_write_text(summary_file, summary_document)
     concepts_json = structure_document_to_json(summary_document)
     if not concepts_json:
         print("エラー: 論文のJSON変換に失敗しました。")
         return None
-    with open(concept_file, 'w', encoding='utf-8') as f:
-        json.dump(concepts_json, f, ensure_ascii=False, indent=2)
+    with tracing.span("persist.concepts"):
+        state_store.atomic_write_json(concept_file, concepts_json)
     return concepts_json
@@ -0,0 +1,158 @@
+# src/duplicate_index.py
+import os
+import re
+import sys
+import random
+import unicodedata
+import zlib
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import knowledge_log, state_store, tracing
+
+# 過去に投稿したツイートとの重複（言い回しがほぼ同じもの）を、投稿前にローカルで検出するための索引。
+# - ツイートを正規化して文字3-gramの集合にし、MinHash（NUM_PERM 個のハッシュの最小値）で署名にする
+# - 署名を BANDS 個の帯に分けた LSH で候補を絞り、候補だけ署名の一致率（≒Jaccard類似度）を比べる
+# - 長期ログ（JSON Lines）のどこまで索引に入れたかを記録し、次回は追記された分だけを取り込む
+# X の 403（重複投稿）を待たずに、Gemini の再生成や投稿の取りやめを判断できる。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+INDEX_PATH = os.path.join(PROJECT_ROOT, config.CACHE_DIR, 'duplicate_index.json')
+
+INDEX_VERSION = 1
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16               # 1帯 4行。類似度 0.7 の組は約99%、0.5 の組は約64%の確率で候補になる
+HASH_PRIME = (1 << 61) - 1
+SEED = 1
+PREVIEW_CHARS = 40
+_NOISE_PATTERN = re.compile(r"https?://\S+|[\s\W_]+")
+
+
+def _make_permutations(seed: int = SEED) -> list:
+    """MinHash 用のハッシュ関数 (a*x + b) mod HASH_PRIME の係数を作る（実行をまたいで同じ値）。"""
+    rng = random.Random(seed)
+    return [(rng.randrange(1, HASH_PRIME), rng.randrange(0, HASH_PRIME)) for _ in range(NUM_PERM)]
+
+_PERMUTATIONS = _make_permutations()
+
+def normalize_text(text: str) -> str:
+    """全角・半角や大文字小文字の違い、URL、空白・記号を取り除く。"""
+    return _NOISE_PATTERN.sub("", unicodedata.normalize("NFKC", text).lower())
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """正規化したテキストの文字n-gramの集合（短いテキストは全体を1つとする）。"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def signature(text: str) -> tuple | None:
+    """MinHash 署名を返す。比較できる文字が無い場合は None。"""
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % HASH_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def similarity(sig_a: tuple, sig_b: tuple) -> float:
+    """署名の一致率（Jaccard類似度の推定値）。"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+def _bands(sig: tuple) -> list:
+    rows = len(sig) // BANDS
+    return [(band, hash(sig[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    """MinHash/LSH による近似重複の索引。"""
+
+    def __init__(self):
+        self.signatures = []     # [(署名, プレビュー)]
+        self.buckets = defaultdict(list)
+        self.log_offset = 0
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def add(self, text: str, sig: tuple | None = None):
+        sig = sig or signature(text)
+        if sig is None:
+            return
+        position = len(self.signatures)
+        self.signatures.append((sig, text[:PREVIEW_CHARS]))
+        for key in _bands(sig):
+            self.buckets[key].append(position)
+
+    def query(self, text: str, max_distance: float | None = None, sig: tuple | None = None) -> list:
+        """
+        text との Jaccard 距離（1 - 類似度）が max_distance 以下の過去の投稿を返す。
+        戻り値: [(類似度, プレビュー)] を類似度の高い順に並べたもの
+        """
+        max_distance = config.DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        sig = sig or signature(text)
+        if sig is None:
+            return []
+        candidates = {position for key in _bands(sig) for position in self.buckets.get(key, ())}
+        matches = []
+        for position in candidates:
+            other, preview = self.signatures[position]
+            score = similarity(sig, other)
+            if 1 - score <= max_distance:
+                matches.append((score, preview))
+        return sorted(matches, key=lambda m: -m[0])
+
+    def find_duplicate(self, text: str, max_distance: float | None = None) -> tuple | None:
+        """最も似ている過去の投稿 (類似度, プレビュー) を返す。重複が無ければ None。"""
+        matches = self.query(text, max_distance)
+        return matches[0] if matches else None
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "num_perm": NUM_PERM,
+            "seed": SEED,
+            "log_offset": self.log_offset,
+            "entries": [{"signature": list(sig), "preview": preview} for sig, preview in self.signatures],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """保存した索引を復元する。パラメータが異なる場合は None を返す。"""
+        if (data.get("version"), data.get("num_perm"), data.get("seed")) != (INDEX_VERSION, NUM_PERM, SEED):
+            return None
+        index = cls()
+        for entry in data.get("entries", []):
+            index.add(entry["preview"], sig=tuple(entry["signature"]))
+        index.log_offset = data.get("log_offset", 0)
+        return index
+
+
+def load_index(log_path: str, index_path: str | None = None) -> DuplicateIndex:
+    """
+    保存した索引を読み込み、長期ログに追記された分を取り込んで返す（取り込んだ場合は保存し直す）。
+    長期ログが索引より短くなっていた（作り直された）場合は、最初から作り直す。
+    index_path: 索引の保存先（省略時は INDEX_PATH）
+    """
+    index_path = INDEX_PATH if index_path is None else index_path
+    with tracing.span("duplicate_index.load"):
+        try:
+            index = DuplicateIndex.from_dict(state_store.read_json(index_path, {}))
+        except ValueError as e:
+            print(f"警告: 重複検出の索引を読み込めないため、作り直します: {e}")
+            index = None
+        jsonl_path = knowledge_log.jsonl_path_for(log_path)
+        log_size = os.path.getsize(jsonl_path) if os.path.exists(jsonl_path) else 0
+        if index is None or index.log_offset > log_size:
+            index = DuplicateIndex()
+        added = 0
+        for entry, offset in knowledge_log.iter_entries_since(log_path, index.log_offset):
+            tweet = knowledge_log.tweet_of(entry)
+            if tweet:
+                index.add(tweet)
+                added += 1
+            index.log_offset = offset
+        tracing.set_attrs(indexed=len(index), added=added)
+        if added or not os.path.exists(index_path):
+            state_store.atomic_write_json(index_path, index.to_dict(), indent=None)
+    return index
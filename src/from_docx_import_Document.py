@@ -1,8 +1,11 @@
 # src/from_docx_import_Document.py
-from docx import Document
 import os
+import sys
 import json
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src import knowledge_loader
+
 def read_first_text_in_file(file_path):
     """
     docxまたはtxtファイルを読み込み、最初に見つかったテキストを含む段落（または行）から100文字を出力する。
@@ -12,6 +15,7 @@ def read_first_text_in_file(file_path):
         return
     try:
         if file_path.lower().endswith('.docx'):
+            from docx import Document
             document = Document(file_path)
             for paragraph in document.paragraphs:
                 # .strip()で空白や改行のみの段落を無視する
@@ -34,34 +38,25 @@ def read_first_text_in_file(file_path):
     except Exception as e:
         print(f"ファイルの読み込み中にエラーが発生しました: {e}")
 
-def get_combined_knowledge_text(base_file_path: str, concepts_path: str) -> str:
+def get_combined_knowledge_text(base_file_path: str, concepts_path: str, knowledge_dir: str | None = None) -> str:
     """
-    base_file_path: ベースとなるdocxまたはtxtファイルのパス
+    base_file_path: ベースとなるdocx/txt/mdファイルのパス
     concepts_path: 構造化知識（concepts.jsonなど）のパス
-    1. docx/txtの最初のテキスト
+    knowledge_dir: 知識ソースのディレクトリ（省略時は KNOWLEDGE_BASE_DIR。無ければ警告を出して読まない）
+    1. ベースファイルと知識ソースの全文（抽出結果はキャッシュし、変更されたファイルだけを解析する）
     2. 構造化知識の要約や要素
     を結合して返す
     """
     texts = []
-    # 1. docx/txtの最初のテキスト
-    if os.path.exists(base_file_path):
-        try:
-            if base_file_path.lower().endswith('.docx'):
-                document = Document(base_file_path)
-                for paragraph in document.paragraphs:
-                    if paragraph.text.strip():
-                        texts.append(paragraph.text.strip())
-                        break
-            elif base_file_path.lower().endswith('.txt'):
-                with open(base_file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip():
-                            texts.append(line.strip())
-                            break
-            else:
-                print("対応していないファイル形式です。")
-        except Exception as e:
-            print(f"ファイル読み込みエラー: {e}")
+    # 1. ベースファイルと知識ソースの全文（変更されたファイルはまとめて並列に解析する）
+    paths = [os.path.abspath(base_file_path)] if os.path.exists(base_file_path) else []
+    knowledge_dir = knowledge_loader.knowledge_base_dir() if knowledge_dir is None else knowledge_dir
+    if os.path.isdir(knowledge_dir):
+        paths.extend(p for p in map(os.path.abspath, knowledge_loader.list_documents(knowledge_dir)) if p not in paths)
+    else:
+        print(f"警告: 知識ソースのディレクトリが見つかりません（KNOWLEDGE_BASE_DIR を確認してください） - {knowledge_dir}")
+    documents = knowledge_loader.load_texts(paths)
+    texts.extend(documents[path]["text"].strip() for path in paths if path in documents)
     # 2. 構造化知識の要約や要素
     if os.path.exists(concepts_path):
         try:
@@ -0,0 +1,164 @@
+# src/gemini_client.py
+import os
+import sys
+import asyncio
+import weakref
+import contextvars
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+
+# プロセス内で1つの genai.Client（とその背後の httpx コネクションプール）を共有する。
+# フェーズ1/2・クラスタリング・概念化のどこから呼んでも同じクライアントを使うため、
+# TCP/TLS ハンドシェイクは最初の1回だけで済む（keep-alive で再利用）。
+# 非同期API（client.aio）の httpx クライアントはイベントループに紐づくため、ループごとに1つ作成する。
+# 同期の呼び出し側は run_sync() で共有のバックグラウンドループに処理を渡すので、そちらも1つに集約される。
+# google.genai / httpx の読み込みは重いため、最初にクライアントを作る時まで遅延する。
+
+_client = None
+_override = None
+_async_clients = weakref.WeakKeyDictionary()   # イベントループ -> genai.Client
+_background_loop = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "clients_created": 0,
+    "connections_opened": 0,
+    "requests": 0,
+}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+def _trace(event_name: str, info: dict):
+    """httpcore のトレースイベントから、新規TCP接続の確立を数える。"""
+    if event_name == "connection.connect_tcp.complete":
+        _count("connections_opened")
+
+async def _atrace(event_name: str, info: dict):
+    _trace(event_name, info)
+
+def _on_request(request):
+    request.extensions["trace"] = _trace
+    _count("requests")
+
+async def _aon_request(request):
+    request.extensions["trace"] = _atrace
+    _count("requests")
+
+def _http_timeout():
+    import httpx
+    return httpx.Timeout(config.GEMINI_TIMEOUT_SECONDS, connect=config.GEMINI_CONNECT_TIMEOUT_SECONDS)
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=config.GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=config.GEMINI_MAX_CONNECTIONS,
+        keepalive_expiry=config.GEMINI_KEEPALIVE_SECONDS,
+    )
+
+def _build_http_client():
+    """keep-alive・タイムアウト設定済みの httpx.Client を作成する。"""
+    import httpx
+    return httpx.Client(timeout=_http_timeout(), limits=_http_limits(), event_hooks={"request": [_on_request]})
+
+def _build_async_http_client():
+    """keep-alive・タイムアウト設定済みの httpx.AsyncClient を作成する。"""
+    import httpx
+    return httpx.AsyncClient(timeout=_http_timeout(), limits=_http_limits(), event_hooks={"request": [_aon_request]})
+
+def _new_client(**http_options):
+    from google import genai
+    from google.genai import types
+    api_key = config.GEMINI_API_KEY
+    if not api_key:
+        raise ValueError("環境変数にGEMINI_API_KEYが設定されていません。")
+    client = genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            base_url=config.GEMINI_BASE_URL,
+            timeout=int(config.GEMINI_TIMEOUT_SECONDS * 1000),
+            **http_options,
+        ),
+    )
+    _count("clients_created")
+    return client
+
+def get_client():
+    """プロセス内で共有する genai.Client を返す（初回呼び出し時に作成）。"""
+    global _client
+    with _client_lock:
+        if _override is not None:
+            return _override
+        if _client is None:
+            _client = _new_client(httpx_client=_build_http_client())
+        return _client
+
+def get_async_client():
+    """実行中のイベントループで使う非同期クライアント（client.aio）を返す。"""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _override is not None:
+            return _override.aio
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _new_client(httpx_async_client=_build_async_http_client())
+            _async_clients[loop] = client
+        return client.aio
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _client_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="gemini-loop", daemon=True).start()
+        return _background_loop
+
+async def _run_in_context(coro, context: contextvars.Context):
+    # バックグラウンドループのタスクは呼び出し元のコンテキストを引き継がないため、値を写してから実行する
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+def run_sync(coro):
+    """
+    コルーチンを共有のバックグラウンドイベントループで実行し、結果を返す。
+    同期関数から非同期APIを呼ぶためのもので、どのスレッドから呼んでも同じ接続プールを使う。
+    コルーチンは呼び出し元のコンテキスト（計測中の段階など）で実行する。
+    """
+    future = asyncio.run_coroutine_threadsafe(_run_in_context(coro, contextvars.copy_context()), _get_background_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+def set_client(client):
+    """共有クライアントを差し替える（テストやベンチマークで偽クライアントを注入する用途）。None で解除。"""
+    global _override
+    with _client_lock:
+        _override = client
+
+def reset_client():
+    """共有クライアントを破棄する。次回の get_client() で作り直される。"""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+        _async_clients.clear()
+    http_client = getattr(getattr(client, "_api_client", None), "_httpx_client", None)
+    if http_client is not None:
+        http_client.close()
+
+def get_stats() -> dict:
+    """今回の実行で作成したクライアント数・TCP接続数・リクエスト数を返す。"""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
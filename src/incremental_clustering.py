@@ -0,0 +1,344 @@
+# src/incremental_clustering.py
+import io
+import os
+import sys
+import json
+import hashlib
+from collections import Counter
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import local_clustering, state_store, tracing
+
+# ローカルエンジンの増分クラスタリング（CLUSTERING_INCREMENTAL=1）。
+# 状態ファイルには、パッセージの本文ではなく次の要約統計だけを保存する（大きさはクラスター数と語彙で決まる）。
+# - 各クラスター: メンバー数・中心ベクトル（平均）・キーワード候補の出現回数（上位 TERM_LIMIT 語）・
+#   中心に近い代表パッセージ SAMPLE_SIZE 件とそのベクトル
+# - 全体: 取り込み済みパッセージの64ビットハッシュ・キーワード候補の文書頻度（上位 DF_LIMIT 語）・ベクトル化の状態（IDF）
+# 次の概念化サイクルでは未知のパッセージ（新しい知識エントリや概念）だけをベクトル化して最も近いクラスターに割り当て、
+# 統計を足し込む（処理量は新しいパッセージの数に比例する）。
+# まとまり（凝集度）が前回の作り直し・分割・統合の時点より CLUSTER_DRIFT_THRESHOLD 以上下がったクラスターは、
+# 代表パッセージと今回のパッセージを2つに分けて分割し、中心が CLUSTER_MERGE_THRESHOLD 以上似ているクラスター同士は統合する。
+# （基準の凝集度はラベルを付け直しても更新しないので、数回に分けて少しずつ離れていった場合も分割される）
+# cluster_id は一度振ったら変えない（分割で生まれたクラスターには新しい番号を振り、統合では小さい番号を残す）。
+# Gemini によるラベル付けは、分割・統合したクラスターと、中心がラベル付け時から CLUSTER_RELABEL_THRESHOLD 以上
+# 動いたクラスターだけ、代表パッセージとキーワード候補からやり直す（ラベル付け時の中心は label_centroids に保存する）。
+
+STATE_VERSION = 2
+MIN_SPLIT_SIZE = 4   # これより小さいクラスターは分割しない
+SAMPLE_SIZE = 8      # クラスターごとに残す代表パッセージの数
+TERM_LIMIT = 100     # クラスターごとに残すキーワード候補の数
+DF_LIMIT = 5000      # 文書頻度を残すキーワード候補の数
+
+
+def _cohesion(mean_vector: np.ndarray) -> float:
+    """単位ベクトルの平均の長さ（メンバー同士が似ているほど 1 に近い）。"""
+    return float(np.linalg.norm(mean_vector))
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(a @ b / norm) if norm else 0.0
+
+def passage_hashes(passages: list) -> np.ndarray:
+    """パッセージの64ビットハッシュ（取り込み済みかの判定に使う）。"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(p.encode('utf-8'), digest_size=8).digest(), 'little') for p in passages],
+        dtype=np.uint64,
+    )
+
+def _top(counts, limit: int) -> dict:
+    return dict(Counter(counts).most_common(limit))
+
+def load_state(path: str) -> dict | None:
+    """状態ファイルを読み込む。無い・形式が合わない場合は None を返す（全体を作り直す）。"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        tracing.record_bytes_read(len(raw))
+        with np.load(io.BytesIO(raw), allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            centroids = arrays["centroids"]
+            label_centroids = arrays["label_centroids"] if "label_centroids" in arrays else centroids.copy()
+            idf = arrays["idf"] if "idf" in arrays else None
+            known = arrays["known"]
+            samples = arrays["sample_vectors"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"警告: クラスターの状態ファイルを読み込めないため、全体を作り直します: {e}")
+        return None
+    if meta.get("version") != STATE_VERSION or len(meta.get("clusters", [])) != len(centroids):
+        return None
+    bounds = np.cumsum([0] + [len(cluster["samples"]) for cluster in meta["clusters"]])
+    sample_vectors = [samples[bounds[i]:bounds[i + 1]] for i in range(len(meta["clusters"]))]
+    return {
+        **meta, "centroids": centroids, "label_centroids": label_centroids, "idf": idf, "known": known,
+        "sample_vectors": sample_vectors,
+    }
+
+def save_state(path: str, state: dict):
+    """状態ファイルを1つの .npz としてアトミックに保存する。"""
+    meta = {
+        key: value for key, value in state.items()
+        if key not in ("centroids", "label_centroids", "idf", "known", "sample_vectors")
+    }
+    dim = state["centroids"].shape[1]
+    arrays = {
+        "meta": np.array(json.dumps(meta, ensure_ascii=False)),
+        "centroids": state["centroids"],
+        "label_centroids": state["label_centroids"],
+        "known": np.unique(state["known"]),
+        "sample_vectors": np.vstack([np.zeros((0, dim), dtype=np.float32), *state["sample_vectors"]]).astype(np.float32),
+    }
+    if state.get("idf") is not None:
+        arrays["idf"] = state["idf"]
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    state_store.atomic_write_bytes(path, buffer.getvalue())
+
+def _restore_vectorizer(state: dict):
+    """保存したベクトル化の状態を復元する。方式や次元が変わっていれば None を返す。"""
+    if state["vectorizer"] != config.LOCAL_EMBEDDING:
+        return None
+    vectorizer = local_clustering.get_vectorizer(state["vectorizer"])
+    if hasattr(vectorizer, "idf"):
+        if state["idf"] is None or len(state["idf"]) != vectorizer.n_features:
+            return None
+        vectorizer.idf = state["idf"]
+    return vectorizer
+
+def _closest(texts: list, vectors: np.ndarray, centroid: np.ndarray) -> tuple:
+    """中心に近い順に最大 SAMPLE_SIZE 件の (パッセージ, ベクトル) を返す（同じ文は1件にまとめる）。"""
+    order = np.argsort(-(vectors @ local_clustering.normalize_rows(centroid[None, :])[0]), kind="stable")
+    chosen, rows = [], []
+    for i in order:
+        if texts[i] not in chosen:
+            chosen.append(texts[i])
+            rows.append(i)
+            if len(chosen) == SAMPLE_SIZE:
+                break
+    return chosen, vectors[rows]
+
+def _set_samples(state: dict, index: int, texts: list, vectors: np.ndarray):
+    samples, sample_vectors = _closest(texts, vectors, state["centroids"][index])
+    state["clusters"][index]["samples"] = samples
+    state["sample_vectors"][index] = sample_vectors
+
+def _pool(state: dict, index: int, texts: list = (), vectors: np.ndarray | None = None) -> tuple:
+    """クラスターの代表パッセージに texts を加えた (パッセージ, ベクトル)。"""
+    pool_texts = state["clusters"][index]["samples"] + list(texts)
+    pool_vectors = state["sample_vectors"][index] if vectors is None else np.vstack([state["sample_vectors"][index], vectors])
+    return pool_texts, pool_vectors
+
+def rebuild(passages: list, vectorizer=None) -> dict:
+    """全パッセージからクラスターを作り直し、新しい状態を返す。"""
+    vectorizer = vectorizer or local_clustering.get_vectorizer()
+    groups = local_clustering.build_groups(passages, config.CLUSTER_COUNT, vectorizer)
+    print(f"{len(passages)}個のパッセージを{len(groups)}個のクラスターに分類しました。ラベルを付けています...")
+    labels = local_clustering.label_groups(groups, passages)
+    state = {
+        "version": STATE_VERSION,
+        "vectorizer": config.LOCAL_EMBEDDING,
+        "next_cluster_id": len(groups) + 1,
+        "n_passages": len(passages),
+        "document_frequency": _top(local_clustering.document_frequencies(passages), DF_LIMIT),
+        "clusters": [],
+        "centroids": np.array([group["vectors"].mean(axis=0) for group in groups], dtype=np.float32),
+        "label_centroids": None,
+        "idf": getattr(vectorizer, "idf", None),
+        "known": np.unique(passage_hashes(passages)),
+        "sample_vectors": [],
+    }
+    for index, (group, label) in enumerate(zip(groups, labels)):
+        state["clusters"].append({
+            "cluster_id": index + 1, **label,
+            "count": len(group["members"]),
+            "cohesion": _cohesion(state["centroids"][index]),
+            "terms": _top(local_clustering.keyword_counts(group["members"]), TERM_LIMIT),
+            "samples": [],
+        })
+        state["sample_vectors"].append(None)
+        _set_samples(state, index, group["members"], group["vectors"])
+    state["label_centroids"] = state["centroids"].copy()
+    return state
+
+def _inertia(vectors: np.ndarray, labels: np.ndarray) -> float:
+    """各点とその属するグループの平均との距離の二乗和。"""
+    return float(sum(((vectors[labels == c] - vectors[labels == c].mean(axis=0)) ** 2).sum() for c in np.unique(labels)))
+
+def _two_means(vectors: np.ndarray, previous: int, restarts: int = 5) -> np.ndarray:
+    """
+    点を2つに分ける。初期値を変えた k-means と「以前からの代表パッセージ / 今回のパッセージ」の分け方のうち、
+    距離の二乗和が最も小さいものを返す（分ける点は代表パッセージと今回の分だけなので軽い）。
+    """
+    candidates = [
+        local_clustering.kmeans(vectors, 2, seed=config.LOCAL_CLUSTERING_SEED + attempt)[0]
+        for attempt in range(restarts)
+    ]
+    if 0 < previous < len(vectors):
+        candidates.append((np.arange(len(vectors)) >= previous).astype(int))
+    return min(candidates, key=lambda labels: _inertia(vectors, labels))
+
+def _split(state: dict, index: int, new_texts: list, new_vectors: np.ndarray) -> list:
+    """
+    index のクラスターを、代表パッセージと今回加わったパッセージを2つに分けて分割する。
+    以前からの代表パッセージが多い方に元の cluster_id を残し、メンバー数は分けた件数の比で按分する。
+    戻り値: 変更されたクラスターの位置
+    """
+    cluster = state["clusters"][index]
+    previous = len(cluster["samples"])
+    texts, vectors = _pool(state, index, new_texts, new_vectors)
+    if len(texts) < 2:
+        return [index]
+    labels = _two_means(vectors, previous)
+    halves = sorted((np.flatnonzero(labels == c) for c in range(2)),
+                    key=lambda half: ((half < previous).sum(), len(half)), reverse=True)
+    if len(halves[1]) == 0:
+        return [index]
+    new_texts_half = [texts[i] for i in halves[1]]
+    new_count = max(1, round(cluster["count"] * len(halves[1]) / len(texts)))
+    new_terms = local_clustering.keyword_counts(new_texts_half)
+    new_cluster = {
+        "cluster_id": state["next_cluster_id"],
+        "theme": cluster["theme"], "summary": cluster["summary"], "keywords": cluster["keywords"],
+        "count": new_count, "terms": _top(new_terms, TERM_LIMIT), "samples": [],
+    }
+    state["next_cluster_id"] += 1
+    print(f"クラスター{cluster['cluster_id']}のまとまりが弱まったため、クラスター{new_cluster['cluster_id']}に分割しました。")
+    cluster["count"] = max(1, cluster["count"] - new_count)
+    cluster["terms"] = _top(Counter(cluster["terms"]) - new_terms, TERM_LIMIT)
+    state["clusters"].append(new_cluster)
+    state["sample_vectors"].append(None)
+    state["centroids"] = np.vstack([state["centroids"], vectors[halves[1]].mean(axis=0)])
+    state["centroids"][index] = vectors[halves[0]].mean(axis=0)
+    # 分けた2つは、凝集度の基準を今の値にし、ラベルを付け直す（ラベル付け時の中心を0にしておく）
+    state["label_centroids"] = np.vstack([state["label_centroids"], np.zeros_like(state["centroids"][index])])
+    state["label_centroids"][index] = 0
+    new_cluster["cohesion"] = _cohesion(state["centroids"][-1])
+    cluster["cohesion"] = _cohesion(state["centroids"][index])
+    _set_samples(state, index, [texts[i] for i in halves[0]], vectors[halves[0]])
+    _set_samples(state, len(state["clusters"]) - 1, new_texts_half, vectors[halves[1]])
+    return [index, len(state["clusters"]) - 1]
+
+def _merge_similar(state: dict, touched: set) -> set:
+    """変更されたクラスターと中心がよく似たクラスターを統合する。戻り値: 更新後の変更クラスターの位置"""
+    merged = True
+    while merged:
+        merged = False
+        for a in sorted(touched):
+            for b in range(len(state["clusters"])):
+                if a == b or _cosine(state["centroids"][a], state["centroids"][b]) < config.CLUSTER_MERGE_THRESHOLD:
+                    continue
+                keep, drop = sorted((a, b), key=lambda i: state["clusters"][i]["cluster_id"])
+                kept, dropped = state["clusters"][keep], state["clusters"][drop]
+                n_keep, n_drop = kept["count"], dropped["count"]
+                state["centroids"][keep] = (state["centroids"][keep] * n_keep + state["centroids"][drop] * n_drop) / (n_keep + n_drop)
+                kept["count"] = n_keep + n_drop
+                kept["terms"] = _top(Counter(kept["terms"]) + Counter(dropped["terms"]), TERM_LIMIT)
+                texts, vectors = _pool(state, keep, dropped["samples"], state["sample_vectors"][drop])
+                _set_samples(state, keep, texts, vectors)
+                kept["cohesion"] = _cohesion(state["centroids"][keep])
+                state["label_centroids"][keep] = 0
+                print(f"クラスター{dropped['cluster_id']}はクラスター{kept['cluster_id']}とほぼ同じ内容のため統合しました。")
+                del state["clusters"][drop]
+                del state["sample_vectors"][drop]
+                state["centroids"] = np.delete(state["centroids"], drop, axis=0)
+                state["label_centroids"] = np.delete(state["label_centroids"], drop, axis=0)
+                touched = {i - (i > drop) for i in touched | {keep} if i != drop}
+                merged = True
+                break
+            if merged:
+                break
+    return touched
+
+def update(state: dict, passages: list, vectorizer) -> dict:
+    """未知のパッセージだけをベクトル化して既存クラスターに割り当て、分割・統合・ラベルの付け直しを行う。"""
+    unique = list(dict.fromkeys(passages))
+    hashes = passage_hashes(unique)
+    is_new = ~np.isin(hashes, state["known"])
+    new_passages = [p for p, new in zip(unique, is_new) if new]
+    if not new_passages:
+        print("新しいパッセージが無いため、クラスターは前回のまま使います。")
+        return state
+    with tracing.span("clustering.incremental", passages=len(new_passages), clusters=len(state["clusters"])):
+        vectors = vectorizer.transform(new_passages)
+        state["known"] = np.union1d(state["known"], hashes[is_new])
+        state["n_passages"] += len(new_passages)
+        state["document_frequency"] = _top(
+            Counter(state["document_frequency"]) + local_clustering.document_frequencies(new_passages), DF_LIMIT
+        )
+        centroids = local_clustering.normalize_rows(state["centroids"])
+        assignments = (vectors @ centroids.T).argmax(axis=1)
+        touched, added = set(), {}
+        for index in np.unique(assignments):
+            rows = np.flatnonzero(assignments == index)
+            cluster = state["clusters"][index]
+            n = cluster["count"]
+            state["centroids"][index] = (state["centroids"][index] * n + vectors[rows].sum(axis=0)) / (n + len(rows))
+            cluster["count"] = n + len(rows)
+            texts = [new_passages[i] for i in rows]
+            cluster["terms"] = _top(Counter(cluster["terms"]) + local_clustering.keyword_counts(texts), TERM_LIMIT)
+            added[int(index)] = (texts, vectors[rows])
+            touched.add(int(index))
+        print(f"{len(new_passages)}個の新しいパッセージを{len(touched)}個のクラスターに割り当てました。")
+
+        for index in sorted(touched):
+            cluster = state["clusters"][index]
+            drift = cluster.get("cohesion", 0.0) - _cohesion(state["centroids"][index])
+            if drift > config.CLUSTER_DRIFT_THRESHOLD and cluster["count"] >= MIN_SPLIT_SIZE:
+                touched.update(_split(state, index, *added[index]))
+            else:
+                _set_samples(state, index, *_pool(state, index, *added[index]))
+        touched = _merge_similar(state, touched)
+
+    # 分割・統合したクラスターと、中心がラベル付け時から大きく動いたクラスターだけ、
+    # 代表パッセージと保存したキーワード候補からラベルを付け直す
+    order = [
+        index for index in sorted(touched)
+        if 1.0 - _cosine(state["centroids"][index], state["label_centroids"][index]) >= config.CLUSTER_RELABEL_THRESHOLD
+    ]
+    if len(order) < len(touched):
+        print(f"中心がほとんど動いていない{len(touched) - len(order)}個のクラスターは、ラベルをそのまま使います。")
+    groups = [
+        {
+            "members": state["clusters"][index]["samples"],
+            "vectors": state["sample_vectors"][index],
+            "center": local_clustering.normalize_rows(state["centroids"][index][None, :])[0],
+            "keywords": local_clustering.score_keywords(
+                state["clusters"][index]["terms"], state["document_frequency"], state["n_passages"]
+            ),
+        }
+        for index in order
+    ]
+    for index, label in zip(order, local_clustering.label_groups(groups, None)):
+        state["clusters"][index].update(label)
+        state["label_centroids"][index] = state["centroids"][index]
+    return state
+
+def clusters_from_state(state: dict) -> dict:
+    """状態から activity_clusters.json 形式の辞書を作る（cluster_id 順）。"""
+    return {
+        "clusters": [
+            {key: cluster[key] for key in ("cluster_id", "theme", "summary", "keywords")}
+            for cluster in sorted(state["clusters"], key=lambda c: c["cluster_id"])
+        ]
+    }
+
+def update_clusters(passages: list, state_path: str) -> dict:
+    """
+    状態ファイルがあれば増分で、無ければ全体からクラスタリングし、状態を保存して activity_clusters.json 形式の辞書を返す。
+    """
+    if not passages:
+        raise ValueError("クラスタリング対象のテキストが空です。")
+    state = load_state(state_path)
+    vectorizer = _restore_vectorizer(state) if state else None
+    if vectorizer is None:
+        print("クラスターの状態が無いため、全体からクラスタリングします。")
+        state = rebuild(passages)
+    else:
+        state = update(state, passages, vectorizer)
+    with tracing.span("persist.cluster_state"):
+        save_state(state_path, state)
+    return clusters_from_state(state)
@@ -0,0 +1,129 @@
+# src/json_extract.py
+import re
+import json
+
+# Gemini の出力からJSONオブジェクトを取り出す共通モジュール。
+# "{" の位置ごとに json.JSONDecoder.raw_decode で解析し、最初に完結したオブジェクトを返す。
+# ```json フェンスの有無やフェンスの入れ子に関係なく動き、ストリーミング応答にもチャンク単位で使える。
+
+_decoder = json.JSONDecoder()
+# JSONオブジェクトになりうる "{"（直後が空白を挟んで '"' か '}'）。{theme} のような括弧は解析を試さない
+_CANDIDATE = re.compile(r'\{\s*["}]')
+# テキスト末尾の "{"（続きのチャンクで候補になりうる）
+_TRAILING_OPEN = re.compile(r'\{\s*\Z')
+# 解析エラーがテキスト末尾からこの文字数以内なら、続きのチャンクで完結しうるとみなす
+# （"tru" のような途中のリテラルや "\u12" のような途中のエスケープは、末尾の数文字手前でエラーになる）
+TRUNCATION_MARGIN = 6
+
+
+class JsonExtractionError(ValueError):
+    """JSONを抽出できなかったことを、元テキスト上の位置情報付きで表す例外。"""
+
+    def __init__(self, message: str, text: str, position: int | None):
+        self.position = position
+        if position is not None:
+            self.line = text.count('\n', 0, position) + 1
+            self.column = position - (text.rfind('\n', 0, position) + 1) + 1
+            snippet = text[max(0, position - 20):position + 20].replace('\n', '\\n')
+            message = f"{message} (位置 {position}, {self.line}行 {self.column}列付近: ...{snippet}...)"
+        else:
+            self.line = self.column = None
+        super().__init__(message)
+
+
+class StreamingJsonExtractor:
+    """
+    チャンクを順に受け取り、最初に完結したJSONオブジェクトを取り出す。
+    候補の "{" 以降の "{" と "}" の数が釣り合った時だけ解析を試すので、長い応答でも解析し直すのは数回で済む。
+    括弧の数は文字列の中も含めて数えるため、文字列に "{" が多いと完結の検出が close() まで遅れることがある。
+    JSONではない "{" は一度失敗した時点で読み飛ばし、次の候補から探す。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.result = None
+        self._pos = 0        # 次に候補の "{" を探し始める位置
+        self._open = 0       # _pos 以降の "{" の数 - "}" の数
+        self._error = None   # 最初に失敗した候補の (位置, メッセージ)
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str):
+        """チャンクを追加して走査を進める。JSONが完結していればそのオブジェクトを返す。"""
+        if chunk and self.result is None:
+            self.text += chunk
+            self._open += chunk.count('{') - chunk.count('}')
+            if '}' in chunk and self._open <= 0:
+                self._scan(final=False)
+        return self.result
+
+    def _move_to(self, pos: int):
+        self._pos = pos
+        self._open = self.text.count('{', pos) - self.text.count('}', pos)
+
+    def _scan(self, final: bool):
+        text = self.text
+        while True:
+            match = _CANDIDATE.search(text, self._pos)
+            if match is None:
+                trailing = None if final else _TRAILING_OPEN.search(text, self._pos)
+                self._move_to(trailing.start() if trailing else len(text))
+                return
+            start = match.start()
+            try:
+                self.result, self._pos = _decoder.raw_decode(text, start)
+                return
+            except json.JSONDecodeError as e:
+                truncated = e.pos >= len(text) - (0 if final else TRUNCATION_MARGIN) or e.msg.startswith("Unterminated string")
+                if truncated and not final:
+                    # 続きのチャンクで完結しうるので、この候補から解析し直す
+                    self._move_to(start)
+                    return
+                if self._error is None:
+                    self._error = (start, "JSONが途中で終わっています") if truncated else (e.pos, e.msg)
+                # JSONではない括弧だったので、その直後から次の候補を探す
+                self._pos = start + 1
+
+    def close(self):
+        """入力の終わりを通知し、抽出したオブジェクトを返す。抽出できなければ JsonExtractionError。"""
+        if self.result is None:
+            self._scan(final=True)
+        if self.result is not None:
+            return self.result
+        if self._error is None:
+            raise JsonExtractionError("Geminiの応答にJSONオブジェクトが見つかりませんでした。", self.text, None)
+        position, message = self._error
+        raise JsonExtractionError(f"Geminiの応答からJSONデータを抽出できませんでした: {message}", self.text, position)
+
+
+def extract_json(text: str):
+    """テキスト（フェンス付き・なし）から最初のJSONオブジェクトを取り出す。"""
+    extractor = StreamingJsonExtractor()
+    extractor.feed(text)
+    return extractor.close()
+
+
+def find_string_field(text: str, field: str) -> str | None:
+    """
+    生成途中のテキストから、文字列フィールド "field": "..." の値を取り出す。
+    値の閉じ引用符までが届いていなければ None を返す（ストリーミング中の早期取り出し用）。
+    """
+    match = re.search(r'"' + re.escape(field) + r'"\s*:\s*"', text)
+    if not match:
+        return None
+    start = match.end() - 1
+    i = start + 1
+    while i < len(text):
+        c = text[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '"':
+            try:
+                return json.loads(text[start:i + 1])
+            except json.JSONDecodeError:
+                return None
+        i += 1
+    return None
@@ -0,0 +1,244 @@
+# src/knowledge_index.py
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import knowledge_log, state_store, tracing
+
+# 知識ログを検索するための SQLite 索引。
+# - created_at / topic_id / theme に索引を張り、「テーマXのエントリ」「直近7日」「最新のツイート」を全件読まずに引ける
+# - ツイートと調査内容は FTS5（trigram。日本語の部分一致に対応）で全文検索できる
+# - 長期ログ（JSON Lines）はどこまで取り込んだかのバイト位置を記録し、追記された分だけを取り込む
+# - JSON Lines の無い旧形式（{"knowledge_entries": [...]}）は、ファイルが更新された時だけ全体を取り込み直す
+# 索引はログから作り直せるため CACHE_DIR に置く（ログ1つにつきDB1つ）。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+INDEX_DIR = os.path.join(PROJECT_ROOT, config.CACHE_DIR, 'knowledge_index')
+FTS_MIN_QUERY_CHARS = 3   # trigram で検索できる最短の文字数（これより短い語は LIKE で探す）
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS entries (
+        id INTEGER PRIMARY KEY,
+        created_at TEXT,
+        topic_id INTEGER,
+        theme TEXT,
+        tweet TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        entry TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_entries_created_at ON entries (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_topic_id ON entries (topic_id)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_theme ON entries (theme)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+]
+_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+    "tweet, summary, content='entries', content_rowid='id', tokenize='trigram')"
+)
+
+
+def db_path_for(json_path: str) -> str:
+    """ログのパスに対応する索引DBのパス（同名の別ディレクトリのログと衝突しないようハッシュを付ける）。"""
+    absolute = os.path.abspath(json_path)
+    digest = hashlib.sha256(absolute.encode('utf-8')).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(absolute))[0]
+    return os.path.join(INDEX_DIR, f"{name}-{digest}.sqlite3")
+
+def _summary_of(entry: dict) -> str:
+    """全文検索の対象にする調査内容（調査レポートの各項目や詳細）を1つの文字列にする。"""
+    summary = entry.get("research_summary") or entry.get("details") or ""
+    if isinstance(summary, dict):
+        return "\n".join(str(value) for value in summary.values() if value)
+    return str(summary)
+
+def _row_of(entry: dict) -> tuple:
+    topic_id = entry.get("topic_id")
+    return (
+        entry.get("created_at"),
+        topic_id if isinstance(topic_id, int) else None,
+        entry.get("theme"),
+        knowledge_log.tweet_of(entry),
+        _summary_of(entry),
+        json.dumps(entry, ensure_ascii=False),
+    )
+
+
+class KnowledgeIndex:
+    """1つの知識ログに対応する SQLite 索引。"""
+
+    def __init__(self, json_path: str, db_path: str | None = None):
+        self.json_path = json_path
+        self.db_path = db_path or db_path_for(json_path)
+        self.has_fts = None
+
+    @contextmanager
+    def _connect(self):
+        """索引DBに接続し、ブロックを抜けたらコミットして閉じる。"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        if self.has_fts is None:
+            try:
+                conn.execute(_FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                # FTS5 や trigram に対応していない SQLite では LIKE で検索する
+                print("警告: この SQLite は FTS5（trigram）に対応していないため、全文検索は LIKE で行います。")
+                self.has_fts = False
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_meta(self, conn, key: str, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key: str, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _insert(self, conn, entries: list):
+        for entry in entries:
+            row_id = conn.execute(
+                "INSERT INTO entries (created_at, topic_id, theme, tweet, summary, entry) VALUES (?, ?, ?, ?, ?, ?)",
+                _row_of(entry),
+            ).lastrowid
+            if self.has_fts:
+                conn.execute(
+                    "INSERT INTO entries_fts (rowid, tweet, summary) VALUES (?, ?, ?)",
+                    (row_id, knowledge_log.tweet_of(entry), _summary_of(entry)),
+                )
+
+    def _clear(self, conn):
+        conn.execute("DELETE FROM entries")
+        if self.has_fts:
+            conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('delete-all')")
+
+    def sync(self) -> int:
+        """
+        ログの更新分を索引に取り込む。
+        戻り値: 取り込んだエントリ数
+        """
+        jsonl_path = knowledge_log.jsonl_path_for(self.json_path)
+        with tracing.span("knowledge_index.sync"), self._connect() as conn:
+            # 取り込み位置の読み出し・追加・位置の更新を1つの書き込みトランザクションで行う
+            # （同時に同期した別のプロセスが、同じ末尾を二重に取り込まないように）
+            conn.execute("BEGIN IMMEDIATE")
+            if os.path.exists(jsonl_path):
+                added = self._sync_jsonl(conn, jsonl_path)
+            else:
+                added = self._sync_json(conn)
+            tracing.set_attrs(added=added)
+        return added
+
+    def _sync_jsonl(self, conn, jsonl_path: str) -> int:
+        offset = int(self._get_meta(conn, "jsonl_offset", 0))
+        if self._get_meta(conn, "mode") != "jsonl" or offset > os.path.getsize(jsonl_path):
+            # 旧形式から移行した・ログが作り直された場合は最初から取り込む
+            self._clear(conn)
+            offset = 0
+        entries = []
+        for entry, offset in knowledge_log.iter_entries_since(self.json_path, offset):
+            entries.append(entry)
+        self._insert(conn, entries)
+        self._set_meta(conn, "mode", "jsonl")
+        self._set_meta(conn, "jsonl_offset", offset)
+        return len(entries)
+
+    def _sync_json(self, conn) -> int:
+        if not os.path.exists(self.json_path):
+            raise FileNotFoundError(f"知識ベースファイルが見つかりません: {self.json_path}")
+        st = os.stat(self.json_path)
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        if self._get_meta(conn, "mode") == "json" and self._get_meta(conn, "json_stamp") == stamp:
+            return 0
+        self._clear(conn)
+        count = 0
+        # 全体を読み込まず、エントリを1件ずつ取り込む
+        for entry in state_store.iter_knowledge_entries(self.json_path):
+            self._insert(conn, [entry])
+            count += 1
+        self._set_meta(conn, "mode", "json")
+        self._set_meta(conn, "json_stamp", stamp)
+        return count
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._connect() as conn:
+            return [json.loads(row[0]) for row in conn.execute(sql, params)]
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def latest(self, limit: int = 1) -> list:
+        """最後に追記されたエントリから順に返す。"""
+        return self._query("SELECT entry FROM entries ORDER BY id DESC LIMIT ?", (limit,))
+
+    def latest_tweet(self) -> str:
+        """最後に追記されたツイート本文を返す（ツイートの無いエントリは飛ばす）。"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT tweet FROM entries WHERE tweet != '' ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else ""
+
+    def by_theme(self, theme: str, limit: int = 100) -> list:
+        return self._query("SELECT entry FROM entries WHERE theme = ? ORDER BY id DESC LIMIT ?", (theme, limit))
+
+    def by_topic(self, topic_id: int, limit: int = 100) -> list:
+        return self._query("SELECT entry FROM entries WHERE topic_id = ? ORDER BY id DESC LIMIT ?", (topic_id, limit))
+
+    def since(self, start: datetime | None = None, days: float | None = None, limit: int = 1000) -> list:
+        """created_at が start 以降（または直近 days 日）のエントリを新しい順に返す。"""
+        start = start or datetime.now() - timedelta(days=days or 0)
+        return self._query(
+            "SELECT entry FROM entries WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+            (start.isoformat(), limit),
+        )
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """ツイートと調査内容を全文検索し、関連度の高い順に返す。"""
+        query = query.strip()
+        if not query:
+            return []
+        with self._connect() as conn:
+            if self.has_fts and len(query) >= FTS_MIN_QUERY_CHARS:
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = conn.execute(
+                    "SELECT entries.entry FROM entries_fts JOIN entries ON entries.id = entries_fts.rowid "
+                    "WHERE entries_fts MATCH ? ORDER BY bm25(entries_fts) LIMIT ?",
+                    (phrase, limit),
+                )
+            else:
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                rows = conn.execute(
+                    "SELECT entry FROM entries WHERE tweet LIKE ? ESCAPE '\\' OR summary LIKE ? ESCAPE '\\' "
+                    "ORDER BY id DESC LIMIT ?",
+                    (pattern, pattern, limit),
+                )
+            return [json.loads(row[0]) for row in rows]
+
+
+def open_index(json_path: str, db_path: str | None = None) -> KnowledgeIndex:
+    """ログの索引を開き、更新分を取り込んでから返す。"""
+    index = KnowledgeIndex(json_path, db_path)
+    index.sync()
+    return index
+
+if __name__ == "__main__":
+    # 例: python src/knowledge_index.py data/knowledge_base/all_knowledge_log.json 自己実現
+    if len(sys.argv) < 2:
+        print("使い方: python src/knowledge_index.py <ログのパス> [検索語]")
+        sys.exit(1)
+    index = open_index(sys.argv[1])
+    print(f"{index.count()}件のエントリを索引しています（{index.db_path}）。")
+    results = index.search(sys.argv[2]) if len(sys.argv) > 2 else index.latest(5)
+    for entry in results:
+        print(f"- [{entry.get('created_at')}] {entry.get('theme')}: {knowledge_log.tweet_of(entry)}")
@@ -0,0 +1,207 @@
+# src/knowledge_loader.py
+import os
+import sys
+import hashlib
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import state_store, tracing
+
+# 知識ソース（docx / txt / md）の読み込み。
+# - 抽出したテキストは、ファイル内容の SHA-256 をキーに CACHE_DIR/knowledge_text/ に保存する（内容アドレス方式）
+# - パス・サイズ・mtime の対応を manifest.json に記録し、変わっていないファイルはハッシュ計算も省く
+# - 変更されたファイルだけを解析し、複数ある場合は KNOWLEDGE_LOADER_WORKERS 個のプロセスで並列に解析する
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+TEXT_DIR = os.path.join(PROJECT_ROOT, config.CACHE_DIR, 'knowledge_text')
+SUPPORTED_EXTENSIONS = ('.docx', '.txt', '.md')
+# KNOWLEDGE_BASE_DIR にあっても知識ソースとして読まないファイル。
+# concept_summary.md は概念化サイクルが書き出す要約（同じ概念を二重に数えないため）、
+# persona.txt はベースファイルとして別に読み込む。*.json / *.jsonl は拡張子で対象外になる
+GENERATED_FILES = ('concept_summary.md', 'persona.txt')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "files": 0,
+    "parsed": 0,
+    "cache_hits": 0,
+    "errors": 0,
+}
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+def knowledge_base_dir() -> str:
+    """KNOWLEDGE_BASE_DIR（プロジェクトルートからの相対パス、または絶対パス）を返す。"""
+    return os.path.join(PROJECT_ROOT, config.KNOWLEDGE_BASE_DIR)
+
+def manifest_path() -> str:
+    return os.path.join(TEXT_DIR, 'manifest.json')
+
+def text_path_for(digest: str) -> str:
+    return os.path.join(TEXT_DIR, f"{digest}.txt")
+
+def is_supported(path: str) -> bool:
+    name = os.path.basename(path)
+    # Word が編集中に作るロックファイル（~$xxx.docx）や隠しファイルは読まない
+    return path.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith(('~$', '.'))
+
+def list_documents(directory: str) -> list:
+    """directory 以下（サブディレクトリを含む）の知識ソースのパスを並べて返す（ボットが書き出したファイルは除く）。"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        paths.extend(
+            os.path.join(root, name) for name in sorted(files)
+            if is_supported(name) and name.lower() not in GENERATED_FILES
+        )
+    return paths
+
+def extract_text(path: str) -> str:
+    """ファイルからテキストを抽出する（docx は全段落、txt / md は全文）。プロセスプールからも呼ばれる。"""
+    if path.lower().endswith('.docx'):
+        from docx import Document
+        document = Document(path)
+        return "\n".join(para.text for para in document.paragraphs if para.text.strip())
+    if path.lower().endswith(('.txt', '.md')):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    raise ValueError(f"対応していないファイル形式です: {path}")
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    tracing.record_bytes_read(os.path.getsize(path))
+    return digest.hexdigest()
+
+def _read_cached_text(digest: str) -> str | None:
+    try:
+        with open(text_path_for(digest), 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    tracing.record_bytes_read(len(raw))
+    return raw.decode('utf-8')
+
+def _parse_all(paths: list) -> dict:
+    """paths を解析して {path: テキストまたは例外} を返す。2件以上ならプロセスプールで並列に解析する。"""
+    results = {}
+    # 1コアの環境ではプロセスを起動する分だけ遅くなるため、CPU数を上限にする
+    workers = min(config.KNOWLEDGE_LOADER_WORKERS, os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        for path in paths:
+            try:
+                results[path] = extract_text(path)
+            except Exception as e:
+                results[path] = e
+        return results
+    # multiprocessing の読み込みは起動時間に響くため、実際に並列で解析する時まで遅延する
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {path: executor.submit(extract_text, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+    return results
+
+def load_texts(paths: list) -> dict:
+    """
+    各ファイルのテキストを {path: {"sha256", "text"}} で返す。
+    変更のないファイルはキャッシュから読み、変更されたファイルだけを解析する。
+    解析に失敗したファイルは警告を出して結果から除く。
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    with _lock, tracing.span("knowledge_loader.load", files=len(paths)):
+        manifest = state_store.read_json(manifest_path(), {})
+        changed = False
+        digests, documents, to_parse = {}, {}, {}
+        for path in paths:
+            st = os.stat(path)
+            stamp = [st.st_mtime_ns, st.st_size]
+            record = manifest.get(path)
+            # サイズ・mtime が同じならハッシュを計算し直さない
+            if record and record.get("stamp") == stamp:
+                digest = record["sha256"]
+            else:
+                digest = file_digest(path)
+                manifest[path] = {"stamp": stamp, "sha256": digest}
+                changed = True
+            digests[path] = digest
+            text = _read_cached_text(digest)
+            if text is None:
+                to_parse.setdefault(digest, path)
+            else:
+                documents[path] = {"sha256": digest, "text": text}
+
+        parsed = _parse_all(list(to_parse.values()))
+        for digest, source in to_parse.items():
+            if isinstance(parsed[source], Exception):
+                print(f"警告: 知識ソースを読み込めませんでした - {source}: {parsed[source]}")
+                _count("errors")
+            else:
+                # 解析はプロセスプールで行うこともあるため、読んだバイト数はこちらで計上する
+                tracing.record_bytes_read(os.path.getsize(source))
+                state_store.atomic_write_text(text_path_for(digest), parsed[source])
+        for path, digest in digests.items():
+            if path in documents:
+                continue
+            text = parsed[to_parse[digest]]
+            if isinstance(text, Exception):
+                # 失敗したファイルは次回も解析し直す
+                manifest.pop(path, None)
+            else:
+                documents[path] = {"sha256": digest, "text": text}
+
+        # 消えたファイルは記録から外す（テキスト本体は同じ内容の別ファイルが参照しうるので残す）
+        for path in [p for p in manifest if not os.path.exists(p)]:
+            del manifest[path]
+            changed = True
+        if changed or to_parse:
+            state_store.atomic_write_json(manifest_path(), manifest)
+        _count("files", len(paths))
+        _count("parsed", len(to_parse))
+        _count("cache_hits", len(paths) - len(to_parse))
+        tracing.set_attrs(parsed=len(to_parse))
+    return documents
+
+def load_text(path: str) -> str:
+    """1つのファイルのテキストを返す（キャッシュを使う）。"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"エラー: ファイルが見つかりません - {path}")
+    if not is_supported(path):
+        raise ValueError("対応していないファイル形式です。")
+    document = load_texts([path]).get(os.path.abspath(path))
+    if document is None:
+        raise IOError(f"ファイルの読み込み中にエラーが発生しました: {path}")
+    return document["text"]
+
+def load_documents(directory: str | None = None) -> list:
+    """
+    directory（省略時は KNOWLEDGE_BASE_DIR）以下の全ての知識ソースを読み込み、
+    [{"path", "sha256", "text"}] をパス順で返す。ディレクトリが無ければ警告を出して空のリストを返す。
+    """
+    directory = knowledge_base_dir() if directory is None else directory
+    if not os.path.isdir(directory):
+        print(f"警告: 知識ソースのディレクトリが見つかりません（KNOWLEDGE_BASE_DIR を確認してください） - {directory}")
+        return []
+    documents = load_texts(list_documents(directory))
+    return [{"path": path, **document} for path, document in sorted(documents.items())]
+
+def get_stats() -> dict:
+    """今回の実行で読み込んだファイル数・解析したファイル数・キャッシュから読んだファイル数を返す。"""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,116 @@
+# src/knowledge_log.py
+import os
+import json
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src import state_store, tracing
+
+# 長期記憶（all_knowledge_log）は追記専用の JSON Lines 形式で保存する。
+# 1エントリ = 1行 なので、投稿ごとの書き込みは履歴の長さに依存しない。
+# 既存ツール向けの {"knowledge_entries": [...]} 形式は compact() で書き出す。
+
+
+def tweet_of(entry: dict) -> str:
+    """エントリのツイート本文を返す（新形式 character_post.tweet と旧形式 tweet / generated_tweet の両対応）。"""
+    return (entry.get("character_post") or {}).get("tweet") or entry.get("tweet") or entry.get("generated_tweet") or ""
+
+def jsonl_path_for(json_path: str) -> str:
+    """JSONログのパスから、対応するJSON Linesファイルのパスを返す。"""
+    return os.path.splitext(json_path)[0] + '.jsonl'
+
+def _migrate_unlocked(json_path: str) -> bool:
+    jsonl_path = jsonl_path_for(json_path)
+    if os.path.exists(jsonl_path) or not os.path.exists(json_path):
+        return False
+    data = state_store.read_json(json_path, {"knowledge_entries": []})
+    entries = data.get("knowledge_entries", [])
+    state_store.atomic_write_text(
+        jsonl_path,
+        "".join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries),
+    )
+    print(f"長期ログを JSON Lines 形式に移行しました: {jsonl_path} ({len(entries)}件)")
+    return True
+
+def migrate_json_log(json_path: str) -> bool:
+    """
+    旧形式のJSONログ（{"knowledge_entries": [...]}）をJSON Lines形式に変換する。
+    JSON Linesファイルが既に存在する場合は何もしない。
+    戻り値: 変換を行った場合はTrue
+    """
+    if os.path.exists(jsonl_path_for(json_path)):
+        return False
+    with state_store.file_lock(jsonl_path_for(json_path)):
+        return _migrate_unlocked(json_path)
+
+def append_entry(json_path: str, entry: dict):
+    """エントリを1件だけ長期ログの末尾に追記する（初回は旧形式から自動移行）。"""
+    jsonl_path = jsonl_path_for(json_path)
+    line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+    with state_store.file_lock(jsonl_path):
+        _migrate_unlocked(json_path)
+        with open(jsonl_path, 'a+b') as f:
+            # 前回の書き込みが途中で中断されていた場合は、その行を閉じてから追記する
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+    tracing.record_bytes_written(len(line))
+
+def iter_entries(json_path: str):
+    """長期ログのエントリを先頭から順に1件ずつ返すイテレータ。"""
+    migrate_json_log(json_path)
+    jsonl_path = jsonl_path_for(json_path)
+    if not os.path.exists(jsonl_path):
+        return
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            # 書き込み途中で中断された最終行（改行なし）は無視する
+            if not line.endswith('\n') or not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"警告: 長期ログの破損した行をスキップしました: {line[:50]}")
+
+def iter_entries_since(json_path: str, offset: int = 0):
+    """
+    長期ログのバイト位置 offset 以降のエントリを (エントリ, 次の行のバイト位置) の組で返すイテレータ。
+    前回読み終えた位置を覚えておけば、追記された分だけを読める。
+    """
+    migrate_json_log(json_path)
+    jsonl_path = jsonl_path_for(json_path)
+    if not os.path.exists(jsonl_path):
+        return
+    with open(jsonl_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            # 書き込み途中で中断された最終行（改行なし）は、次回読み直せるよう位置を進めない
+            if not line.endswith(b'\n'):
+                return
+            offset += len(line)
+            tracing.record_bytes_read(len(line))
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line.decode('utf-8')), offset
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                print(f"警告: 長期ログの破損した行をスキップしました: {line[:50]}")
+
+def load_entries(json_path: str) -> list:
+    """長期ログの全エントリをリストとして返す。"""
+    return list(iter_entries(json_path))
+
+def compact(json_path: str) -> int:
+    """
+    JSON Linesの長期ログを、既存ツール互換の {"knowledge_entries": [...]} 形式で
+    json_path に書き出す。
+    戻り値: 書き出したエントリ数
+    """
+    entries = load_entries(json_path)
+    state_store.atomic_write_json(json_path, {"knowledge_entries": entries})
+    print(f"長期ログを {json_path} に書き出しました ({len(entries)}件)。")
+    return len(entries)
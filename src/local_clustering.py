@@ -0,0 +1,279 @@
+# src/local_clustering.py
+import os
+import re
+import sys
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import cluster_document, gemini_client, retry, json_extract, tracing
+
+# ローカルのクラスタリングエンジン（CLUSTERING_ENGINE=local）。
+# テキストを文単位のパッセージに分け、ベクトル化（既定は文字n-gramのハッシュ＋TF-IDF、CPUのみ）して NumPy の k-means で分類する。
+# Gemini はクラスターごとのテーマ名・要約・キーワードを付ける短い呼び出しにだけ使う。
+# 出力は activity_clusters.json と同じ {"clusters": [{cluster_id, theme, summary, keywords}]} 形式。
+
+PASSAGE_MAX_CHARS = 300
+REPRESENTATIVE_PASSAGES = 3   # ラベル付けに渡す、中心に近いパッセージの数
+KEYWORD_PATTERN = re.compile(r"[一-龥々〆ヵヶ]{2,}|[ァ-ヴー]{2,}|[A-Za-z][A-Za-z0-9\-]+")
+
+
+class HashingVectorizer:
+    """文字n-gramをハッシュして固定次元のTF-IDFベクトルにする（語彙の保持が不要で、結果は決定的）。"""
+
+    def __init__(self, n_features: int = 4096, ngram_range: tuple = (2, 3)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.idf = None
+
+    def _counts(self, text: str) -> Counter:
+        text = re.sub(r"\s+", " ", text.lower())
+        counts = Counter()
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            for i in range(len(text) - n + 1):
+                # Python の hash() は実行ごとに変わるため、crc32 で安定させる
+                counts[zlib.crc32(text[i:i + n].encode('utf-8')) % self.n_features] += 1
+        return counts
+
+    def _term_frequencies(self, texts: list) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = self._counts(text)
+            if counts:
+                matrix[row, list(counts.keys())] = list(counts.values())
+        return np.log1p(matrix)
+
+    def fit(self, texts: list):
+        document_frequency = (self._term_frequencies(texts) > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts: list) -> np.ndarray:
+        matrix = self._term_frequencies(texts)
+        if self.idf is not None:
+            matrix *= self.idf
+        return normalize_rows(matrix)
+
+    def fit_transform(self, texts: list) -> np.ndarray:
+        return self.fit(texts).transform(texts)
+
+
+class GeminiEmbeddingVectorizer:
+    """Gemini の埋め込みモデルでベクトル化する（LOCAL_EMBEDDING=gemini）。"""
+
+    BATCH_SIZE = 100
+
+    def fit(self, texts: list):
+        return self
+
+    def transform(self, texts: list) -> np.ndarray:
+        client = gemini_client.get_client()
+        vectors = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            response = retry.call(
+                client.models.embed_content,
+                model=config.LOCAL_EMBEDDING_MODEL,
+                contents=texts[start:start + self.BATCH_SIZE],
+                site="埋め込み",
+            )
+            vectors.extend(embedding.values for embedding in response.embeddings)
+        return normalize_rows(np.array(vectors, dtype=np.float32))
+
+    def fit_transform(self, texts: list) -> np.ndarray:
+        return self.transform(texts)
+
+
+VECTORIZERS = {
+    "hashing": HashingVectorizer,
+    "gemini": GeminiEmbeddingVectorizer,
+}
+
+def register_vectorizer(name: str, factory):
+    """ベクトル化方式を追加する。factory() は fit / transform / fit_transform を持つオブジェクトを返すこと。"""
+    VECTORIZERS[name] = factory
+
+def get_vectorizer(name: str | None = None):
+    name = name or config.LOCAL_EMBEDDING
+    if name not in VECTORIZERS:
+        raise ValueError(f"未対応のベクトル化方式です: {name}（対応: {', '.join(VECTORIZERS)}）")
+    return VECTORIZERS[name]()
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_MAX_CHARS) -> list:
+    """テキストを文（。や改行）の区切りで、max_chars 程度のパッセージにまとめる。"""
+    sentences = [s.strip() for s in re.split(r"(?<=[。！？!?])|\n+", text) if s and s.strip()]
+    passages, current = [], ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) > max_chars:
+            passages.append(current)
+            current = ""
+        current += sentence
+    if current:
+        passages.append(current)
+    return passages
+
+def kmeans(vectors: np.ndarray, k: int, seed: int = 0, max_iter: int = 100, tol: float = 1e-5) -> tuple:
+    """
+    k-means++ で初期化した k-means。
+    戻り値: (各行のクラスター番号, 中心ベクトルの行列)
+    """
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    k = max(1, min(k, n))
+    squared_norms = (vectors ** 2).sum(axis=1)
+
+    def _distances(centers):
+        return np.maximum(squared_norms[:, None] - 2 * vectors @ centers.T + (centers ** 2).sum(axis=1)[None, :], 0)
+
+    centers = [vectors[rng.integers(n)]]
+    closest = _distances(np.array(centers))[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centers.append(vectors[index])
+        closest = np.minimum(closest, _distances(vectors[index][None, :])[:, 0])
+    centers = np.array(centers)
+
+    for _ in range(max_iter):
+        distances = _distances(centers)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        new_centers = np.zeros_like(centers)
+        np.add.at(new_centers, labels, vectors)
+        for cluster in np.flatnonzero(counts == 0):
+            # 空になったクラスターは、現在最も中心から遠い点で作り直す
+            farthest = distances[np.arange(n), labels].argmax()
+            new_centers[cluster] = vectors[farthest]
+            counts[cluster] = 1
+            labels[farthest] = cluster
+        new_centers /= counts[:, None]
+        shift = np.linalg.norm(new_centers - centers)
+        centers = new_centers
+        if shift < tol:
+            break
+    labels = _distances(centers).argmin(axis=1)
+    return labels, centers
+
+def keyword_counts(passages: list) -> Counter:
+    """パッセージに現れるキーワード候補の出現回数。"""
+    return Counter(word for passage in passages for word in KEYWORD_PATTERN.findall(passage))
+
+def document_frequencies(passages: list) -> Counter:
+    """キーワード候補ごとの、それを含むパッセージの数。"""
+    document_frequency = Counter()
+    for passage in passages:
+        document_frequency.update(set(KEYWORD_PATTERN.findall(passage)))
+    return document_frequency
+
+def score_keywords(counts: Counter, document_frequency: Counter, n: int, top: int = 8) -> list:
+    """クラスター内の出現回数 × 全体での希少さ（n 件中の文書頻度）が高い語を返す。"""
+    scored = {word: count * np.log((1 + n) / (1 + document_frequency.get(word, 0))) for word, count in counts.items()}
+    return [word for word, _ in sorted(scored.items(), key=lambda kv: (-kv[1], kv[0]))[:top]]
+
+def candidate_keywords(cluster_passages: list, all_passages: list, top: int = 8) -> list:
+    """クラスター内で特徴的な語（クラスター内の出現頻度 × 全体での希少さ）を返す。"""
+    return score_keywords(keyword_counts(cluster_passages), document_frequencies(all_passages), len(all_passages), top)
+
+def representative_passages(passages: list, vectors: np.ndarray, center: np.ndarray, count: int = REPRESENTATIVE_PASSAGES) -> list:
+    """中心ベクトルに近い順にパッセージを返す。"""
+    order = np.argsort(-(vectors @ center))
+    return [passages[i] for i in order[:count]]
+
+def _fallback_label(representatives: list, keywords: list) -> dict:
+    return {
+        "theme": "・".join(keywords[:2]) or representatives[0][:20],
+        "summary": representatives[0][:100],
+        "keywords": keywords[:6],
+    }
+
+def label_cluster(representatives: list, keywords: list) -> dict:
+    """クラスターの代表パッセージと候補キーワードから、Gemini でテーマ名・要約・キーワードを付ける。"""
+    excerpts = "\n".join(f"- {p}" for p in representatives)
+    prompt = f"""
+    以下は、あるトピックのクラスターに属するテキストの抜粋と、その候補キーワードです。
+    このクラスターを表す短いテーマ名（20字以内）、要約（100字程度）、キーワード（最大6個）を考え、
+    必ず以下のJSON形式だけで出力してください。
+
+    ```json
+    {{"theme": "テーマ名", "summary": "要約", "keywords": ["キーワード1", "キーワード2"]}}
+    ```
+
+    --- 候補キーワード ---
+    {", ".join(keywords)}
+
+    --- 抜粋 ---
+    {excerpts}
+    """
+    try:
+        label = json_extract.extract_json(cluster_document.generate_clustering_response(prompt))
+    except (ConnectionError, ValueError) as e:
+        print(f"警告: クラスターのラベル付けに失敗したため、キーワードから作成します: {e}")
+        return _fallback_label(representatives, keywords)
+    return {
+        "theme": str(label.get("theme") or _fallback_label(representatives, keywords)["theme"]),
+        "summary": str(label.get("summary") or representatives[0][:100]),
+        "keywords": [str(k) for k in label.get("keywords") or keywords[:6]],
+    }
+
+def build_groups(passages: list, n_clusters: int, vectorizer) -> list:
+    """
+    パッセージをベクトル化して k-means で分類する。
+    戻り値: 大きい順に並べた {"members", "vectors", "center"} のリスト（同じ入力なら同じ順序になる）
+    """
+    with tracing.span("clustering.local", passages=len(passages), clusters=n_clusters):
+        vectors = vectorizer.fit_transform(passages)
+        labels, centers = kmeans(vectors, n_clusters, seed=config.LOCAL_CLUSTERING_SEED)
+    members = [np.flatnonzero(labels == c) for c in range(len(centers))]
+    order = sorted((c for c in range(len(centers)) if len(members[c])), key=lambda c: (-len(members[c]), members[c][0]))
+    return [
+        {"members": [passages[i] for i in members[c]], "vectors": vectors[members[c]], "center": centers[c]}
+        for c in order
+    ]
+
+def label_groups(groups: list, all_passages: list, use_gemini_labels: bool | None = None) -> list:
+    """
+    各グループに theme / summary / keywords を付ける（Gemini の呼び出しは並列）。
+    グループに "keywords"（候補キーワード）があればそれを使い、all_passages から数え直さない。
+    """
+    use_gemini_labels = config.LOCAL_CLUSTER_LABELING if use_gemini_labels is None else use_gemini_labels
+
+    def _label(group: dict) -> dict:
+        keywords = group["keywords"] if "keywords" in group else candidate_keywords(group["members"], all_passages)
+        representatives = representative_passages(group["members"], group["vectors"], group["center"])
+        if not use_gemini_labels:
+            return _fallback_label(representatives, keywords)
+        with tracing.span("clustering.label", size=len(group["members"])):
+            return label_cluster(representatives, keywords)
+
+    if not groups:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(config.MAP_REDUCE_WORKERS, len(groups)))) as executor:
+        return list(executor.map(tracing.bind(_label), groups))
+
+def cluster_passages(passages: list, n_clusters: int | None = None, vectorizer=None, use_gemini_labels: bool | None = None) -> dict:
+    """パッセージのリストをクラスタリングし、activity_clusters.json 形式の辞書を返す。"""
+    if not passages:
+        raise ValueError("クラスタリング対象のテキストが空です。")
+    groups = build_groups(passages, n_clusters or config.CLUSTER_COUNT, vectorizer or get_vectorizer())
+    print(f"{len(passages)}個のパッセージを{len(groups)}個のクラスターに分類しました。ラベルを付けています...")
+    labels = label_groups(groups, passages, use_gemini_labels)
+    # 大きいクラスターから順に cluster_id を振る
+    return {
+        "clusters": [
+            {"cluster_id": cluster_id, **label}
+            for cluster_id, label in enumerate(labels, start=1)
+        ]
+    }
+
+def cluster_text(text: str, n_clusters: int | None = None, vectorizer=None) -> dict:
+    """テキスト全体をパッセージに分けてクラスタリングする。"""
+    return cluster_passages(split_passages(text), n_clusters=n_clusters, vectorizer=vectorizer)
@@ -2,17 +2,18 @@
 import os
 import sys
 import json
-import random
 import re
 from datetime import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- モジュール検索パスの設定 ---
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(project_root)
 
 # --- 各機能モジュールのインポート ---
-from src import from_docx_import_Document, cluster_document, research_topic, x_poster, concept_generator
+import config
+from src import from_docx_import_Document, cluster_document, research_topic, x_poster, concept_generator, knowledge_log, state_store, gemini_client, response_cache, tracing, startup_profile, retry, duplicate_index, topic_scheduler, post_queue, thread_builder, knowledge_loader
 
 # --- グローバル設定値 ---
 CONCEPT_GENERATION_THRESHOLD = 20 # この投稿数に達したら概念化サイクルを実行
@@ -22,63 +23,248 @@ KNOWLEDGE_BASE_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'pers
 KNOWLEDGE_ENTRIES_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'knowledge_entries.json')
 HIGH_LEVEL_CONCEPTS_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'high_level_concepts.json')
 ACTIVITY_CLUSTERS_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'activity_clusters.json')
+CLUSTER_STATE_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'cluster_state.npz')
+TOPIC_SCHEDULE_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'topic_schedule.json')
+POST_QUEUE_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'post_queue.json')
 SUMMARY_MD_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'concept_summary.md')
 ALL_KNOWLEDGE_LOG_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'all_knowledge_log.json')
 RECENT_KNOWLEDGE_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'recent_knowledge.json')
 
 def get_current_post_count() -> int:
     """短期記憶（recent_knowledge.json）の投稿数をカウントする"""
+    with tracing.span("persist.read_count"):
+        # 件数はサイドカーから読むため、本体のJSONは解析しない
+        return state_store.count_knowledge_entries(RECENT_KNOWLEDGE_PATH)
+
+def reset_recent_knowledge(consumed_count: int):
+    """短期記憶から、概念化に使用した先頭 consumed_count 件を取り除く。"""
+    with tracing.span("persist.reset_recent", consumed=consumed_count):
+        state_store.update_knowledge_entries(RECENT_KNOWLEDGE_PATH, lambda entries: entries[consumed_count:])
+
+def build_knowledge_entry(topic: dict, rich_content: dict) -> dict:
+    """選択したトピックと生成結果から、知識ログに保存するエントリを作成する。"""
+    return {
+        "topic_id": topic.get('cluster_id'),
+        "theme": topic.get('theme'),
+        "keywords": topic.get('keywords'),
+        "created_at": datetime.now().isoformat(),
+        **rich_content # 生成されたリッチな情報をすべて結合
+    }
+
+def save_knowledge_entry(entry: dict) -> int:
+    """エントリを長期記憶と短期記憶に追記する。戻り値: 追記後の短期記憶の件数"""
+    with tracing.span("persist.knowledge_log"):
+        # 長期記憶に追記（JSON Lines形式で1件だけ追記する）
+        knowledge_log.append_entry(ALL_KNOWLEDGE_LOG_PATH, entry)
+    print(f"長期ログを {knowledge_log.jsonl_path_for(ALL_KNOWLEDGE_LOG_PATH)} に保存しました。")
+    with tracing.span("persist.recent_knowledge"):
+        # 短期記憶に追記（ロックを保持したまま読み込み→追記→アトミックに書き込み）
+        recent_count = state_store.append_knowledge_entry(RECENT_KNOWLEDGE_PATH, entry)
+    print(f"短期ログを {RECENT_KNOWLEDGE_PATH} に保存しました。")
+    return recent_count
+
+def knowledge_entry_text(entry: dict) -> str:
+    """知識エントリをクラスタリング用の1つのテキストにする（テーマと投稿文）。"""
+    tweet = (entry.get("character_post") or {}).get("tweet", "")
+    return f"{entry.get('theme') or ''}：{tweet}".strip("：")
+
+def collect_engagement_rewards():
+    """
+    bandit 方式のとき、投稿から TOPIC_REWARD_MIN_AGE_SECONDS が経ったツイートの反応を X から取得し、
+    投稿したクラスターの報酬としてトピック選択の状態に記録する。
+    """
+    if config.TOPIC_SCHEDULER != "bandit":
+        return
+    records = [
+        record for record in post_queue.posted_awaiting_metrics(POST_QUEUE_PATH, config.TOPIC_REWARD_MIN_AGE_SECONDS)
+        if record["meta"].get("cluster_id") is not None
+    ]
+    if not records:
+        return
+    with tracing.span("topic_scheduler.collect_rewards", tweets=len(records)):
+        metrics = x_poster.fetch_public_metrics([record["tweet_ids"][0] for record in records])
+        rewarded = []
+        for record in records:
+            public_metrics = metrics.get(str(record["tweet_ids"][0]))
+            if public_metrics is None:
+                continue
+            topic_scheduler.record_reward(TOPIC_SCHEDULE_PATH, record["meta"]["cluster_id"], topic_scheduler.engagement_reward(public_metrics))
+            rewarded.append(record["id"])
+        post_queue.mark_rewarded(POST_QUEUE_PATH, rewarded)
+    print(f"投稿への反応を報酬として記録しました: {len(rewarded)}/{len(records)}件")
+
+def topic_meta(topic: dict) -> dict:
+    """投稿キューの項目に残すトピックの情報（反応を後から報酬として記録するため cluster_id を含める）。"""
+    return {"theme": topic.get("theme"), "cluster_id": topic.get("cluster_id")}
+
+def select_batch_topics(clusters: list, batch_size: int) -> list:
+    """バッチで調査するトピックを TOPIC_SCHEDULER の方式で選ぶ。"""
+    return topic_scheduler.select_topics(TOPIC_SCHEDULE_PATH, clusters, batch_size)
+
+def run_batch_cycle(batch_size: int):
+    """
+    1回の実行で batch_size 件の投稿を生成する。
+    フェーズ1（Web調査）はスレッドプールで並行実行し、調査が終わったものから順に
+    フェーズ2（ツイート生成）と保存を行う。生成したツイートは投稿キューに積み、
+    送信スレッドが生成と並行して（X のレート制限に合わせて）投稿する。
+    """
+    print(f"\n--- バッチサイクルを実行します ({batch_size}件) ---")
+    clustered_data = state_store.read_json(ACTIVITY_CLUSTERS_PATH)
+    if clustered_data is None:
+        print(f"エラー: 活動計画({ACTIVITY_CLUSTERS_PATH})が見つかりません。先に概念化を実行します。")
+        run_conceptualize_cycle()
+        return
+    collect_engagement_rewards()
+    topics = select_batch_topics(clustered_data["clusters"], batch_size)
+    duplicates = duplicate_index.load_index(ALL_KNOWLEDGE_LOG_PATH) if config.DUPLICATE_CHECK_ENABLED else None
+    queued = 0
+    conceptualize_failed = False
+    publisher = post_queue.Publisher(POST_QUEUE_PATH).start()
+    # 途中で例外が起きても、キューに積んだ分の投稿を待ってから送信スレッドを止める
     try:
-        with open(RECENT_KNOWLEDGE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return len(data.get("knowledge_entries", []))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return 0
+        max_workers = max(1, min(config.BATCH_RESEARCH_WORKERS, len(topics)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            phase1 = tracing.bind(research_topic.research_topic_phase1)
+            futures = {executor.submit(phase1, topic): topic for topic in topics}
+            for future in as_completed(futures):
+                topic = futures[future]
+                try:
+                    research_summary = future.result()
+                    character_post = research_topic.generate_character_post(research_summary, topic=topic)
+                    rich_content = {
+                        "research_summary": research_summary,
+                        "character_post": character_post
+                    }
+                    if duplicates is not None:
+                        rich_content = ensure_unique_tweet(duplicates, rich_content, topic)
+                except ConnectionError as e:
+                    print(f"警告: テーマ「{topic.get('theme')}」の生成に失敗したためスキップします: {e}")
+                    continue
+                if rich_content is None:
+                    print(f"書き直しても過去の投稿と重複するため、テーマ「{topic.get('theme')}」はスキップします。")
+                    continue
+                tweet_text = rich_content["character_post"].get("tweet", "")
+                if not tweet_text:
+                    continue
+                # 同じバッチ内のツイート同士の重複も検出できるよう、索引に加える
+                if duplicates is not None:
+                    duplicates.add(tweet_text)
+                recent_count = save_knowledge_entry(build_knowledge_entry(topic, rich_content))
+                posts = build_posts(tweet_text, rich_content)
+                post_queue.enqueue(POST_QUEUE_PATH, posts[0], topic_meta(topic), replies=posts[1:])
+                publisher.notify()
+                queued += 1
+                print(f"投稿キューに追加しました ({queued}/{batch_size}): {tweet_text}")
+                # バッチ途中で閾値に達したら、その場で概念化サイクルを実行する
+                if recent_count >= CONCEPT_GENERATION_THRESHOLD and not conceptualize_failed:
+                    print(f">>> 投稿数が閾値({CONCEPT_GENERATION_THRESHOLD})に達しました。バッチの途中で概念化サイクルを実行します。")
+                    try:
+                        run_conceptualize_cycle()
+                    except RuntimeError as e:
+                        # 短期記憶は残し、残りのトピックの生成を続ける（概念化は次回の実行で再試行する）
+                        print(f"警告: バッチ途中の概念化に失敗したため、このバッチでは概念化を行いません: {e}")
+                        conceptualize_failed = True
+                        continue
+                    reset_recent_knowledge(recent_count)
+                    print("短期記憶（recent_knowledge.json）をリセットしました。")
+    finally:
+        print(f"残りのツイートの投稿を待っています... ({queued}件を追加)")
+        publisher.close(config.POST_DEADLINE_SECONDS)
+    print("バッチサイクル完了。")
+
+def start_background_post(tweet_text: str, meta: dict | None = None) -> post_queue.Publisher:
+    """ツイートを投稿キューに積み、別スレッドで投稿を開始する。"""
+    print("ツイートを投稿しています...（残りの生成と並行して実行）")
+    post_queue.enqueue(POST_QUEUE_PATH, tweet_text, meta)
+    return post_queue.Publisher(POST_QUEUE_PATH).start()
+
+def wait_for_post(publisher: post_queue.Publisher):
+    """
+    投稿の完了を POST_DEADLINE_SECONDS まで待つ。
+    レート制限などで送れなかったツイートはキューに残り、次回の実行で投稿される。
+    """
+    publisher.close(config.POST_DEADLINE_SECONDS)
+
+def build_posts(tweet_text: str, rich_content: dict) -> list:
+    """
+    投稿する内容を返す。THREAD_ENABLED の場合は調査レポートを続けたスレッド（先頭がツイート）、
+    それ以外はツイートのみ。
+    """
+    if not config.THREAD_ENABLED:
+        return [tweet_text]
+    return thread_builder.build_thread(tweet_text, rich_content.get("research_summary"))
+
+def post_tweet(tweet_text: str, meta: dict | None = None, replies: list | None = None):
+    """ツイート（と返信の連鎖）を投稿キューに積み、キューに残っている分と合わせて投稿する。"""
+    print("ツイートを投稿しています..." if not replies else f"スレッドを投稿しています...（{len(replies) + 1}件）")
+    post_queue.enqueue(POST_QUEUE_PATH, tweet_text, meta, replies=replies)
+    post_queue.publish_pending(POST_QUEUE_PATH, config.POST_DEADLINE_SECONDS)
+
+def ensure_unique_tweet(index: duplicate_index.DuplicateIndex, rich_content: dict, topic: dict | None = None) -> dict | None:
+    """
+    ツイートが過去の投稿と重複していれば、フェーズ2を DUPLICATE_MAX_REGENERATIONS 回まで書き直す。
+    topic: 調査したトピック（書き直し時のペルソナの抜粋に使う）
+    戻り値: 重複しない生成結果（書き直しても重複する場合は None）
+    """
+    tweet_text = rich_content.get("character_post", {}).get("tweet", "")
+    avoid_tweets = []
+    for attempt in range(config.DUPLICATE_MAX_REGENERATIONS + 1):
+        match = index.find_duplicate(tweet_text)
+        if match is None:
+            return rich_content
+        print(f"警告: ツイートが過去の投稿と重複しています（類似度 {match[0]:.2f}: {match[1]}…）")
+        if attempt == config.DUPLICATE_MAX_REGENERATIONS or "research_summary" not in rich_content:
+            break
+        avoid_tweets.append(tweet_text)
+        print("ツイートを書き直しています...")
+        character_post = research_topic.generate_character_post(rich_content["research_summary"], avoid_tweets=avoid_tweets, topic=topic)
+        rich_content = {**rich_content, "character_post": character_post}
+        tweet_text = character_post.get("tweet", "")
+    return None
 
 def run_normal_cycle():
     print("\n--- 通常サイクルを実行します ---")
-    try:
-        with open(ACTIVITY_CLUSTERS_PATH, 'r', encoding='utf-8') as f:
-            clustered_data = json.load(f)
-    except FileNotFoundError:
+    clustered_data = state_store.read_json(ACTIVITY_CLUSTERS_PATH)
+    if clustered_data is None:
         print(f"エラー: 活動計画({ACTIVITY_CLUSTERS_PATH})が見つかりません。先に概念化を実行します。")
         run_conceptualize_cycle()
         return
-    selected_topic = random.choice(clustered_data["clusters"])
+    collect_engagement_rewards()
+    selected_topic = topic_scheduler.select_topic(TOPIC_SCHEDULE_PATH, clustered_data["clusters"])
     print(f"調査対象テーマ: {selected_topic['theme']}")
-    rich_content = research_topic.generate_rich_content_from_topic(selected_topic)
+    duplicates = duplicate_index.load_index(ALL_KNOWLEDGE_LOG_PATH) if config.DUPLICATE_CHECK_ENABLED else None
+    # ストリーミング時は、ツイート本文が揃った時点で思考過程の生成と並行して投稿を始める
+    # （スレッドを投稿する場合は、調査レポートと合わせて分割するため生成完了を待つ）
+    early_post = {}
+    def _post_early(tweet: str):
+        early_post["tweet"] = tweet
+        # 過去の投稿と重複する場合は投稿を始めず、生成完了後に書き直す
+        if duplicates is not None and duplicates.find_duplicate(tweet):
+            return
+        early_post["publisher"] = start_background_post(tweet, topic_meta(selected_topic))
+    try:
+        rich_content = research_topic.generate_rich_content_from_topic(
+            selected_topic, on_tweet=_post_early if config.PHASE2_STREAMING and not config.THREAD_ENABLED else None
+        )
+    except ConnectionError as e:
+        if "tweet" not in early_post:
+            raise
+        print(f"警告: ツイートの投稿開始後に生成が失敗しました。ツイートのみ記録します: {e}")
+        rich_content = {"character_post": {"tweet": early_post["tweet"]}}
+    if duplicates is not None and "publisher" not in early_post:
+        rich_content = ensure_unique_tweet(duplicates, rich_content, selected_topic)
+        if rich_content is None:
+            print("書き直しても過去の投稿と重複するため、今回は投稿しません。")
+            return
     tweet_text = rich_content.get("character_post", {}).get("tweet", "")
     print(f"tweet_text: {tweet_text} \n")
     if tweet_text:
-        entry = {
-            "topic_id": selected_topic.get('cluster_id'),
-            "theme": selected_topic.get('theme'),
-            "keywords": selected_topic.get('keywords'),
-            "created_at": datetime.now().isoformat(),
-            **rich_content # 生成されたリッチな情報をすべて結合
-        }
-        # 長期記憶に追記
-        try:
-            with open(ALL_KNOWLEDGE_LOG_PATH, 'r', encoding='utf-8') as f:
-                all_log = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            all_log = {"knowledge_entries": []}
-        all_log["knowledge_entries"].append(entry)
-        with open(ALL_KNOWLEDGE_LOG_PATH, 'w', encoding='utf-8') as f:
-            json.dump(all_log, f, ensure_ascii=False, indent=2)
-        print(f"長期ログを {ALL_KNOWLEDGE_LOG_PATH} に保存しました。")
-        # 短期記憶に追記
-        try:
-            with open(RECENT_KNOWLEDGE_PATH, 'r', encoding='utf-8') as f:
-                recent_log = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            recent_log = {"knowledge_entries": []}
-        recent_log["knowledge_entries"].append(entry)
-        with open(RECENT_KNOWLEDGE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(recent_log, f, ensure_ascii=False, indent=2)
-        print(f"短期ログを {RECENT_KNOWLEDGE_PATH} に保存しました。")
-        print("ツイートを投稿しています...")
-        x_poster.post_to_x(tweet_text)
+        save_knowledge_entry(build_knowledge_entry(selected_topic, rich_content))
+        if "publisher" in early_post:
+            wait_for_post(early_post["publisher"])
+        else:
+            posts = build_posts(tweet_text, rich_content)
+            post_tweet(posts[0], topic_meta(selected_topic), posts[1:])
     print("通常サイクル完了。")
 
 def run_conceptualize_cycle():
@@ -87,16 +273,21 @@ def run_conceptualize_cycle():
     print("ステップA: 新しい高次概念を生成・保存しています...")
     new_concept_data = concept_generator.generate_new_concept(RECENT_KNOWLEDGE_PATH, SUMMARY_MD_PATH, HIGH_LEVEL_CONCEPTS_PATH)
     if not new_concept_data:
-        print("エラー: 高次概念の生成に失敗したため、概念化サイクルを中断します。\nエラーが発生したため、処理を異常終了します。")
-        sys.exit(1)
+        raise RuntimeError("高次概念の生成に失敗したため、概念化サイクルを中断します。")
     # ステップB: 全知識の統合と再クラスタリング
     print("ステップB: 新しい活動クラスタを生成しています...")
-    knowledge_text = from_docx_import_Document.get_combined_knowledge_text(KNOWLEDGE_BASE_PATH, HIGH_LEVEL_CONCEPTS_PATH)
-    new_clusters_json_text = cluster_document.get_clustered_json_from_gemini(knowledge_text)
-    json_str = new_clusters_json_text.strip().lstrip("```json").rstrip("```")
-    new_clusters_data = json.loads(json_str)
-    with open(ACTIVITY_CLUSTERS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(new_clusters_data, f, ensure_ascii=False, indent=2)
+    with tracing.span("clustering.load_knowledge"):
+        knowledge_text = from_docx_import_Document.get_combined_knowledge_text(KNOWLEDGE_BASE_PATH, HIGH_LEVEL_CONCEPTS_PATH)
+    extra_texts = []
+    if config.CLUSTERING_INCREMENTAL:
+        # 増分モードでは、今回の概念化に使った知識エントリも既存クラスターに割り当てる
+        with tracing.span("persist.read_recent_knowledge"):
+            extra_texts = [
+                knowledge_entry_text(entry) for entry in state_store.iter_knowledge_entries(RECENT_KNOWLEDGE_PATH)
+            ]
+    new_clusters_data = cluster_document.cluster_knowledge_text(knowledge_text, extra_texts, CLUSTER_STATE_PATH)
+    with tracing.span("persist.clusters"):
+        state_store.atomic_write_json(ACTIVITY_CLUSTERS_PATH, new_clusters_data)
     print(f"新しい活動クラスタを {ACTIVITY_CLUSTERS_PATH} に保存しました。")
     print("概念化サイクル完了。")
 
@@ -118,22 +309,45 @@ def run_question_cycle(question: str):
         "created_at": datetime.now().isoformat(),
         **rich_content
     }
-    try:
-        with open(ALL_KNOWLEDGE_LOG_PATH, 'r', encoding='utf-8') as f:
-            all_log = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        all_log = {"knowledge_entries": []}
-    all_log["knowledge_entries"].append(entry)
-    with open(ALL_KNOWLEDGE_LOG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(all_log, f, ensure_ascii=False, indent=2)
-    print(f"知識ログを {ALL_KNOWLEDGE_LOG_PATH} に保存しました。\n")
+    with tracing.span("persist.knowledge_log"):
+        knowledge_log.append_entry(ALL_KNOWLEDGE_LOG_PATH, entry)
+    print(f"知識ログを {knowledge_log.jsonl_path_for(ALL_KNOWLEDGE_LOG_PATH)} に保存しました。\n")
     # Xにも投稿
     if tweet_text:
-        print("ツイートを投稿しています...")
-        x_poster.post_to_x(tweet_text)
+        posts = build_posts(tweet_text, rich_content)
+        post_tweet(posts[0], {"theme": question}, posts[1:])
+
+def report_run_stats():
+    """今回の実行で Gemini クライアントと X への投稿が開いた接続数などを表示する。"""
+    stats = gemini_client.get_stats()
+    print(
+        f"Gemini接続統計: クライアント作成 {stats['clients_created']}回, "
+        f"TCP接続 {stats['connections_opened']}回, リクエスト {stats['requests']}回"
+    )
+    x_stats = x_poster.get_stats()
+    if x_stats["requests"]:
+        print(f"X接続統計: TCP接続 {x_stats['connections_opened']}回, 投稿リクエスト {x_stats['requests']}回")
+    loader_stats = knowledge_loader.get_stats()
+    if loader_stats["files"]:
+        print(f"知識ソース: {loader_stats['files']}件（解析 {loader_stats['parsed']}件, キャッシュ {loader_stats['cache_hits']}件）")
+    for site, cache_stats in sorted(response_cache.get_stats().items()):
+        print(f"応答キャッシュ [{site}]: ヒット {cache_stats['hits']}回, ミス {cache_stats['misses']}回")
+    retry_state = retry.get_state()
+    if retry_state["budget_spent"] or retry_state["opened_at"] is not None:
+        print(
+            f"Gemini再試行: 失敗と待機に{retry_state['budget_spent']:.1f}秒 / 予算{config.GEMINI_RETRY_BUDGET_SECONDS:.0f}秒"
+            + ("（サーキットブレーカー作動中）" if retry_state["opened_at"] is not None else "")
+        )
+    post_queue.print_stats(POST_QUEUE_PATH)
+    tracing.print_summary()
 
 def main():
     """このボットのメインコントローラー（1実行1アクションモデル）"""
+    # 例: python src/main.py --profile-startup （起動時の import 時間の内訳を表示して終了）
+    if len(sys.argv) > 1 and sys.argv[1] == '--profile-startup':
+        startup_profile.print_report()
+        return
+
     print(f"======== ボット処理開始 ({datetime.now()}) ========")
 
     # --- コマンドライン引数で強制実行・質問を判定 ---
@@ -141,9 +355,36 @@ def main():
     force_conceptualize = len(sys.argv) > 1 and sys.argv[1] in ['--force', '--conceptualize']
     ask_mode = len(sys.argv) > 2 and sys.argv[1] == '--ask'
     question = sys.argv[2] if ask_mode else None
+    compact_mode = len(sys.argv) > 1 and sys.argv[1] == '--compact'
+    # 例: python src/main.py --publish （生成せず、投稿キューに残っているツイートだけを投稿する）
+    publish_mode = len(sys.argv) > 1 and sys.argv[1] == '--publish'
+    # 例: python src/main.py --batch 5
+    batch_mode = len(sys.argv) > 2 and sys.argv[1] == '--batch'
+    if batch_mode:
+        try:
+            batch_size = int(sys.argv[2])
+        except ValueError:
+            raise ValueError(f"--batch には投稿数を整数で指定してください: {sys.argv[2]}")
+        if batch_size < 1:
+            raise ValueError(f"--batch には1以上の投稿数を指定してください: {batch_size}")
+
+    if compact_mode:
+        # 長期ログ（JSON Lines）を従来の {"knowledge_entries": [...]} 形式に書き出す
+        knowledge_log.compact(ALL_KNOWLEDGE_LOG_PATH)
+        print(f"======== 今回の処理は完了しました ({datetime.now()}) ========\n")
+        return
+
+    if publish_mode:
+        with tracing.span("cycle.publish"):
+            post_queue.publish_pending(POST_QUEUE_PATH, config.POST_DEADLINE_SECONDS)
+        report_run_stats()
+        print(f"======== 今回の処理は完了しました ({datetime.now()}) ========\n")
+        return
 
     if ask_mode and question:
-        run_question_cycle(question)
+        with tracing.span("cycle.question"):
+            run_question_cycle(question)
+        report_run_stats()
         print(f"======== 今回の処理は完了しました ({datetime.now()}) ========\n")
         return
 
@@ -151,6 +392,20 @@ def main():
     post_count = get_current_post_count()
     print(f"現在の記録済み投稿数: {post_count}")
 
+    # バッチモードでは閾値の判定をバッチ内で行う
+    if batch_mode:
+        if post_count >= CONCEPT_GENERATION_THRESHOLD:
+            print(f">>> 投稿数が閾値({CONCEPT_GENERATION_THRESHOLD})に達しました。バッチの前に概念化サイクルを実行します。")
+            with tracing.span("cycle.conceptualize"):
+                run_conceptualize_cycle()
+            reset_recent_knowledge(post_count)
+            print("短期記憶（recent_knowledge.json）をリセットしました。")
+        with tracing.span("cycle.batch", batch_size=batch_size):
+            run_batch_cycle(batch_size)
+        report_run_stats()
+        print(f"======== 今回の処理は完了しました ({datetime.now()}) ========\n")
+        return
+
     # 2. 条件に応じて、どちらか「一つだけ」のサイクルを実行
     if force_conceptualize or post_count >= CONCEPT_GENERATION_THRESHOLD:
         if force_conceptualize:
@@ -158,17 +413,24 @@ def main():
         else:
             print(f">>> 投稿数が閾値({CONCEPT_GENERATION_THRESHOLD})に達しました。")
         
-        run_conceptualize_cycle()
+        with tracing.span("cycle.conceptualize"):
+            run_conceptualize_cycle()
         # 概念化後に短期記憶をリセット
-        with open(RECENT_KNOWLEDGE_PATH, 'w') as f:
-             json.dump({"knowledge_entries": []}, f)
+        # （概念化中に別のボットが追記したエントリは消さず、次回に持ち越す）
+        reset_recent_knowledge(post_count)
         print("短期記憶（recent_knowledge.json）をリセットしました。")
     else:
         print(">>> 通常サイクルを実行します。")
-        run_normal_cycle()
-        
+        with tracing.span("cycle.normal"):
+            run_normal_cycle()
+
+    report_run_stats()
     print(f"======== 今回の処理は完了しました ({datetime.now()}) ========\n")
 
 # このファイルが直接実行された時だけmain()を呼び出す
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except RuntimeError as e:
+        print(f"エラー: {e}\nエラーが発生したため、処理を異常終了します。")
+        sys.exit(1)
@@ -0,0 +1,93 @@
+# src/map_reduce.py
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import tracing
+
+# 大きな入力を Gemini のコンテキストに収めるための map-reduce ヘルパー。
+# 入力テキストのリストを推定トークン数でチャンクに分け（map）、チャンクごとの要約を並行して作り、
+# 要約を結合したものが上限に収まるまで繰り返す。最後の「reduce」（研究報告書やクラスタリング）は呼び出し側で行う。
+
+MAX_LEVELS = 3   # 要約を重ねる最大段数（要約が縮まない場合の無限ループ防止）
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのおおよそのトークン数を見積もる。
+    日本語などの全角文字は1文字≒1トークン、英数字は4文字≒1トークンとして数える。
+    """
+    wide = sum(1 for c in text if ord(c) >= 0x3000)
+    return wide + (len(text) - wide + 3) // 4
+
+def split_text(text: str, max_tokens: int) -> list:
+    """1つのテキストが max_tokens を超える場合に、行単位（長すぎる行は文字単位）で分割する。"""
+    pieces, current, current_tokens = [], [], 0
+    for line in text.splitlines(keepends=True):
+        tokens = estimate_tokens(line)
+        if tokens > max_tokens:
+            # 1行が上限を超える場合は、上限の文字数ごとに切る（全角1文字＝1トークンの見積もりで安全側）
+            if current:
+                pieces.append("".join(current))
+                current, current_tokens = [], 0
+            pieces.extend(line[i:i + max_tokens] for i in range(0, len(line), max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+def chunk_texts(texts: list, max_tokens: int, separator: str = "\n\n") -> list:
+    """テキストを順序を保ったまま、推定トークン数が max_tokens 以下のチャンク（結合済み文字列）にまとめる。"""
+    chunks, current, current_tokens = [], [], 0
+    separator_tokens = estimate_tokens(separator)
+    for text in texts:
+        for piece in (split_text(text, max_tokens) if estimate_tokens(text) > max_tokens else [text]):
+            tokens = estimate_tokens(piece) + separator_tokens
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+def reduce_to_fit(texts: list, summarize, stage: str, max_tokens: int | None = None,
+                  workers: int | None = None, separator: str = "\n\n") -> str:
+    """
+    texts を結合したものが max_tokens に収まるまで、チャンクごとに summarize(chunk_text, index, total) で要約する。
+    チャンクの要約は workers 並列で行う。summarize が None を返したチャンクは ValueError とする。
+    戻り値: 上限に収まった結合テキスト
+    """
+    max_tokens = max_tokens or config.MAP_REDUCE_CHUNK_TOKENS
+    workers = workers or config.MAP_REDUCE_WORKERS
+    for level in range(1, MAX_LEVELS + 1):
+        joined = separator.join(texts)
+        total_tokens = estimate_tokens(joined)
+        if total_tokens <= max_tokens:
+            return joined
+        chunks = chunk_texts(texts, max_tokens, separator)
+        print(f"[map-reduce] 入力が約{total_tokens}トークンのため、{len(chunks)}個のチャンクに分けて要約します（{level}段目）。")
+
+        def _summarize(index: int) -> str:
+            with tracing.span(f"{stage}.map", level=level, chunk=index + 1, chunks=len(chunks)):
+                summary = summarize(chunks[index], index + 1, len(chunks))
+            if not summary:
+                raise ValueError(f"チャンク {index + 1}/{len(chunks)} の要約に失敗しました。")
+            return summary
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+            summaries = list(executor.map(tracing.bind(_summarize), range(len(chunks))))
+        if estimate_tokens(separator.join(summaries)) >= total_tokens:
+            raise ValueError("チャンクの要約で入力が小さくならなかったため、map-reduce を中断します。")
+        texts = summaries
+    joined = separator.join(texts)
+    print(f"警告: [map-reduce] {MAX_LEVELS}段要約しても上限に収まりませんでした（約{estimate_tokens(joined)}トークン）。")
+    return joined
@@ -0,0 +1,135 @@
+# src/persona_cache.py
+import os
+import sys
+import time
+import hashlib
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import state_store
+
+# フェーズ2で毎回送っていた約37KBのペルソナを、Gemini のコンテキストキャッシュに載せて再利用する。
+# - ペルソナはプロセス内で1度だけ読み込み・ハッシュ化する（ファイルが更新されたら自動で読み直す）
+# - キャッシュはペルソナのハッシュ＋モデル名をキーに作成し、実行をまたいで名前をディスクに記録する
+# - ディスクの記録が無い場合（CACHE_DIR を持ち越さない実行環境など）は、作成前に client.caches.list() から
+#   同じ display_name の有効なキャッシュを探して再利用する
+# - キャッシュが使えない場合（モデル非対応など）は None を返し、呼び出し側はプロンプトに直接埋め込む
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REGISTRY_PATH = os.path.join(PROJECT_ROOT, config.CACHE_DIR, 'persona_context_cache.json')
+
+_lock = threading.Lock()
+_persona = {}           # path -> (stat_key, text, sha256)
+_unsupported = set()    # キャッシュ作成に失敗した (model, sha256)
+
+
+def build_persona_instruction(persona_text: str, excerpt: bool = False) -> str:
+    """キャッシュ（システム指示）に載せるペルソナ部分のプロンプト。excerpt: ペルソナが抜粋の場合 True"""
+    heading = "あなたのペルソナ分析（今回のテーマに関係する部分の抜粋）" if excerpt else "あなたのペルソナ分析"
+    return f"""あなたは、以下のペルソナを持つAIキャラクター「A-Kカルマ」です。
+
+# {heading}:
+{persona_text}
+"""
+
+def load_persona(path: str) -> tuple[str, str]:
+    """ペルソナ本文とそのSHA-256を返す。ファイルの更新（mtime/サイズ）を検知して読み直す。"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"エラー: ペルソナファイルが見つかりません - {path}")
+    stat_key = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _persona.get(path)
+        if cached and cached[0] == stat_key:
+            return cached[1], cached[2]
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        _persona[path] = (stat_key, text, digest)
+        return text, digest
+
+def _registry_key(model: str, digest: str) -> str:
+    return f"{model}:{digest}"
+
+def _display_name(digest: str) -> str:
+    return f"persona-{digest[:16]}"
+
+def _expire_timestamp(cache) -> float:
+    expire_time = getattr(cache, "expire_time", None)
+    if expire_time is None:
+        return 0
+    return expire_time if isinstance(expire_time, (int, float)) else expire_time.timestamp()
+
+def find_remote_cache(client, model: str, digest: str, now: float):
+    """サーバー側に残っている同じペルソナ・モデルの有効なキャッシュを探す。戻り値: (名前, 有効期限) または None"""
+    try:
+        for cache in client.caches.list():
+            if getattr(cache, "display_name", None) != _display_name(digest):
+                continue
+            # cache.model は "models/gemini-..." の形式で返る
+            if not str(getattr(cache, "model", "")).endswith(model.split("/")[-1]):
+                continue
+            expire_time = _expire_timestamp(cache)
+            if expire_time - 60 > now:
+                return cache.name, expire_time
+    except Exception as e:
+        print(f"警告: 既存のコンテキストキャッシュを確認できませんでした: {e}")
+    return None
+
+def _register(model: str, digest: str, name: str, expire_time: float):
+    """キャッシュの名前と有効期限をディスクに記録する。"""
+    key = _registry_key(model, digest)
+    def mutate(data):
+        # 同じモデルの古いペルソナ用キャッシュは記録から外す
+        for old_key in [k for k in data if k.startswith(f"{model}:") and k != key]:
+            del data[old_key]
+        data[key] = {"name": name, "expire_time": expire_time}
+    state_store.update_json(REGISTRY_PATH, {}, mutate)
+
+def get_cached_content_name(client, model: str, path: str) -> str | None:
+    """
+    ペルソナを載せたコンテキストキャッシュの名前を返す（無ければ作成する）。
+    キャッシュを利用できない場合は None を返す。
+    """
+    if not config.PERSONA_CONTEXT_CACHE:
+        return None
+    persona_text, digest = load_persona(path)
+    key = _registry_key(model, digest)
+    with _lock:
+        if key in _unsupported:
+            return None
+    now = time.time()
+    registry = state_store.read_json(REGISTRY_PATH, {})
+    # 期限切れ直前のキャッシュは使わない（リクエスト中に失効するのを避ける）
+    record = registry.get(key)
+    if record and record.get("expire_time", 0) - 60 > now:
+        return record["name"]
+
+    remote = find_remote_cache(client, model, digest, now)
+    if remote:
+        _register(model, digest, *remote)
+        print(f"既存のペルソナのコンテキストキャッシュを再利用します: {remote[0]}")
+        return remote[0]
+
+    from google.genai import types
+    ttl = config.PERSONA_CACHE_TTL_SECONDS
+    try:
+        cache = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=_display_name(digest),
+                system_instruction=build_persona_instruction(persona_text),
+                ttl=f"{ttl}s",
+            ),
+        )
+    except Exception as e:
+        print(f"警告: ペルソナのコンテキストキャッシュを作成できませんでした。プロンプトに直接埋め込みます: {e}")
+        with _lock:
+            _unsupported.add(key)
+        return None
+
+    _register(model, digest, cache.name, now + ttl)
+    print(f"ペルソナのコンテキストキャッシュを作成しました: {cache.name}")
+    return cache.name
@@ -0,0 +1,137 @@
+# src/persona_index.py
+import io
+import os
+import re
+import sys
+import json
+import threading
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import local_clustering, persona_cache, state_store, tracing
+
+# フェーズ2に送るペルソナを、テーマに関係する部分の抜粋にする（PERSONA_EXCERPT=1）。
+# - ペルソナを章（「I.」「II.」…の見出し、空行、Markdown の見出し）で分け、さらに PERSONA_PASSAGE_CHARS 程度のパッセージにする
+# - パッセージを文字n-gramの TF-IDF（local_clustering.HashingVectorizer）でベクトル化した索引を、
+#   ペルソナのハッシュをキーに CACHE_DIR に保存する（ペルソナが変わらない限り作り直さない）
+# - 生成時は、最初の章と最後の章の冒頭（序論・結論）を核となる要約として必ず含め、
+#   テーマ・キーワード・調査レポートに近いパッセージを上位 PERSONA_TOP_K 件だけ元の順序で加える
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+INDEX_DIR = os.path.join(PROJECT_ROOT, config.CACHE_DIR, 'persona_index')
+INDEX_VERSION = 1
+# 「I. 」〜「X. 」の章番号（"IV." の中の "V." には一致しない）・空行・Markdown の見出しで章を分ける
+_SECTION_PATTERN = re.compile(r'(?<![A-Za-z])(?=(?:X|IX|VIII|VII|VI|V|IV|III|II|I)\.\s)|\n\s*\n|\n(?=#)')
+
+_lock = threading.Lock()
+_indexes = {}   # ペルソナのハッシュ -> 索引
+
+
+def split_sections(text: str) -> list:
+    """ペルソナを章に分ける。"""
+    return [section.strip() for section in _SECTION_PATTERN.split(text) if section and section.strip()]
+
+def index_path_for(digest: str) -> str:
+    return os.path.join(INDEX_DIR, f"{digest[:32]}.npz")
+
+def build_index(persona_text: str, digest: str) -> dict:
+    """ペルソナを章・パッセージに分け、ベクトル化した索引を作る。"""
+    passages, sections, core = [], [], []
+    chapters = split_sections(persona_text)
+    for section_id, section in enumerate(chapters):
+        chunks = local_clustering.split_passages(section, config.PERSONA_PASSAGE_CHARS)
+        if section_id in (0, len(chapters) - 1):
+            core.append(len(passages))
+        passages.extend(chunks)
+        sections.extend([section_id] * len(chunks))
+    vectorizer = local_clustering.HashingVectorizer()
+    vectors = vectorizer.fit_transform(passages) if passages else np.zeros((0, vectorizer.n_features), dtype=np.float32)
+    return {
+        "version": INDEX_VERSION,
+        "digest": digest,
+        "passage_chars": config.PERSONA_PASSAGE_CHARS,
+        "passages": passages,
+        "sections": sections,
+        "core": sorted(set(core)),
+        "vectors": vectors.astype(np.float32),
+        "idf": vectorizer.idf,
+    }
+
+def save_index(path: str, index: dict):
+    meta = {key: value for key, value in index.items() if key not in ("vectors", "idf")}
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, meta=np.array(json.dumps(meta, ensure_ascii=False)), vectors=index["vectors"], idf=index["idf"])
+    state_store.atomic_write_bytes(path, buffer.getvalue())
+
+def load_index(path: str, digest: str) -> dict | None:
+    """保存した索引を読み込む。無い・ペルソナや設定が変わった場合は None を返す。"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            vectors, idf = arrays["vectors"], arrays["idf"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"警告: ペルソナの索引を読み込めないため、作り直します: {e}")
+        return None
+    if (meta.get("version"), meta.get("digest"), meta.get("passage_chars")) != (INDEX_VERSION, digest, config.PERSONA_PASSAGE_CHARS):
+        return None
+    return {**meta, "vectors": vectors, "idf": idf}
+
+def get_index(path: str) -> dict:
+    """ペルソナの索引を返す（プロセス内・ディスクのキャッシュを使い、無ければ作る）。"""
+    persona_text, digest = persona_cache.load_persona(path)
+    with _lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            return index
+        index_path = index_path_for(digest)
+        with tracing.span("persona_index.load"):
+            index = load_index(index_path, digest)
+        if index is None:
+            with tracing.span("persona_index.build", chars=len(persona_text)):
+                index = build_index(persona_text, digest)
+                save_index(index_path, index)
+            print(f"ペルソナの索引を作成しました（{len(index['passages'])}パッセージ）: {index_path}")
+        _indexes[digest] = index
+        return index
+
+def select_passages(index: dict, query: str, top_k: int | None = None) -> list:
+    """核となるパッセージと、query に近い上位 top_k 件のパッセージの番号を、元の順序で返す。"""
+    top_k = config.PERSONA_TOP_K if top_k is None else top_k
+    selected = set(index["core"])
+    if query.strip() and top_k > 0 and len(index["passages"]):
+        vectorizer = local_clustering.HashingVectorizer()
+        vectorizer.idf = index["idf"]
+        scores = index["vectors"] @ vectorizer.transform([query])[0]
+        ranked = [i for i in np.argsort(-scores) if int(i) not in selected]
+        selected.update(int(i) for i in ranked[:top_k])
+    return sorted(selected)
+
+def build_query(research_summary: dict | None = None, topic: dict | None = None) -> str:
+    """テーマ・キーワード・調査レポートから、ペルソナを検索する文を作る。"""
+    parts = []
+    if topic:
+        parts.append(str(topic.get("theme") or ""))
+        parts.extend(str(keyword) for keyword in topic.get("keywords") or [])
+    if isinstance(research_summary, dict):
+        parts.extend(str(value) for value in research_summary.values() if value)
+    elif research_summary:
+        parts.append(str(research_summary))
+    return "\n".join(part for part in parts if part)
+
+def excerpt_persona(path: str, query: str, top_k: int | None = None) -> str:
+    """ペルソナのうち、核となる要約と query に関係するパッセージだけをつないだ抜粋を返す。"""
+    with tracing.span("persona_index.excerpt"):
+        index = get_index(path)
+        selected = select_passages(index, query, top_k)
+        excerpt = []
+        for previous, current in zip([None] + selected, selected):
+            # 元の文章で連続していない箇所には省略記号を入れる
+            if previous is not None and current != previous + 1:
+                excerpt.append("……")
+            excerpt.append(index["passages"][current])
+        tracing.set_attrs(passages=len(selected), chars=sum(len(p) for p in excerpt))
+        return "\n".join(excerpt)
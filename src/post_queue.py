@@ -0,0 +1,284 @@
+# src/post_queue.py
+import os
+import sys
+import time
+import random
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import state_store, tracing, x_poster
+
+# X への投稿キュー。生成したツイートはまずディスク上のキュー（JSON、state_store のロック付き）に積み、
+# Publisher（送信スレッド）が順番に送り出す。生成と投稿を切り離すため、バッチ生成が X の応答を待たない。
+# - レート制限: 応答の x-rate-limit-remaining / reset を記録し、残りが0なら reset まで送らない。
+#   残りよりキューが多い場合は、reset までの時間に送信を均等に割り振る
+# - 429 は reset（または Retry-After）まで、5xx・通信エラーは指数バックオフで再送する（X_POST_MAX_ATTEMPTS 回まで）
+# - 403（重複など）や再送回数を使い切ったものは "dead" に移して残す（黙って捨てない）
+# - 送信中の項目にはリース（期限）を付け、複数のボットが同じ項目を同時に送らないようにする。
+#   送信中にプロセスが落ちた場合は、リースが切れた後に再送される（少なくとも1回の送信）
+# - スレッド（replies 付きの項目）は1件ずつ、直前の投稿への返信として送る。投稿済みのIDを項目に記録するため、
+#   途中で止まっても次の実行で続きから送れる
+# - 送り終えた項目は、投稿IDとメタ情報（cluster_id など）を直近 POSTED_HISTORY_LIMIT 件まで "posted" に残す。
+#   トピック選択（bandit 方式）が後から反応を取得して報酬にするため
+
+LEASE_SECONDS_MARGIN = 30
+POSTED_HISTORY_LIMIT = 200
+
+
+def _empty_queue() -> dict:
+    return {"next_id": 1, "items": [], "dead": [], "posted": [], "rate_limit": None, "last_sent_at": None, "sent": 0}
+
+def _read(path: str) -> dict:
+    return {**_empty_queue(), **state_store.read_json(path, _empty_queue())}
+
+def _update(path: str, mutate):
+    """ロックを保持したままキューを読み込み、mutate(queue) で変更して書き戻す。戻り値: mutate の戻り値"""
+    result = []
+
+    def _mutate(data):
+        queue = {**_empty_queue(), **data}
+        result.append(mutate(queue))
+        return queue
+
+    state_store.update_json(path, _empty_queue(), _mutate)
+    return result[0]
+
+def enqueue(path: str, text: str, meta: dict | None = None, replies: list | None = None) -> int:
+    """
+    ツイートをキューの末尾に積む。replies を指定すると、ツイートに続けて返信の連鎖（スレッド）として送る。
+    戻り値: 項目のID
+    """
+    def _enqueue(queue):
+        item_id = queue["next_id"]
+        queue["next_id"] += 1
+        queue["items"].append({
+            "id": item_id,
+            "text": text,
+            "replies": list(replies or []),
+            "tweet_ids": [],
+            "meta": meta or {},
+            "enqueued_at": time.time(),
+            "attempts": 0,
+            "next_attempt_at": 0,
+            "leased_until": 0,
+            "last_error": None,
+        })
+        return item_id
+
+    with tracing.span("post_queue.enqueue"):
+        return _update(path, _enqueue)
+
+def _segments(item: dict) -> list:
+    """項目の投稿（スレッドの場合はツイートと返信）を順に返す。"""
+    return [item["text"], *item.get("replies", [])]
+
+def _pending_posts(queue: dict) -> int:
+    """キューに残っている投稿数（スレッドの未投稿分を含む）。"""
+    return sum(len(_segments(item)) - len(item.get("tweet_ids", [])) for item in queue["items"])
+
+def _send_interval(queue: dict, now: float) -> float:
+    """前回の送信から空けるべき秒数。レート制限の残りよりキューが多い場合は reset までに均等に割り振る。"""
+    interval = config.X_POST_MIN_INTERVAL_SECONDS
+    rate_limit = queue["rate_limit"]
+    if rate_limit and rate_limit["reset"] > now and 0 < rate_limit["remaining"] < _pending_posts(queue):
+        interval = max(interval, (rate_limit["reset"] - now) / rate_limit["remaining"])
+    return interval
+
+def _claim(queue: dict, now: float) -> tuple:
+    """
+    今送れる項目にリースを付けて返す。
+    戻り値: (項目 または None, 次に送れるようになるまでの秒数 または None（キューが空）)
+    """
+    if not queue["items"]:
+        return None, None
+    rate_limit = queue["rate_limit"]
+    if rate_limit and rate_limit["remaining"] <= 0 and rate_limit["reset"] > now:
+        return None, rate_limit["reset"] - now
+    if queue["last_sent_at"]:
+        gap = queue["last_sent_at"] + _send_interval(queue, now) - now
+        if gap > 0:
+            return None, gap
+    waits = []
+    for item in queue["items"]:
+        ready_at = max(item["next_attempt_at"], item["leased_until"])
+        if ready_at <= now:
+            item["leased_until"] = now + config.X_POST_TIMEOUT_SECONDS + LEASE_SECONDS_MARGIN
+            item["attempts"] += 1
+            return dict(item), 0
+        waits.append(ready_at - now)
+    return None, min(waits)
+
+def _retry_delay(attempts: int) -> float:
+    """再送までの秒数（上限付き指数バックオフ＋ジッター）。"""
+    delay = min(config.X_POST_RETRY_MAX_DELAY_SECONDS, config.X_POST_RETRY_BASE_DELAY_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def _remember_posted(queue: dict, item: dict, now: float):
+    queue["posted"].append({
+        "id": item["id"], "tweet_ids": item["tweet_ids"], "meta": item.get("meta") or {},
+        "posted_at": now, "rewarded": False,
+    })
+    del queue["posted"][:-POSTED_HISTORY_LIMIT]
+
+def _complete(queue: dict, item_id: int, result: dict, now: float) -> str:
+    """送信結果をキューに反映する。戻り値: "posted" / "retry" / "dead" """
+    index = next((i for i, item in enumerate(queue["items"]) if item["id"] == item_id), None)
+    if index is None:
+        return "posted" if result.get("ok") else "dead"
+    item = queue["items"][index]
+    item["leased_until"] = 0
+    if result.get("rate_limit"):
+        queue["rate_limit"] = result["rate_limit"]
+    if result.get("ok"):
+        queue["sent"] += 1
+        queue["last_sent_at"] = now
+        tweet_ids = item.setdefault("tweet_ids", [])
+        tweet_ids.append(result.get("tweet_id"))
+        if len(tweet_ids) < len(_segments(item)):
+            if not result.get("tweet_id"):
+                # 投稿IDが分からないと続きを返信としてつなげられない
+                item["last_error"] = "投稿IDが取得できなかったため、スレッドの続きを送れません"
+                queue["dead"].append({**item, "failed_at": now})
+                del queue["items"][index]
+                return "posted"
+            # スレッドの続きは次の送信で送る（失敗回数は投稿ごとに数える）
+            item["attempts"] = 0
+            item["next_attempt_at"] = 0
+            return "posted"
+        del queue["items"][index]
+        _remember_posted(queue, item, now)
+        return "posted"
+    item["last_error"] = f"{result.get('status')} {result.get('status_code') or ''}: {(result.get('error') or '')[:200]}".strip()
+    if result.get("status") == "rate_limited":
+        # レート制限は失敗回数に数えず、解除時刻まで全体の送信を止める
+        item["attempts"] -= 1
+        retry_at = result.get("retry_at") or now + config.X_POST_RETRY_MAX_DELAY_SECONDS
+        queue["rate_limit"] = {**(queue["rate_limit"] or {"limit": None}), "remaining": 0, "reset": retry_at}
+        item["next_attempt_at"] = retry_at
+        return "retry"
+    if result.get("retryable") and item["attempts"] < config.X_POST_MAX_ATTEMPTS:
+        item["next_attempt_at"] = now + _retry_delay(item["attempts"])
+        return "retry"
+    queue["dead"].append({**item, "failed_at": now})
+    del queue["items"][index]
+    return "dead"
+
+
+class Publisher:
+    """キューを送り出す送信スレッド。notify() で新しい項目を知らせ、close() で送れる分を送って止める。"""
+
+    def __init__(self, path: str, poster=None):
+        self.path = path
+        self.poster = poster
+        self.summary = {"posted": 0, "retry": 0, "dead": 0}
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._thread = None
+
+    def _send(self, item: dict) -> str:
+        poster = self.poster or x_poster.post_to_x
+        tweet_ids = item.get("tweet_ids", [])
+        text = _segments(item)[len(tweet_ids)]
+        with tracing.span("post_queue.send", item=item["id"], attempt=item["attempts"], segment=len(tweet_ids)):
+            try:
+                if tweet_ids:
+                    result = poster(text, in_reply_to_tweet_id=tweet_ids[-1])
+                else:
+                    result = poster(text)
+            except Exception as e:
+                # 予期しない例外も一時的な失敗として扱い、項目は失わない
+                print(f"エラー: 投稿処理で例外が発生しました: {e}")
+                result = {"ok": False, "status": "error", "retryable": True, "error": str(e)}
+        outcome = _update(self.path, lambda queue: _complete(queue, item["id"], result, time.time()))
+        self.summary[outcome] += 1
+        return outcome
+
+    def run(self):
+        """送れる項目を送り続ける。close() 後は、今すぐ送れる項目が無くなった時点で終わる。"""
+        while True:
+            item, wait = _update(self.path, lambda queue: _claim(queue, time.time()))
+            if item:
+                self._send(item)
+                continue
+            if self._closing.is_set():
+                return
+            self._wake.wait(timeout=wait)
+            self._wake.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="x-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def notify(self):
+        """新しい項目を積んだことを知らせる。"""
+        self._wake.set()
+
+    def close(self, timeout: float | None = None) -> dict:
+        """
+        今送れる項目を送り終えたら止める（バックオフやレート制限で待っている項目はキューに残る）。
+        timeout 秒以内に終わらない場合は、送信中の処理を待たずに戻る。
+        戻り値: この Publisher が送った結果の件数
+        """
+        self._closing.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print(f"警告: 投稿が{timeout}秒以内に完了しませんでした。完了を待たずに処理を続けます。")
+        return dict(self.summary)
+
+def publish_pending(path: str, timeout: float | None = None, poster=None) -> dict:
+    """キューのうち今送れる項目を送る（前回までの実行で残った項目も含む）。"""
+    return Publisher(path, poster).start().close(timeout)
+
+def posted_awaiting_metrics(path: str, min_age_seconds: float, now: float | None = None) -> list:
+    """投稿から min_age_seconds 以上経ち、まだ反応を報酬として記録していない投稿済みの項目を返す。"""
+    now = now or time.time()
+    return [
+        record for record in _read(path)["posted"]
+        if not record["rewarded"] and record["tweet_ids"] and record["tweet_ids"][0] and record["posted_at"] + min_age_seconds <= now
+    ]
+
+def mark_rewarded(path: str, item_ids: list):
+    """反応を報酬として記録した項目に印を付ける（同じ投稿を二重に数えない）。"""
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+
+    def _mark(queue):
+        for record in queue["posted"]:
+            if record["id"] in item_ids:
+                record["rewarded"] = True
+    _update(path, _mark)
+
+def get_stats(path: str, now: float | None = None) -> dict:
+    """キューの深さ（項目数と未投稿の投稿数）・最古の項目の待ち時間・送信不能の件数・レート制限の状態を返す。"""
+    now = now or time.time()
+    queue = _read(path)
+    items = queue["items"]
+    return {
+        "depth": len(items),
+        "pending_posts": _pending_posts(queue),
+        "ready": sum(1 for item in items if max(item["next_attempt_at"], item["leased_until"]) <= now),
+        "oldest_age_seconds": now - min(item["enqueued_at"] for item in items) if items else 0.0,
+        "dead": len(queue["dead"]),
+        "sent": queue["sent"],
+        "rate_limit": queue["rate_limit"],
+    }
+
+def print_stats(path: str):
+    if not os.path.exists(path):
+        return
+    stats = get_stats(path)
+    message = f"投稿キュー: 待ち {stats['depth']}件"
+    if stats["pending_posts"] > stats["depth"]:
+        message += f"（スレッドを含め {stats['pending_posts']}投稿）"
+    if stats["depth"]:
+        message += f"（最古 {stats['oldest_age_seconds'] / 60:.1f}分前）"
+    message += f", 送信不能 {stats['dead']}件, 送信済み累計 {stats['sent']}件"
+    rate_limit = stats["rate_limit"]
+    if rate_limit and rate_limit.get("reset", 0) > time.time():
+        message += f", レート制限の残り {rate_limit['remaining']}回（{time.strftime('%H:%M:%S', time.localtime(rate_limit['reset']))} にリセット）"
+    print(message)
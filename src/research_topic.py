@@ -1,15 +1,15 @@
 #src/research_topic.py
-import re
 import json
 import random
 import os
+import asyncio
 from datetime import datetime
-from google import genai
 import sys
 
 # --- モジュール検索パスの設定 ---
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import config
+from src import state_store, gemini_client, persona_cache, response_cache, json_extract, tracing, retry
 
 # --- 定数定義 ---
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -27,19 +27,47 @@ def load_json_file(file_path: str) -> dict:
         return json.load(f)
 
 def parse_gemini_response_to_json(response_text: str) -> dict:
-    """Geminiの応答からマークダウン形式のJSONを抽出し、辞書にパースする。"""
-    match = re.search(r"```json\s*(\{.*?\})\s*```", response_text, re.DOTALL)
-    if not match:
-        raise ValueError("Geminiの応答からJSONデータを抽出できませんでした。")
-    return json.loads(match.group(1))
+    """Geminiの応答（```json フェンスの有無を問わない）からJSONを抽出し、辞書にパースする。"""
+    return json_extract.extract_json(response_text)
 
-def generate_rich_content_from_topic(topic_data: dict) -> dict:
+def build_character_prompt(research_summary: dict, avoid_tweets: list | None = None) -> str:
     """
-    指定されたトピックについて2段階の思考プロセスで調査・ツイート生成を行い、
-    リッチな情報を含む辞書を返す。
+    フェーズ2の指示部分（ペルソナ本文を除く）を組み立てる。
+    avoid_tweets: 内容が重複したため書き直してほしい過去のツイート（再生成時のみ）
+    """
+    prompt = f"""
+    あなたの調査チームがまとめた下記の「調査レポート」を読んでください。
+    このレポート内容に対して、あなたがどう感じ、どう考えたか、そして最終的にどのようなツイートをするかを、あなたのキャラクターとしてシミュレートしてください。
+
+    # 調査レポート:
+    {json.dumps(research_summary, ensure_ascii=False, indent=2)}
+
+    # 出力指示:
+    あなたの思考過程と最終的なツイートを、必ず以下のJSON形式で出力してください。他のテキストは一切含めないでください。
+    ```json
+    {{
+      "tweet": "（ペルソナに基づいた100字程度のユニークなツイート本文）",
+      "thought_process": {{
+        "persona_element": "（調査レポートを読んで、あなたのペルソナのどの部分が特に刺激されたか）",
+        "reasoning": "（なぜそのように感じ、最終的にそのツイート内容に行き着いたかの思考プロセス）",
+        "tone_and_manner": "（A-Kカルマとしての口調や雰囲気。どんな時も必ず丁寧な男性のですます調で話します。冗談や真面目な話題でも一貫して丁寧な語尾を守っています。）"
+      }}
+    }}
+    ```
     """
-    api_key = config.GEMINI_API_KEY
-    client = genai.Client(api_key=api_key)
+    if avoid_tweets:
+        examples = "\n".join(f"- {t}" for t in avoid_tweets)
+        prompt += f"""
+    # 注意:
+    以下のツイートは過去の投稿とほぼ同じ内容でした。同じ言い回しを避け、別の切り口で新しいツイートを書いてください。
+    {examples}
+    """
+    return prompt
+
+async def aresearch_topic_phase1(topic_data: dict, timeout: float | None = None) -> dict:
+    """フェーズ1（非同期）: トピックについてWeb調査を行い、客観的な調査レポート（辞書）を返す。"""
+    client = gemini_client.get_async_client()
+    timeout = timeout or config.RESEARCH_PHASE1_TIMEOUT_SECONDS
     
     theme = topic_data.get('theme', '')
     keywords = ", ".join(topic_data.get('keywords', []))
@@ -65,63 +93,176 @@ def generate_rich_content_from_topic(topic_data: dict) -> dict:
     }}
     ```
     """
+    with tracing.span("research.phase1", theme=theme):
+        cached_text = await asyncio.to_thread(response_cache.get, "research_phase1", MODEL_NAME, prompt_phase1)
+        tracing.set_attrs(cache_hit=cached_text is not None)
+        try:
+            if cached_text is not None:
+                print("--- [フェーズ1] キャッシュ済みの調査結果を使用します。 ---")
+                response_text = cached_text
+            else:
+                # 【修正点1】調査用のチャットセッションを生成 (ツールを有効化)
+                research_chat_session = client.chats.create(
+                    model=MODEL_NAME,
+                    config={'tools': [{'google_search': {}}]}
+                )
+                # 【修正点2】チャットセッションにメッセージを送信
+                response_phase1 = await retry.acall(
+                    lambda: asyncio.wait_for(research_chat_session.send_message(prompt_phase1), timeout),
+                    site="フェーズ1",
+                )
+                tracing.record_usage(response_phase1)
+                response_text = response_phase1.text
+            research_summary = parse_gemini_response_to_json(response_text)
+            print("--- [フェーズ1] 調査完了。 ---")
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"[フェーズ1] Gemini APIの応答が{timeout}秒以内に返りませんでした。")
+        except (Exception, ValueError) as e:
+            raise ConnectionError(f"[フェーズ1] Gemini APIとの通信または応答の解析中にエラーが発生しました: {e}")
+        # 解析できた応答だけをキャッシュする
+        if cached_text is None:
+            await asyncio.to_thread(response_cache.put, "research_phase1", MODEL_NAME, prompt_phase1, response_text)
+        return research_summary
+
+def research_topic_phase1(topic_data: dict) -> dict:
+    """フェーズ1: トピックについてWeb調査を行い、客観的な調査レポート（辞書）を返す。"""
+    return gemini_client.run_sync(aresearch_topic_phase1(topic_data))
+
+async def _astream_character_post(chat_session, prompt: str, on_tweet) -> tuple[str, dict]:
+    """
+    フェーズ2の応答をストリーミングで受け取り、"tweet" が閉じた時点で on_tweet(tweet) を呼ぶ。
+    on_tweet（投稿キューへの書き込みなど）はブロックするため、イベントループを止めないよう別スレッドで実行する。
+    戻り値: (応答テキスト全体, 解析済みのJSON)
+    """
+    extractor = json_extract.StreamingJsonExtractor()
+    tweet = None
+    last_chunk = None
+    async for chunk in await chat_session.send_message_stream(prompt):
+        extractor.feed(chunk.text or "")
+        # usage_metadata はチャンクごとの累計なので、最後のチャンクの値だけを記録する
+        if getattr(chunk, "usage_metadata", None) is not None:
+            last_chunk = chunk
+        if tweet is None:
+            tweet = json_extract.find_string_field(extractor.text, "tweet")
+            if tweet is not None:
+                print("--- [フェーズ2] ツイート本文の生成が完了しました（思考過程は生成中）。 ---")
+                await asyncio.to_thread(on_tweet, tweet)
+    if last_chunk is not None:
+        tracing.record_usage(last_chunk)
     try:
-        # 【修正点1】調査用のチャットセッションを生成 (ツールを有効化)
-        research_chat_session = client.chats.create(
-            model=MODEL_NAME,
-            config={'tools': [{'google_search': {}}]}
-        )
-        # 【修正点2】チャットセッションにメッセージを送信
-        response_phase1 = research_chat_session.send_message(prompt_phase1)
-        research_summary = parse_gemini_response_to_json(response_phase1.text)
-        print("--- [フェーズ1] 調査完了。 ---")
-    except (Exception, ValueError) as e:
-        raise ConnectionError(f"[フェーズ1] Gemini APIとの通信または応答の解析中にエラーが発生しました: {e}")
+        return extractor.text, extractor.close()
+    except json_extract.JsonExtractionError as e:
+        if tweet is None:
+            raise
+        # ツイートは既に渡しているので、思考過程が壊れていてもツイートだけは記録に残す
+        # （壊れた応答はキャッシュしないよう、応答テキストは None を返す）
+        print(f"警告: [フェーズ2] 思考過程の解析に失敗しました。ツイートのみ記録します: {e}")
+        return None, {"tweet": tweet, "thought_process": {}}
+
+async def _persona_for_prompt(research_summary: dict, topic: dict | None) -> tuple:
+    """
+    フェーズ2で使うペルソナを返す。戻り値: (ペルソナ本文, ペルソナのハッシュ, コンテキストキャッシュ名 または None, 抜粋か)
+    PERSONA_EXCERPT の場合は、テーマに関係する部分の抜粋をプロンプトに直接埋め込む。
+    """
+    persona_text, persona_digest = persona_cache.load_persona(PERSONA_FILE_PATH)
+    if config.PERSONA_EXCERPT:
+        from src import persona_index  # NumPy は抜粋を使う時だけ読み込む
+        query = persona_index.build_query(research_summary, topic)
+        excerpt = await asyncio.to_thread(persona_index.excerpt_persona, PERSONA_FILE_PATH, query)
+        return excerpt, persona_digest, None, True
+    # ペルソナはコンテキストキャッシュに載せ、プロンプトには調査レポートと出力指示だけを送る
+    cached_content = await asyncio.to_thread(
+        persona_cache.get_cached_content_name, gemini_client.get_client(), MODEL_NAME, PERSONA_FILE_PATH
+    )
+    return persona_text, persona_digest, cached_content, False
+
+async def agenerate_character_post(research_summary: dict, timeout: float | None = None, on_tweet=None,
+                                   avoid_tweets: list | None = None, topic: dict | None = None) -> dict:
+    """
+    フェーズ2（非同期）: 調査レポートにペルソナを反映し、ツイートと思考過程（辞書）を返す。
+    on_tweet を渡すとストリーミングで生成し、ツイート本文が揃った時点で on_tweet(tweet) を呼ぶ。
+    avoid_tweets を渡すと、それらと重複しないよう書き直しを指示する。
+    topic（テーマ・キーワード）は PERSONA_EXCERPT の場合にペルソナの抜粋を選ぶのに使う。
+    """
+    client = gemini_client.get_async_client()
+    timeout = timeout or config.RESEARCH_PHASE2_TIMEOUT_SECONDS
 
     # --- フェーズ2: ペルソナの反映とツイート生成 ---
     print("\n--- [フェーズ2] キャラクターペルソナによる反応とツイート生成を開始します... ---")
     
-    try:
-        with open(PERSONA_FILE_PATH, 'r', encoding='utf-8') as f:
-            persona_text = f.read()
-    except FileNotFoundError:
-        raise FileNotFoundError(f"エラー: ペルソナファイルが見つかりません - {PERSONA_FILE_PATH}")
-    
-    prompt_phase2 = f"""
-    あなたは、以下のペルソナを持つAIキャラクター「A-Kカルマ」です。
-    あなたの調査チームがまとめた下記の「調査レポート」を読んでください。
-    このレポート内容に対して、あなたがどう感じ、どう考えたか、そして最終的にどのようなツイートをするかを、あなたのキャラクターとしてシミュレートしてください。
-
-    # あなたのペルソナ分析:
-    {persona_text}
+    with tracing.span("research.phase2", streaming=bool(on_tweet)):
+        persona_text, persona_digest, cached_content, excerpt = await _persona_for_prompt(research_summary, topic)
+        prompt_phase2 = build_character_prompt(research_summary, avoid_tweets)
+        if not cached_content:
+            prompt_phase2 = persona_cache.build_persona_instruction(persona_text, excerpt) + prompt_phase2
+        # ペルソナがキャッシュ側にある場合もあるため、ペルソナのハッシュもキーに含める
+        cached_text = await asyncio.to_thread(
+            response_cache.get, "research_phase2", MODEL_NAME, prompt_phase2, persona_digest
+        )
+        tracing.set_attrs(cache_hit=cached_text is not None, persona_context_cache=bool(cached_content), persona_excerpt=excerpt)
+        try:
+            if cached_text is not None:
+                print("--- [フェーズ2] キャッシュ済みの生成結果を使用します。 ---")
+                response_text = cached_text
+            else:
+                # 【修正点3】ペルソナ反映用の新しいチャットセッションを生成 (ツールは不要)
+                character_chat_session = client.chats.create(
+                    model=MODEL_NAME,
+                    config={'cached_content': cached_content} if cached_content else None
+                )
+                # 【修正点4】チャットセッションにメッセージを送信
+                if on_tweet:
+                    # ツイートを渡した後に失敗した場合は、二重投稿を避けるため再試行しない
+                    delivered = []
+                    def _on_tweet(tweet: str):
+                        delivered.append(tweet)
+                        on_tweet(tweet)
+                    response_text, character_post = await retry.acall(
+                        lambda: asyncio.wait_for(
+                            _astream_character_post(character_chat_session, prompt_phase2, _on_tweet), timeout
+                        ),
+                        site="フェーズ2",
+                        retryable=lambda e: not delivered and retry.is_retryable(e),
+                    )
+                else:
+                    response_phase2 = await retry.acall(
+                        lambda: asyncio.wait_for(character_chat_session.send_message(prompt_phase2), timeout),
+                        site="フェーズ2",
+                    )
+                    tracing.record_usage(response_phase2)
+                    response_text = response_phase2.text
+            if cached_text is not None or not on_tweet:
+                character_post = parse_gemini_response_to_json(response_text)
+                if on_tweet and character_post.get("tweet"):
+                    await asyncio.to_thread(on_tweet, character_post["tweet"])
+            print("--- [フェーズ2] ツイート生成完了。 ---")
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"[フェーズ2] Gemini APIの応答が{timeout}秒以内に返りませんでした。")
+        except (Exception, ValueError) as e:
+            raise ConnectionError(f"[フェーズ2] Gemini APIとの通信または応答の解析中にエラーが発生しました: {e}")
+        if cached_text is None:
+            await asyncio.to_thread(
+                response_cache.put, "research_phase2", MODEL_NAME, prompt_phase2, response_text, persona_digest
+            )
+        return character_post
 
-    # 調査レポート:
-    {json.dumps(research_summary, ensure_ascii=False, indent=2)}
+def generate_character_post(research_summary: dict, on_tweet=None, avoid_tweets: list | None = None,
+                            topic: dict | None = None) -> dict:
+    """
+    フェーズ2: 調査レポートにペルソナを反映し、ツイートと思考過程（辞書）を返す。
+    topic（テーマ・キーワード）はペルソナの抜粋（PERSONA_EXCERPT）の検索に使う。
+    """
+    return gemini_client.run_sync(
+        agenerate_character_post(research_summary, on_tweet=on_tweet, avoid_tweets=avoid_tweets, topic=topic)
+    )
 
-    # 出力指示:
-    あなたの思考過程と最終的なツイートを、必ず以下のJSON形式で出力してください。他のテキストは一切含めないでください。
-    ```json
-    {{
-      "tweet": "（ペルソナに基づいた100字程度のユニークなツイート本文）",
-      "thought_process": {{
-        "persona_element": "（調査レポートを読んで、あなたのペルソナのどの部分が特に刺激されたか）",
-        "reasoning": "（なぜそのように感じ、最終的にそのツイート内容に行き着いたかの思考プロセス）",
-        "tone_and_manner": "（A-Kカルマとしての口調や雰囲気。どんな時も必ず丁寧な男性のですます調で話します。冗談や真面目な話題でも一貫して丁寧な語尾を守っています。）"
-      }}
-    }}
-    ```
+async def agenerate_rich_content_from_topic(topic_data: dict, on_tweet=None) -> dict:
     """
-    try:
-        # 【修正点3】ペルソナ反映用の新しいチャットセッションを生成 (ツールは不要)
-        character_chat_session = client.chats.create(
-            model=MODEL_NAME
-        )
-        # 【修正点4】チャットセッションにメッセージを送信
-        response_phase2 = character_chat_session.send_message(prompt_phase2)
-        character_post = parse_gemini_response_to_json(response_phase2.text)
-        print("--- [フェーズ2] ツイート生成完了。 ---")
-    except (Exception, ValueError) as e:
-        raise ConnectionError(f"[フェーズ2] Gemini APIとの通信または応答の解析中にエラーが発生しました: {e}")
+    generate_rich_content_from_topic の非同期版。
+    各フェーズにはタイムアウト（RESEARCH_PHASE1/2_TIMEOUT_SECONDS）がかかり、タスクのキャンセルにも対応する。
+    """
+    research_summary = await aresearch_topic_phase1(topic_data)
+    character_post = await agenerate_character_post(research_summary, on_tweet=on_tweet, topic=topic_data)
 
     # --- 最終的なリッチな情報を統合して返す ---
     final_result = {
@@ -131,24 +272,31 @@ def generate_rich_content_from_topic(topic_data: dict) -> dict:
     
     return final_result
 
+async def agenerate_rich_contents(topics: list, concurrency: int | None = None) -> list:
+    """
+    複数トピックを1つのイベントループで同時に処理する。同時実行数は concurrency で制限する。
+    戻り値: topics と同じ順序の結果リスト（失敗したトピックは例外オブジェクト）
+    """
+    semaphore = asyncio.Semaphore(concurrency or config.BATCH_RESEARCH_WORKERS)
+
+    async def _run(topic_data: dict):
+        async with semaphore:
+            return await agenerate_rich_content_from_topic(topic_data)
+
+    return await asyncio.gather(*[_run(topic) for topic in topics], return_exceptions=True)
+
+def generate_rich_content_from_topic(topic_data: dict, on_tweet=None) -> dict:
+    """
+    指定されたトピックについて2段階の思考プロセスで調査・ツイート生成を行い、
+    リッチな情報を含む辞書を返す。
+    on_tweet を渡すとフェーズ2をストリーミングで行い、ツイート本文が揃った時点で on_tweet(tweet) を呼ぶ。
+    """
+    return gemini_client.run_sync(agenerate_rich_content_from_topic(topic_data, on_tweet=on_tweet))
+
 
 def save_knowledge_as_json(file_path: str, data_to_add: dict):
-    """生成された知識をJSONファイルに追記する。"""
-    # (この関数の内容は変更なし)
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            try:
-                all_data = json.load(f)
-            except json.JSONDecodeError:
-                all_data = {"knowledge_entries": []}
-    else:
-        all_data = {"knowledge_entries": []}
-    
-    all_data["knowledge_entries"].append(data_to_add)
-    
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
-    
+    """生成された知識をJSONファイルに追記する（ロック付き・アトミック書き込み）。"""
+    state_store.append_knowledge_entry(file_path, data_to_add)
     print(f"知識データを {file_path} に保存しました。")
 
     
@@ -0,0 +1,110 @@
+# src/response_cache.py
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+
+# Gemini の応答テキストをディスク（SQLite）にキャッシュする。
+# キーは「モデル名 + プロンプト（+ 追加のキー材料）」のハッシュ。
+# 呼び出し箇所（site）ごとに有効期限を変え、合計サイズが上限を超えたら最終参照が古いものから削除する。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CACHE_DB_PATH = os.path.join(PROJECT_ROOT, config.CACHE_DIR, 'gemini_responses.sqlite3')
+
+_stats_lock = threading.Lock()
+_stats = {}   # site -> {"hits": int, "misses": int}
+
+
+@contextmanager
+def _connect():
+    """キャッシュDBに接続し、ブロックを抜けたらコミットして閉じる。"""
+    os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            site TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _record(site: str, hit: bool):
+    with _stats_lock:
+        stats = _stats.setdefault(site, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+def make_key(model: str, prompt: str, extra: str = "") -> str:
+    """モデル名・プロンプト・追加のキー材料からキャッシュキーを作る。"""
+    material = "\0".join([model, prompt, extra])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+def ttl_for(site: str) -> int:
+    """呼び出し箇所ごとの有効期限（秒）。未定義の site はキャッシュしない（0）。"""
+    return config.RESPONSE_CACHE_TTLS.get(site, 0)
+
+def get(site: str, model: str, prompt: str, extra: str = "") -> str | None:
+    """有効期限内のキャッシュがあれば応答テキストを返す。"""
+    ttl = ttl_for(site)
+    if not config.RESPONSE_CACHE_ENABLED or ttl <= 0:
+        return None
+    key = make_key(model, prompt, extra)
+    now = time.time()
+    with _connect() as conn:
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row and now - row[1] <= ttl:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            _record(site, True)
+            return row[0]
+        if row:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+    _record(site, False)
+    return None
+
+def put(site: str, model: str, prompt: str, response: str, extra: str = ""):
+    """応答テキストを保存し、サイズ上限を超えた分を LRU で削除する。"""
+    if not config.RESPONSE_CACHE_ENABLED or ttl_for(site) <= 0 or not response:
+        return
+    key = make_key(model, prompt, extra)
+    now = time.time()
+    size = len(response.encode('utf-8'))
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, site, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, site, response, size, now, now),
+        )
+        _evict(conn)
+
+def _evict(conn: sqlite3.Connection):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= config.RESPONSE_CACHE_MAX_BYTES:
+        return
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+        if total <= config.RESPONSE_CACHE_MAX_BYTES:
+            break
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        total -= size
+
+def get_stats() -> dict:
+    """呼び出し箇所ごとのヒット数・ミス数を返す。"""
+    with _stats_lock:
+        return {site: dict(stats) for site, stats in _stats.items()}
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,192 @@
+# src/retry.py
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import tracing
+
+# Gemini 呼び出しの共通リトライエンジン。
+# - 一時的なエラー（429 / 5xx / タイムアウト / 接続エラー）だけを、指数バックオフ＋ジッターで再試行する
+# - サーバーが待ち時間を指示した場合（Retry-After ヘッダー、RetryInfo の retryDelay）はそれに従う
+# - 1回の実行で失敗に費やした時間（失敗した試行の所要時間＋待機時間）が予算を超える再試行はしない
+# - 連続して失敗した場合はサーキットブレーカーを開き、クールダウンが明けるまで即座に失敗させる
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_state = {
+    "budget_spent": 0.0,       # 今回の実行で失敗した試行と再試行の待機に使った秒数
+    "consecutive_failures": 0,
+    "opened_at": None,         # サーキットブレーカーが開いた時刻（monotonic）
+}
+_random = random.Random()
+
+
+class CircuitOpenError(ConnectionError):
+    """サーキットブレーカーが開いているため、呼び出しを行わなかったことを表す例外。"""
+
+
+def _status_code(error) -> int | None:
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+def is_retryable(error: BaseException) -> bool:
+    """再試行すれば成功する見込みのあるエラーかを判定する。"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    code = _status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # httpx の通信エラー（読み込み済みの場合のみ判定する）
+    httpx = sys.modules.get("httpx")
+    return bool(httpx and isinstance(error, (httpx.TimeoutException, httpx.TransportError)))
+
+def _parse_duration(value: str) -> float | None:
+    """"23s" / "1.5s" / "30" のような待ち時間を秒に変換する。"""
+    try:
+        return max(0.0, float(str(value).strip().rstrip('s')))
+    except ValueError:
+        return None
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """エラーに含まれる待ち時間の指示（Retry-After ヘッダー / RetryInfo）を秒で返す。"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    header = headers.get("retry-after") if hasattr(headers, "get") else None
+    if header:
+        seconds = _parse_duration(header)
+        if seconds is not None:
+            return seconds
+        try:
+            return max(0.0, (parsedate_to_datetime(header) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    details = getattr(error, "details", None)
+    error_body = details.get("error", details) if isinstance(details, dict) else {}
+    for detail in error_body.get("details", []) if isinstance(error_body, dict) else []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return _parse_duration(detail["retryDelay"])
+    return None
+
+def backoff_delay(attempt: int, error: BaseException | None = None) -> float:
+    """attempt 回目（1始まり）の失敗後に待つ秒数。サーバーの指示があればそれを優先する。"""
+    hinted = retry_after_seconds(error) if error is not None else None
+    if hinted is not None:
+        return min(hinted, config.GEMINI_RETRY_MAX_DELAY_SECONDS)
+    delay = min(config.GEMINI_RETRY_MAX_DELAY_SECONDS, config.GEMINI_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    # フルジッター: 同時に失敗した呼び出しが一斉に再送しないようにする
+    with _lock:
+        return _random.uniform(0, delay)
+
+def _check_circuit(site: str):
+    with _lock:
+        opened_at = _state["opened_at"]
+        if opened_at is None:
+            return
+        remaining = config.GEMINI_CIRCUIT_COOLDOWN_SECONDS - (time.monotonic() - opened_at)
+        if remaining > 0:
+            raise CircuitOpenError(
+                f"[{site}] Gemini APIで失敗が続いているため呼び出しを停止しています（あと{remaining:.0f}秒）。"
+            )
+        # クールダウン明け: 1回だけ試し、失敗すればすぐに再び開く
+        _state["opened_at"] = None
+        _state["consecutive_failures"] = config.GEMINI_CIRCUIT_FAILURE_THRESHOLD - 1
+
+def _record_success():
+    with _lock:
+        _state["consecutive_failures"] = 0
+        _state["opened_at"] = None
+
+def _record_failure(site: str):
+    with _lock:
+        _state["consecutive_failures"] += 1
+        if _state["consecutive_failures"] >= config.GEMINI_CIRCUIT_FAILURE_THRESHOLD and _state["opened_at"] is None:
+            _state["opened_at"] = time.monotonic()
+            print(f"警告: [{site}] Gemini APIの失敗が{_state['consecutive_failures']}回続いたため、"
+                  f"{config.GEMINI_CIRCUIT_COOLDOWN_SECONDS:.0f}秒間呼び出しを停止します。")
+
+def _plan_retry(site: str, attempt: int, error: BaseException, elapsed: float, retryable) -> float | None:
+    """再試行する場合は待機秒数を、しない場合は None を返す（失敗の記録も行う）。"""
+    if not (retryable or is_retryable)(error):
+        return None
+    _record_failure(site)
+    with _lock:
+        _state["budget_spent"] += elapsed
+    if attempt >= config.GEMINI_RETRY_MAX_ATTEMPTS:
+        return None
+    delay = backoff_delay(attempt, error)
+    with _lock:
+        if _state["opened_at"] is not None:
+            return None
+        remaining = config.GEMINI_RETRY_BUDGET_SECONDS - _state["budget_spent"]
+        if delay > remaining:
+            print(f"警告: [{site}] 再試行の予算（残り{max(0.0, remaining):.1f}秒）を超えるため再試行しません。")
+            return None
+        _state["budget_spent"] += delay
+    tracing.record_retry()
+    print(f"警告: [{site}] Gemini APIの呼び出しに失敗しました（{attempt}回目）。{delay:.1f}秒後に再試行します: {error}")
+    return delay
+
+def call(fn, *args, site: str = "gemini", retryable=None, **kwargs):
+    """
+    fn(*args, **kwargs) を再試行付きで呼び出す。
+    retryable(error) を渡すと、再試行してよいエラーの判定を差し替えられる。
+    """
+    attempt = 0
+    while True:
+        _check_circuit(site)
+        attempt += 1
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            delay = _plan_retry(site, attempt, e, time.monotonic() - started, retryable)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        _record_success()
+        return result
+
+async def acall(fn, *args, site: str = "gemini", retryable=None, **kwargs):
+    """call() の非同期版。fn はコルーチンを返す関数（呼び出すたびに新しいコルーチンを作る）。"""
+    attempt = 0
+    while True:
+        _check_circuit(site)
+        attempt += 1
+        started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            delay = _plan_retry(site, attempt, e, time.monotonic() - started, retryable)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _record_success()
+        return result
+
+def get_state() -> dict:
+    with _lock:
+        return dict(_state)
+
+def reset():
+    """予算とサーキットブレーカーの状態を初期化する。"""
+    with _lock:
+        _state["budget_spent"] = 0.0
+        _state["consecutive_failures"] = 0
+        _state["opened_at"] = None
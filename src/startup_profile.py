@@ -0,0 +1,67 @@
+# src/startup_profile.py
+import os
+import sys
+import subprocess
+
+# 起動時の import 時間を計測する。
+# 別プロセスで python -X importtime を実行し、その出力をパッケージごとに集計する。
+# 定期実行のボットでは起動時間が実行時間の無視できない割合を占めるため、
+# 重いライブラリ（DEFERRED_MODULES）は最初に使う時まで読み込まない方針にしている。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# 起動時には読み込まず、最初に使う時まで遅延させるモジュール
+DEFERRED_MODULES = ["google.genai", "httpx", "docx", "requests", "requests_oauthlib", "dotenv"]
+
+
+def parse_importtime(stderr: str) -> dict:
+    """-X importtime の出力を {モジュール名: (自身のµs, 累計µs)} に変換する。"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # ヘッダー行
+        timings[parts[2].strip()] = (self_us, cumulative_us)
+    return timings
+
+def measure_imports(module: str = "src.main") -> dict:
+    """新しいプロセスで module を import し、各モジュールの import 時間を返す。"""
+    code = f"import sys; sys.path.insert(0, {PROJECT_ROOT!r}); import {module}"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module} の import に失敗しました:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+def group_by_package(timings: dict) -> dict:
+    """自身の import 時間をトップレベルのパッケージごとに合計する（µs）。"""
+    totals = {}
+    for name, (self_us, _) in timings.items():
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+def loaded_deferred_modules(timings: dict) -> list:
+    """起動時に読み込まれてしまった遅延対象モジュールを返す。"""
+    return [m for m in DEFERRED_MODULES if m in timings]
+
+def print_report(module: str = "src.main", top: int = 15):
+    """import 時間の内訳を表示する（--profile-startup 用）。"""
+    timings = measure_imports(module)
+    total_us = timings.get(module, (0, 0))[1]
+    print(f"--- 起動時の import 時間: {module} 合計 {total_us / 1000:.1f}ms ---")
+    print(f"{'パッケージ':<30}{'ms':>10}")
+    for package, self_us in sorted(group_by_package(timings).items(), key=lambda kv: -kv[1])[:top]:
+        print(f"{package:<30}{self_us / 1000:>10.1f}")
+    deferred = loaded_deferred_modules(timings)
+    if deferred:
+        print(f"警告: 遅延読み込みの対象が起動時に読み込まれています: {', '.join(deferred)}")
+    else:
+        print(f"遅延読み込みの対象（{', '.join(DEFERRED_MODULES)}）は起動時に読み込まれていません。")
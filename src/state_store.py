@@ -0,0 +1,292 @@
+# src/state_store.py
+import os
+import json
+import copy
+import stat
+import time
+import codecs
+import tempfile
+from contextlib import contextmanager
+
+from src import tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# knowledge_base 配下のJSON状態ファイルを安全に読み書きするための共通モジュール。
+# - 書き込みは「一時ファイルに書く → fsync → rename」で行い、途中で落ちても壊れたJSONを残さない
+# - 読み込み→変更→書き込み の間はアドバイザリロックを保持し、複数のボットが同時に動いても追記が失われない
+# - {"knowledge_entries": [...]} 形式のファイルは、件数と最後のエントリをサイドカー（*.meta.json）に記録し、
+#   件数を知るだけのために全体を解析しない。全件が必要な場合も1件ずつ読み進める（メモリはエントリ1件分）
+
+STREAM_CHUNK_SIZE = 64 * 1024
+LOCK_RETRY_SECONDS = 0.1
+
+# 新しく作るファイルの権限（os.umask は値を読むにも書き換えが要るため、読み込み時に一度だけ取得する）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def lock_path_for(path: str) -> str:
+    """状態ファイルに対応するロックファイルのパスを返す。"""
+    return path + '.lock'
+
+@contextmanager
+def file_lock(path: str):
+    """指定した状態ファイルの排他ロックを取得するコンテキストマネージャ。"""
+    lock_file = lock_path_for(path)
+    os.makedirs(os.path.dirname(os.path.abspath(lock_file)), exist_ok=True)
+    with open(lock_file, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            # LK_LOCK は1秒おきに10回試して取れなければ OSError になるので、少し待ってからやり直す
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(LOCK_RETRY_SECONDS)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _fsync_dir(dir_path: str):
+    """rename をディスクに確定させるため、ディレクトリをfsyncする（POSIXのみ）。"""
+    if os.name != 'posix':
+        return
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _file_mode(path: str) -> int:
+    """書き込み後のファイルの権限（既存ファイルはその権限、新しいファイルは umask を適用した 0666）。"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+def atomic_write_bytes(path: str, data: bytes):
+    """バイト列を一時ファイル経由でアトミックに書き込む（ファイルの権限は保つ）。"""
+    dir_path = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dir_path, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=dir_path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp の一時ファイルは 0600 で作られ、rename すると元のファイルの権限が失われるため
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(dir_path)
+    tracing.record_bytes_written(len(data))
+
+def atomic_write_text(path: str, text: str):
+    """テキストを一時ファイル経由でアトミックに書き込む。"""
+    atomic_write_bytes(path, text.encode('utf-8'))
+
+def atomic_write_json(path: str, data, indent: int | None = 2):
+    """JSONを一時ファイル経由でアトミックに書き込む。"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+def read_json(path: str, default=None):
+    """
+    JSONファイルを読み込む。ファイルが無い場合は default のコピーを返す。
+    壊れたJSONは空扱いにせず ValueError を送出する（履歴を上書きで消さないため）。
+    """
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        tracing.record_bytes_read(len(raw))
+        return json.loads(raw.decode('utf-8'))
+    except FileNotFoundError:
+        return copy.deepcopy(default)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"エラー: 状態ファイルが破損しています - {path}: {e}")
+
+def update_json(path: str, default, mutate, indent: int | None = 2):
+    """
+    ロックを保持したまま JSON を読み込み、mutate(data) で変更して書き戻す。
+    mutate が値を返した場合はそれを新しい内容として保存する。
+    戻り値: 保存した内容
+    """
+    with file_lock(path):
+        data = read_json(path, default)
+        result = mutate(data)
+        if result is not None:
+            data = result
+        atomic_write_json(path, data, indent=indent)
+        return data
+
+class _JsonStream:
+    """ファイルを少しずつ読みながら JSON の値を1つずつ取り出す（全体をメモリに載せない）。"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """続きを読み込む。戻り値: 読み込めた場合は True（ファイル末尾なら False）"""
+        if self.eof:
+            return False
+        raw = self.f.read(self.chunk_size)
+        tracing.record_bytes_read(len(raw))
+        self.eof = not raw
+        self.buf = self.buf[self.pos:] + self.text_decoder.decode(raw, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """空白を読み飛ばし、次の1文字を返す（ファイル末尾なら空文字）。"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise json.JSONDecodeError(f"'{chars}' が必要です", self.buf, self.pos)
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+                # バッファ末尾で終わる数値などは途中で切れている可能性があるため、続きを読んでから解析し直す
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def iter_json_array(path: str, key: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    {"key": [...], ...} 形式のJSONファイルから、key の配列の要素を先頭から1件ずつ返すイテレータ。
+    ファイルが無い場合は何も返さない。壊れたJSONは ValueError を送出する。
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        stream = _JsonStream(f, chunk_size)
+        try:
+            stream.expect('{')
+            if stream.peek() == '}':
+                return
+            while True:
+                name = stream.value()
+                stream.expect(':')
+                if name == key:
+                    stream.expect('[')
+                    if stream.peek() == ']':
+                        stream.pos += 1
+                    else:
+                        while True:
+                            yield stream.value()
+                            if stream.expect(',]') == ']':
+                                break
+                else:
+                    stream.value()
+                if stream.expect(',}') == '}':
+                    return
+        except json.JSONDecodeError as e:
+            raise ValueError(f"エラー: 状態ファイルが破損しています - {path}: {e}")
+
+def iter_knowledge_entries(path: str):
+    """{"knowledge_entries": [...]} 形式のファイルのエントリを1件ずつ返すイテレータ。"""
+    return iter_json_array(path, "knowledge_entries")
+
+def knowledge_meta_path(path: str) -> str:
+    """知識エントリファイルに対応するサイドカー（件数・最後のエントリ）のパスを返す。"""
+    return path + '.meta.json'
+
+def _file_stamp(path: str) -> list | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def _write_knowledge_meta(path: str, count: int, last_entry: dict | None):
+    atomic_write_json(
+        knowledge_meta_path(path),
+        {"count": count, "last_entry": last_entry, "stamp": _file_stamp(path)},
+        indent=None,
+    )
+
+def read_knowledge_meta(path: str) -> dict:
+    """
+    知識エントリファイルの件数と最後のエントリを {"count", "last_entry"} で返す。
+    サイドカーが無い・本体と一致しない（他のツールで書き換えられた）場合は、1件ずつ読んで作り直す。
+    """
+    stamp = _file_stamp(path)
+    if stamp is None:
+        return {"count": 0, "last_entry": None}
+    try:
+        meta = read_json(knowledge_meta_path(path))
+    except ValueError:
+        meta = None
+    if meta and meta.get("stamp") == stamp:
+        return {"count": meta["count"], "last_entry": meta["last_entry"]}
+    with file_lock(path):
+        count, last_entry = 0, None
+        for last_entry in iter_knowledge_entries(path):
+            count += 1
+        _write_knowledge_meta(path, count, last_entry)
+    return {"count": count, "last_entry": last_entry}
+
+def count_knowledge_entries(path: str) -> int:
+    """知識エントリの件数（サイドカーから読むため、本体は解析しない）。"""
+    return read_knowledge_meta(path)["count"]
+
+def last_knowledge_entry(path: str) -> dict | None:
+    """最後の知識エントリ（サイドカーから読むため、本体は解析しない）。"""
+    return read_knowledge_meta(path)["last_entry"]
+
+def update_knowledge_entries(path: str, mutate) -> list:
+    """
+    ロックを保持したまま知識エントリのリストを mutate(entries) で変更して書き戻し、サイドカーも更新する。
+    mutate がリストを返した場合はそれを新しいエントリとして保存する。
+    戻り値: 保存したエントリのリスト
+    """
+    with file_lock(path):
+        data = read_json(path, {"knowledge_entries": []})
+        entries = data.setdefault("knowledge_entries", [])
+        result = mutate(entries)
+        if result is not None:
+            entries = data["knowledge_entries"] = result
+        atomic_write_json(path, data)
+        _write_knowledge_meta(path, len(entries), entries[-1] if entries else None)
+    return entries
+
+def append_knowledge_entry(path: str, entry: dict) -> int:
+    """{"knowledge_entries": [...]} 形式のファイルにエントリを追記する。戻り値: 追記後の件数"""
+    return len(update_knowledge_entries(path, lambda entries: entries.append(entry)))
@@ -0,0 +1,114 @@
+# src/thread_builder.py
+import os
+import re
+import sys
+import unicodedata
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+
+# ツイートと調査レポート（research_summary）を、X の文字数制限に収まる返信の連鎖（スレッド）に分割する。
+# 文字数は X と同じ重み付きで数える（twitter-text v3: ラテン文字などは1、日本語・絵文字などは2、URL は23。上限280）。
+# 絵文字の結合シーケンスは構成する文字ごとに数えるため、X より多めに数える（上限を超えない側に倒す）。
+# 文は「。」「！」「？」や改行で区切り、文の途中では切らない（1文が長すぎる場合だけ「、」や文字単位で切る）。
+
+MAX_WEIGHTED_LENGTH = 280
+URL_WEIGHTED_LENGTH = 23
+# 重み1で数える文字コードの範囲（それ以外は重み2）
+_LIGHT_RANGES = [(0, 4351), (8192, 8205), (8208, 8223), (8242, 8247)]
+_URL_PATTERN = re.compile(r'https?://\S+')
+_SENTENCE_PATTERN = re.compile(r'[^。！？!?\n]+[。！？!?」』）)]*|[。！？!?]+')
+# スレッドに含める調査レポートの項目と見出し
+SECTIONS = [("overview", "概要"), ("details", "詳細"), ("trends", "動向")]
+NUMBER_SUFFIX = " ({index}/{total})"
+
+
+def _char_weight(char: str) -> int:
+    code = ord(char)
+    return 1 if any(low <= code <= high for low, high in _LIGHT_RANGES) else 2
+
+def weighted_length(text: str) -> int:
+    """X の重み付き文字数を返す（280以下なら1ツイートに収まる）。"""
+    text = unicodedata.normalize("NFC", text)
+    length = 0
+    position = 0
+    for match in _URL_PATTERN.finditer(text):
+        length += sum(_char_weight(c) for c in text[position:match.start()]) + URL_WEIGHTED_LENGTH
+        position = match.end()
+    return length + sum(_char_weight(c) for c in text[position:])
+
+def fits(text: str, limit: int = MAX_WEIGHTED_LENGTH) -> bool:
+    return weighted_length(text) <= limit
+
+def _join(left: str, right: str) -> str:
+    """文をつなぐ。英数字の文どうしの間にだけ空白を入れる。"""
+    if left and right and left[-1].isascii() and left[-1] not in "\n" and right[0].isascii():
+        return f"{left} {right}"
+    return left + right
+
+def _hard_split(sentence: str, limit: int) -> list:
+    """1文が limit を超える場合、「、」の位置で、それでも長ければ文字単位で切る。"""
+    pieces = []
+    current = ""
+    for clause in re.findall(r'[^、,]+[、,]?|[、,]', sentence):
+        if fits(current + clause, limit):
+            current += clause
+            continue
+        if current:
+            pieces.append(current)
+        current = ""
+        for char in clause:
+            if not fits(current + char, limit):
+                pieces.append(current)
+                current = ""
+            current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_text(text: str, limit: int = MAX_WEIGHTED_LENGTH) -> list:
+    """テキストを、文の境界でできるだけ詰めて limit 以下の断片に分ける。"""
+    posts = []
+    current = ""
+    for sentence in (s.strip() for s in _SENTENCE_PATTERN.findall(text)):
+        if not sentence:
+            continue
+        candidate = _join(current, sentence)
+        if fits(candidate, limit):
+            current = candidate
+            continue
+        if current:
+            posts.append(current)
+        if fits(sentence, limit):
+            current = sentence
+        else:
+            *head, current = _hard_split(sentence, limit)
+            posts.extend(head)
+    if current:
+        posts.append(current)
+    return posts
+
+def build_thread(tweet: str, research_summary: dict | None = None, max_posts: int | None = None,
+                 limit: int = MAX_WEIGHTED_LENGTH) -> list:
+    """
+    ツイートと調査レポートから、スレッドの投稿（先頭がツイート、以降が返信）を作る。
+    調査レポートの各項目は新しい投稿から始め、2件以上になる場合は末尾に「(1/3)」のような番号を付ける。
+    max_posts（既定: THREAD_MAX_POSTS）を超える分は含めない。
+    """
+    max_posts = max_posts or config.THREAD_MAX_POSTS
+    sections = [tweet.strip()]
+    if isinstance(research_summary, dict):
+        for key, label in SECTIONS:
+            value = str(research_summary.get(key) or "").strip()
+            if value:
+                sections.append(f"【{label}】{value}")
+    if len(sections) == 1 and fits(sections[0], limit):
+        return sections
+    body_limit = limit - weighted_length(NUMBER_SUFFIX.format(index=max_posts, total=max_posts))
+    posts = []
+    for section in sections:
+        posts.extend(split_text(section, body_limit))
+    posts = posts[:max_posts]
+    if len(posts) == 1:
+        return posts
+    return [post + NUMBER_SUFFIX.format(index=i, total=len(posts)) for i, post in enumerate(posts, 1)]
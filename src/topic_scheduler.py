@@ -0,0 +1,136 @@
+# src/topic_scheduler.py
+import os
+import sys
+import math
+import time
+import random
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import config
+from src import state_store, tracing
+
+# 通常・バッチサイクルで調査するトピック（活動クラスター）を選ぶスケジューラー。
+# クラスターごとの選択回数・最終選択時刻・反応（エンゲージメント）の合計を cluster_id をキーにした
+# 小さな状態ファイルに保存するため、知識ログを読み返さずに選べる（クラスター数に比例するだけ）。
+# 方式は TOPIC_SCHEDULER で切り替える。
+# - lru: 最も長く選ばれていないクラスター（未選択を優先）
+# - weighted_round_robin: クラスターの "weight"（無ければ1）に比例して順番に選ぶ（平滑化重み付きラウンドロビン）
+# - bandit: 反応の平均が高いクラスターを優先しつつ、試行の少ないものも探索する（UCB1）
+# - random: 従来どおり無作為に選ぶ
+
+STATE_VERSION = 1
+UCB_EXPLORATION = math.sqrt(2)
+# 反応の重み（拡散につながるリポスト・引用を重く見る）
+ENGAGEMENT_WEIGHTS = {"like_count": 1.0, "retweet_count": 2.0, "quote_count": 2.0, "reply_count": 1.0}
+
+
+def _stats(state: dict, cluster: dict) -> dict:
+    """クラスターの統計（無ければ作る）。JSON のキーは文字列なので cluster_id を文字列にする。"""
+    return state["clusters"].setdefault(
+        str(cluster.get("cluster_id")),
+        {"count": 0, "last_selected": None, "credit": 0.0, "reward_sum": 0.0, "reward_count": 0},
+    )
+
+def _select_random(clusters: list, state: dict) -> dict:
+    return random.choice(clusters)
+
+def _select_lru(clusters: list, state: dict) -> dict:
+    def _key(cluster):
+        stats = _stats(state, cluster)
+        return (stats["last_selected"] is not None, stats["last_selected"] or 0, stats["count"])
+    return min(clusters, key=_key)
+
+def _select_weighted_round_robin(clusters: list, state: dict) -> dict:
+    # 毎回すべてのクラスターに重みを加算し、最大のものを選んで重みの合計を差し引く（nginx と同じ方式）
+    total = 0.0
+    best, best_stats = None, None
+    for cluster in clusters:
+        weight = float(cluster.get("weight", 1) or 0)
+        stats = _stats(state, cluster)
+        stats["credit"] += weight
+        total += weight
+        if best_stats is None or stats["credit"] > best_stats["credit"]:
+            best, best_stats = cluster, stats
+    best_stats["credit"] -= total
+    return best
+
+def _select_bandit(clusters: list, state: dict) -> dict:
+    total = sum(_stats(state, cluster)["count"] for cluster in clusters)
+
+    def _score(cluster):
+        stats = _stats(state, cluster)
+        if stats["count"] == 0:
+            return math.inf
+        mean = stats["reward_sum"] / stats["reward_count"] if stats["reward_count"] else 0.0
+        return mean + UCB_EXPLORATION * math.sqrt(math.log(max(total, 1)) / stats["count"])
+    return max(clusters, key=_score)
+
+STRATEGIES = {
+    "random": _select_random,
+    "lru": _select_lru,
+    "weighted_round_robin": _select_weighted_round_robin,
+    "bandit": _select_bandit,
+}
+
+def register_strategy(name: str, select):
+    """選択方式を追加する。select(clusters, state) はクラスターを1つ返すこと（state はクラスター統計を含む）。"""
+    STRATEGIES[name] = select
+
+def _get_strategy(name: str | None):
+    name = name or config.TOPIC_SCHEDULER
+    if name not in STRATEGIES:
+        raise ValueError(f"未対応のトピック選択方式です: {name}（対応: {', '.join(STRATEGIES)}）")
+    return STRATEGIES[name]
+
+def _empty_state() -> dict:
+    return {"version": STATE_VERSION, "clusters": {}}
+
+def select_topics(state_path: str, clusters: list, count: int = 1, strategy: str | None = None) -> list:
+    """
+    クラスターから count 件のトピックを選び、選択を状態ファイルに記録する。
+    1件ずつ選んで記録するため、クラスター数を超える分は一巡してから重複する（lru の場合）。
+    """
+    if not clusters:
+        raise ValueError("選択できるクラスターがありません。")
+    select = _get_strategy(strategy)
+    selected = []
+
+    def _select(state):
+        if state.get("version") != STATE_VERSION:
+            state = _empty_state()
+        now = time.time()
+        for _ in range(count):
+            cluster = select(clusters, state)
+            stats = _stats(state, cluster)
+            stats["count"] += 1
+            # 同じ実行内で選んだものも順序がつくよう、わずかにずらして記録する
+            stats["last_selected"] = now + len(selected) * 1e-6
+            selected.append(cluster)
+        return state
+
+    with tracing.span("topic_scheduler.select", strategy=strategy or config.TOPIC_SCHEDULER, clusters=len(clusters), count=count):
+        state_store.update_json(state_path, _empty_state(), _select, indent=None)
+    return selected
+
+def select_topic(state_path: str, clusters: list, strategy: str | None = None) -> dict:
+    """クラスターからトピックを1件選ぶ。"""
+    return select_topics(state_path, clusters, 1, strategy)[0]
+
+def record_reward(state_path: str, cluster_id, reward: float):
+    """
+    投稿への反応（いいね・リポスト数などから作った値）をクラスターに記録する。bandit 方式で使う。
+    """
+    def _record(state):
+        if state.get("version") != STATE_VERSION:
+            state = _empty_state()
+        stats = _stats(state, {"cluster_id": cluster_id})
+        stats["reward_sum"] += float(reward)
+        stats["reward_count"] += 1
+        return state
+
+    state_store.update_json(state_path, _empty_state(), _record, indent=None)
+
+def engagement_reward(public_metrics: dict) -> float:
+    """ツイートの public_metrics を報酬にする（重み付きの合計の対数。数件の大当たりに引きずられないようにする）。"""
+    score = sum(weight * float(public_metrics.get(key) or 0) for key, weight in ENGAGEMENT_WEIGHTS.items())
+    return math.log1p(score)
@@ -0,0 +1,189 @@
+# src/tracing.py
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# 各処理段階（フェーズ1/2・クラスタリング・概念化・X投稿・JSON保存）の計測を行う軽量トレース。
+# with span("research.phase1"): のように囲むと、所要時間・Geminiのトークン数・読み書きバイト数・リトライ回数を記録し、
+# 終了した段階ごとに JSON Lines のメトリクスファイルへ1行追記する。実行の最後に print_summary() で集計表を表示する。
+# 計測中の段階は contextvars で追跡するので、並行するスレッドや asyncio のタスクの間で混ざらない。
+# contextvars はスレッドプールの作業スレッドや共有イベントループには自動では引き継がれないため、
+# プールに渡す関数は bind() で包み、gemini_client.run_sync() は呼び出し元のコンテキストでコルーチンを実行する。
+# プロセスプール（knowledge_loader の解析）の中は計測しない。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RUN_ID = uuid.uuid4().hex[:12]   # 同じ実行の記録をまとめるためのID
+
+_current = contextvars.ContextVar("tracing_current_span", default=None)
+_lock = threading.Lock()
+_finished = []
+
+
+class Span:
+    """1つの処理段階の計測結果。"""
+
+    def __init__(self, name: str, attrs: dict, parent=None):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.parent = parent.name if parent else None
+        self.started_at = datetime.now().isoformat()
+        self.duration = 0.0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.cached_tokens = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.retries = 0
+        self.status = "ok"
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": RUN_ID,
+            "name": self.name,
+            "parent": self.parent,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 2),
+            "status": self.status,
+            "error": self.error,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "cached_tokens": self.cached_tokens,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "retries": self.retries,
+            "attrs": self.attrs,
+        }
+
+
+def metrics_path() -> str:
+    """メトリクスファイルの絶対パスを返す。"""
+    import config
+    return os.path.join(PROJECT_ROOT, config.TRACE_METRICS_FILE)
+
+def _write_record(record: dict):
+    import config
+    if not config.TRACE_ENABLED:
+        return
+    path = metrics_path()
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+    except OSError as e:
+        # 計測の失敗で本処理を止めない
+        print(f"警告: メトリクスを書き込めませんでした: {e}")
+
+@contextmanager
+def span(name: str, **attrs):
+    """処理段階を計測するコンテキストマネージャ。例外は記録したうえでそのまま送出する。"""
+    current = Span(name, attrs, _current.get())
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current.reset(token)
+        with _lock:
+            _finished.append(current)
+        _write_record(current.to_dict())
+
+def current_span() -> Span | None:
+    return _current.get()
+
+def bind(fn):
+    """
+    呼び出し元のコンテキスト（計測中の段階）を引き継いで fn を実行する関数を返す。
+    スレッドプールに渡す関数に使う。呼び出しごとにコンテキストを複製するので、並列に呼んでも構わない。
+    """
+    context = contextvars.copy_context()
+    def _run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return _run
+
+def set_attrs(**attrs):
+    """計測中の段階に属性（テーマ名・キャッシュヒットなど）を追加する。"""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+def record_usage(response):
+    """Gemini応答の usage_metadata からトークン数を計測中の段階に加算する。"""
+    current = _current.get()
+    usage = getattr(response, "usage_metadata", None)
+    if current is None or usage is None:
+        return
+    current.prompt_tokens += getattr(usage, "prompt_token_count", None) or 0
+    current.response_tokens += getattr(usage, "candidates_token_count", None) or 0
+    current.cached_tokens += getattr(usage, "cached_content_token_count", None) or 0
+
+def record_bytes_read(count: int):
+    current = _current.get()
+    if current is not None:
+        current.bytes_read += count
+
+def record_bytes_written(count: int):
+    current = _current.get()
+    if current is not None:
+        current.bytes_written += count
+
+def record_retry(count: int = 1):
+    current = _current.get()
+    if current is not None:
+        current.retries += count
+
+def get_spans() -> list:
+    with _lock:
+        return list(_finished)
+
+def reset():
+    with _lock:
+        _finished.clear()
+
+def summarize() -> dict:
+    """今回の実行で終了した段階を名前ごとに集計する。"""
+    summary = {}
+    for s in get_spans():
+        item = summary.setdefault(s.name, {
+            "count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+            "prompt_tokens": 0, "response_tokens": 0, "bytes_read": 0, "bytes_written": 0, "retries": 0,
+        })
+        item["count"] += 1
+        item["errors"] += s.status != "ok"
+        item["total_seconds"] += s.duration
+        item["max_seconds"] = max(item["max_seconds"], s.duration)
+        item["prompt_tokens"] += s.prompt_tokens
+        item["response_tokens"] += s.response_tokens
+        item["bytes_read"] += s.bytes_read
+        item["bytes_written"] += s.bytes_written
+        item["retries"] += s.retries
+    return summary
+
+def print_summary():
+    """段階ごとの集計表を表示する。"""
+    summary = summarize()
+    if not summary:
+        return
+    print(f"\n--- 処理段階ごとの計測結果 (run {RUN_ID}) ---")
+    print(f"{'段階':<32}{'回数':>5}{'合計秒':>9}{'最大秒':>9}{'入力tok':>9}{'出力tok':>9}{'読込B':>10}{'書込B':>10}{'再試行':>6}")
+    for name, item in sorted(summary.items(), key=lambda kv: -kv[1]["total_seconds"]):
+        errors = f" (失敗{item['errors']})" if item["errors"] else ""
+        print(
+            f"{name + errors:<32}{item['count']:>5}{item['total_seconds']:>9.2f}{item['max_seconds']:>9.2f}"
+            f"{item['prompt_tokens']:>9}{item['response_tokens']:>9}"
+            f"{item['bytes_read']:>10}{item['bytes_written']:>10}{item['retries']:>6}"
+        )
+    import config
+    if config.TRACE_ENABLED:
+        print(f"計測結果の詳細は {metrics_path()} に追記しました。")
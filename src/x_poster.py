@@ -1,18 +1,102 @@
 # src/x_poster.py
-import json
-import requests
-from requests_oauthlib import OAuth1
 import sys
 import os
+import time
+import threading
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import config
+from src import tracing, knowledge_log, knowledge_index
 
 api_key = config.X_API_KEY
 api_secret = config.X_API_SECRET
 access_token = config.X_ACCESS_TOKEN
 access_token_secret = config.X_ACCESS_TOKEN_SECRET
 
+# X への投稿はプロセス内で1つの requests.Session（接続プール）と OAuth1 署名器を共有する。
+# 2件目以降の投稿は keep-alive の接続を再利用するため、TCP/TLS ハンドシェイクは最初の1回だけで済む。
+# requests / requests_oauthlib の読み込みは、最初に投稿する時まで遅延する。
+_session = None
+_signer = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "sessions_created": 0,
+    "connections_opened": 0,
+    "requests": 0,
+}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+def _build_session():
+    """接続数の上限を設定し、新規TCP接続を数える requests.Session を作成する。"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _CountingHTTPConnectionPool(HTTPConnectionPool):
+        def _new_conn(self):
+            _count("connections_opened")
+            return super()._new_conn()
+
+    class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            _count("connections_opened")
+            return super()._new_conn()
+
+    class _CountingAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _CountingHTTPConnectionPool,
+                "https": _CountingHTTPSConnectionPool,
+            }
+
+    session = requests.Session()
+    adapter = _CountingAdapter(pool_connections=1, pool_maxsize=config.X_MAX_CONNECTIONS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    _count("sessions_created")
+    return session
+
+def get_session():
+    """プロセス内で共有する requests.Session を返す（初回呼び出し時に作成）。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+def get_signer():
+    """OAuth1.0a の署名器を返す（鍵は変わらないため、初回に作ったものを使い回す）。"""
+    global _signer
+    with _session_lock:
+        if _signer is None:
+            from requests_oauthlib import OAuth1
+            _signer = OAuth1(api_key, api_secret, access_token, access_token_secret)
+        return _signer
+
+def reset_session():
+    """共有セッションと署名器を破棄する。次回の投稿で作り直される。"""
+    global _session, _signer
+    with _session_lock:
+        session, _session, _signer = _session, None, None
+    if session is not None:
+        session.close()
+
+def get_stats() -> dict:
+    """今回の実行で作成したセッション数・TCP接続数・投稿リクエスト数を返す。"""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
 def trim_to_140_chars(text: str) -> str:
     """テキストをXの投稿制限（ここでは全角140字）に合わせて調整する。"""
     if len(text) <= 140:
@@ -22,37 +106,139 @@ def trim_to_140_chars(text: str) -> str:
         return text[:last_period + 1]
     return text[:140]
 
-def post_to_x(text: str, bearer_token=None):
+def parse_rate_limit(headers) -> dict | None:
+    """X API のレート制限ヘッダー（x-rate-limit-limit / remaining / reset）を辞書にする。"""
+    try:
+        return {
+            "limit": int(headers["x-rate-limit-limit"]) if "x-rate-limit-limit" in headers else None,
+            "remaining": int(headers["x-rate-limit-remaining"]),
+            "reset": int(headers["x-rate-limit-reset"]),
+        }
+    except (KeyError, ValueError):
+        return None
+
+def _result(status: str, status_code: int | None = None, retryable: bool = False, **fields) -> dict:
+    return {
+        "ok": status == "posted",
+        "status": status,
+        "status_code": status_code,
+        "retryable": retryable,
+        "tweet_id": fields.get("tweet_id"),
+        "rate_limit": fields.get("rate_limit"),
+        "retry_at": fields.get("retry_at"),
+        "error": fields.get("error"),
+    }
+
+def post_to_x(text: str, bearer_token=None, in_reply_to_tweet_id: str | None = None) -> dict:
     """
     指定されたテキストをXに投稿する。
     - bearer_token: OAuth2ユーザー認証で取得したアクセストークン（推奨）
     - OAuth1.0a認証もサポート（ただしAPI権限が必要）
+    - in_reply_to_tweet_id: 指定した場合、そのツイートへの返信として投稿する（スレッドの2件目以降）
+    戻り値: 結果の辞書
+      status: "posted"（成功） / "rate_limited"（429） / "rejected"（403: 重複や権限不足） / "error"（その他）
+      retryable: 時間をおいて再送すれば成功しうるか（429・5xx・通信エラー）
+      retry_at: 再送してよい時刻（UNIX秒。レート制限の reset や Retry-After から）
+      tweet_id / status_code / rate_limit（x-rate-limit-* ヘッダーの値） / error
+    共有の接続プールを使い、接続は X_CONNECT_TIMEOUT_SECONDS、応答は X_POST_TIMEOUT_SECONDS で打ち切る。
     """
-    url = "https://api.twitter.com/2/tweets"
+    import requests
+    session = get_session()
+    url = f"{config.X_API_BASE_URL}/2/tweets"
     payload = {"text": text}
+    if in_reply_to_tweet_id:
+        payload["reply"] = {"in_reply_to_tweet_id": str(in_reply_to_tweet_id)}
     headers = {"Content-Type": "application/json"}
     if bearer_token:
         headers["Authorization"] = f"Bearer {bearer_token}"
         auth = None
     else:
         # OAuth1.0a認証（API権限が必要）
-        auth = OAuth1(api_key, api_secret, access_token, access_token_secret)
-    try:
-        response = requests.post(url, headers=headers, json=payload, auth=auth)
+        auth = get_signer()
+    with tracing.span("x.post", chars=len(text)):
+        try:
+            _count("requests")
+            response = session.post(
+                url, headers=headers, json=payload, auth=auth,
+                timeout=(config.X_CONNECT_TIMEOUT_SECONDS, config.X_POST_TIMEOUT_SECONDS),
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"エラー: Xへの投稿中に予期せぬエラーが発生しました: {e}")
+            tracing.set_attrs(error=type(e).__name__)
+            return _result("error", retryable=True, error=str(e))
+        tracing.record_bytes_written(len(response.request.body or b""))
+        tracing.record_bytes_read(len(response.content))
+        tracing.set_attrs(status_code=response.status_code)
+        rate_limit = parse_rate_limit(response.headers)
         if response.status_code == 429:
-            print("警告: X (Twitter) APIのレート制限に達しました。今回の投稿はスキップします。")
-            return
+            retry_after = response.headers.get("retry-after", "")
+            retry_at = time.time() + int(retry_after) if retry_after.isdigit() else (rate_limit or {}).get("reset")
+            print("警告: X (Twitter) APIのレート制限に達しました。投稿は制限の解除後に再送します。")
+            return _result("rate_limited", 429, True, rate_limit=rate_limit, retry_at=retry_at, error=response.text)
         if response.status_code == 403:
             print(f"警告: 投稿が拒否されました (403 Forbidden): {response.text}")
             print("ツイート内容が直近のものと重複している可能性があります。あるいはAPI権限不足です。")
-            return
+            return _result("rejected", 403, rate_limit=rate_limit, error=response.text)
         if response.status_code not in (200, 201):
-            raise Exception(f"Xへの投稿に失敗しました: {response.status_code} {response.text}")
+            print(f"エラー: Xへの投稿に失敗しました: {response.status_code} {response.text}")
+            retryable = response.status_code in (408, 500, 502, 503, 504)
+            return _result("error", response.status_code, retryable, rate_limit=rate_limit, error=response.text)
         print(f"✅ Xに投稿しました: {text}")
-        print(response.json())
-    except requests.exceptions.RequestException as e:
-        print(f"エラー: Xへの投稿中に予期せぬエラーが発生しました: {e}")
-        # raise e  # 必要に応じて再スロー
+        data = response.json()
+        print(data)
+        return _result("posted", response.status_code, tweet_id=(data.get("data") or {}).get("id"), rate_limit=rate_limit)
+
+def post_many(texts: list, bearer_token=None) -> list:
+    """
+    複数のツイートを順に投稿する（同じ接続を使い回す）。
+    レート制限（429）に達した場合、残りは送らずに同じ結果（rate_limited）を返す。
+    戻り値: texts と同じ順の結果の辞書のリスト（post_to_x と同じ形式）
+    """
+    results = []
+    with tracing.span("x.post_many", count=len(texts)):
+        for text in texts:
+            if results and results[-1]["status"] == "rate_limited":
+                results.append(dict(results[-1]))
+                continue
+            results.append(post_to_x(text, bearer_token))
+    return results
+
+def fetch_public_metrics(tweet_ids: list, bearer_token=None) -> dict:
+    """
+    ツイートの反応（public_metrics: like_count / retweet_count / reply_count / quote_count など）を取得する。
+    100件ずつ GET /2/tweets で問い合わせ、共有の接続プールを使う。
+    戻り値: {ツイートID: public_metrics}（削除されたツイートや取得に失敗した分は含まない）
+    """
+    import requests
+    session = get_session()
+    url = f"{config.X_API_BASE_URL}/2/tweets"
+    headers = {"Authorization": f"Bearer {bearer_token}"} if bearer_token else {}
+    auth = None if bearer_token else get_signer()
+    metrics = {}
+    ids = [str(tweet_id) for tweet_id in tweet_ids if tweet_id]
+    for start in range(0, len(ids), 100):
+        chunk = ids[start:start + 100]
+        with tracing.span("x.metrics", count=len(chunk)):
+            try:
+                _count("requests")
+                response = session.get(
+                    url, headers=headers, auth=auth,
+                    params={"ids": ",".join(chunk), "tweet.fields": "public_metrics"},
+                    timeout=(config.X_CONNECT_TIMEOUT_SECONDS, config.X_POST_TIMEOUT_SECONDS),
+                )
+            except requests.exceptions.RequestException as e:
+                print(f"警告: ツイートの反応を取得できませんでした: {e}")
+                return metrics
+            tracing.record_bytes_read(len(response.content))
+            tracing.set_attrs(status_code=response.status_code)
+            if response.status_code != 200:
+                print(f"警告: ツイートの反応を取得できませんでした: {response.status_code} {response.text[:200]}")
+                return metrics
+            for tweet in response.json().get("data") or []:
+                if "public_metrics" in tweet:
+                    metrics[str(tweet["id"])] = tweet["public_metrics"]
+    return metrics
+
 def run_tests():
     """投稿モジュールの機能をテストする。"""
     print("--- `trim_to_140_chars` 関数のテスト ---")
@@ -77,27 +263,20 @@ def run_tests():
 
 def get_latest_tweet(json_path: str) -> str:
     """
-    指定されたJSONファイルから、最新のツイート文を取得する。
+    指定された知識ログから、最新のツイート文を取得する。
+    SQLite の索引（knowledge_index）を使うため、ログ全体は読み込まない（更新分だけ索引に取り込む）。
     """
-    if not os.path.exists(json_path):
+    if not os.path.exists(json_path) and not os.path.exists(knowledge_log.jsonl_path_for(json_path)):
         raise FileNotFoundError(f"知識ベースファイルが見つかりません: {json_path}")
 
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    # データが存在し、'knowledge_entries'リストが空でないことを確認
-    if "knowledge_entries" not in data or not data["knowledge_entries"]:
+    index = knowledge_index.open_index(json_path)
+    if index.count() == 0:
         raise ValueError("知識ベースに投稿可能なエントリがありません。")
 
-    # リストの最後の要素（最新のエントリ）を取得
-    latest_entry = data["knowledge_entries"][-1]
-
-    # 'generated_tweet'キーからツイート文を取得（キーが存在しない場合は空文字）
-    tweet_text = latest_entry.get("generated_tweet", "")
-    
+    tweet_text = index.latest_tweet()
     if not tweet_text:
         raise ValueError("最新のエントリにツイート文が見つかりませんでした。")
-        
+
     return tweet_text
 
 if __name__ == "__main__":
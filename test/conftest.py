@@ -0,0 +1,6 @@
+# test/conftest.py
+import os
+
+# テストで実行した処理段階の計測結果を、リポジトリの logs/metrics.jsonl に追記しない
+# （段階ごとの集計はメモリ上に残るので、tracing.summarize() はそのまま使える）
+os.environ.setdefault("TRACE_ENABLED", "0")
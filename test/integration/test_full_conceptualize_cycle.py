@@ -7,6 +7,8 @@ import sys
 # パス設定
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.append(project_root)
+# 計測結果をリポジトリの logs/metrics.jsonl に追記しない
+os.environ.setdefault("TRACE_ENABLED", "0")
 
 from src import main as bot_main # main.pyをbot_mainとしてインポート
 
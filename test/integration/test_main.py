@@ -8,6 +8,8 @@ from unittest.mock import patch
 # パス設定
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.append(project_root)
+# 計測結果をリポジトリの logs/metrics.jsonl に追記しない
+os.environ.setdefault("TRACE_ENABLED", "0")
 from src import main as bot_main
 
 class TestMainLifecycle(unittest.TestCase):
@@ -27,7 +29,7 @@ class TestMainLifecycle(unittest.TestCase):
         # for f in [bot_main.KNOWLEDGE_ENTRIES_PATH, bot_main.SUMMARY_MD_PATH, bot_main.HIGH_LEVEL_CONCEPTS_PATH, bot_main.ACTIVITY_CLUSTERS_PATH]:
         #     if os.path.exists(f): os.remove(f)
 
-    @patch('src.x_poster.post_to_x')
+    @patch('src.x_poster.post_to_x', return_value={"ok": True, "status": "posted", "retryable": False})
     @patch('time.sleep') # time.sleepも無効化してテストを高速化
     def test_full_bot_lifecycle(self, mock_sleep, mock_post_to_x):
         """通常サイクル→概念化サイクルという一連のライフサイクルをテスト"""
@@ -7,6 +7,8 @@ import sys
 # パス設定
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.append(project_root)
+# 計測結果をリポジトリの logs/metrics.jsonl に追記しない
+os.environ.setdefault("TRACE_ENABLED", "0")
 
 # テスト対象のモジュールをインポート
 from src import main as bot_main
@@ -31,6 +33,8 @@ class TestNormalCycle(unittest.TestCase):
         # ★★★ 出力ファイル ★★★
         # 通常サイクルの結果（知識記録）の保存先
         bot_main.KNOWLEDGE_ENTRIES_PATH = os.path.join(self.test_output_dir, 'test_knowledge_entries.json')
+        # 投稿キュー
+        bot_main.POST_QUEUE_PATH = os.path.join(self.test_output_dir, 'test_post_queue.json')
 
         # --- テストの前提条件をチェック ---
         # 入力ファイルが存在しないとテストが始まらないので、ここで確認
@@ -46,7 +50,7 @@ class TestNormalCycle(unittest.TestCase):
 
 
     # X投稿をモック化（無効化）してテストを実行
-    @patch('src.x_poster.post_to_x')
+    @patch('src.x_poster.post_to_x', return_value={"ok": True, "status": "posted", "retryable": False})
     def test_run_normal_cycle_successfully(self, mock_post_to_x):
         """
         【統合テスト】通常サイクルが、ツイート生成→知識記録→投稿関数呼び出し、を正しく行うか
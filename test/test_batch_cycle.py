@@ -0,0 +1,126 @@
+# test/test_batch_cycle.py
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src import main as bot_main
+
+def _fake_phase1(topic):
+    return {"overview": topic["theme"], "details": "", "trends": ""}
+
+POSTED = {"ok": True, "status": "posted", "retryable": False}
+
+TWEETS = {
+    "テーマ1": "朝の散歩で見つけた小さな花に、季節の移ろいを感じました。",
+    "テーマ2": "新しいプログラミング言語を学ぶと、考え方そのものが広がりますね！",
+    "テーマ3": "読書会で意見が割れた時こそ、互いの前提を確かめる好機だと思います。",
+}
+
+def _fake_phase2(research_summary, topic=None, avoid_tweets=None):
+    # 同じテーマが2回選ばれた場合は、書き直し（avoid_tweets あり）で別の文を返す
+    suffix = f" 今日は{len(avoid_tweets)}回目の見直しで、別の角度から考えてみました。" if avoid_tweets else ""
+    return {"tweet": TWEETS[research_summary['overview']] + suffix, "thought_process": {}}
+
+class TestBatchCycle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.original = {
+            name: getattr(bot_main, name)
+            for name in ["ACTIVITY_CLUSTERS_PATH", "RECENT_KNOWLEDGE_PATH", "ALL_KNOWLEDGE_LOG_PATH", "TOPIC_SCHEDULE_PATH",
+                         "POST_QUEUE_PATH", "CONCEPT_GENERATION_THRESHOLD"]
+        }
+        bot_main.ACTIVITY_CLUSTERS_PATH = os.path.join(self.tmp_dir.name, 'activity_clusters.json')
+        bot_main.RECENT_KNOWLEDGE_PATH = os.path.join(self.tmp_dir.name, 'recent_knowledge.json')
+        bot_main.ALL_KNOWLEDGE_LOG_PATH = os.path.join(self.tmp_dir.name, 'all_knowledge_log.json')
+        bot_main.TOPIC_SCHEDULE_PATH = os.path.join(self.tmp_dir.name, 'topic_schedule.json')
+        bot_main.POST_QUEUE_PATH = os.path.join(self.tmp_dir.name, 'post_queue.json')
+        self.original_index_path = bot_main.duplicate_index.INDEX_PATH
+        bot_main.duplicate_index.INDEX_PATH = os.path.join(self.tmp_dir.name, 'duplicate_index.json')
+        clusters = [{"cluster_id": i, "theme": f"テーマ{i}", "summary": "", "keywords": []} for i in range(1, 4)]
+        with open(bot_main.ACTIVITY_CLUSTERS_PATH, 'w', encoding='utf-8') as f:
+            json.dump({"clusters": clusters}, f, ensure_ascii=False)
+
+    def tearDown(self):
+        for name, value in self.original.items():
+            setattr(bot_main, name, value)
+        bot_main.duplicate_index.INDEX_PATH = self.original_index_path
+        self.tmp_dir.cleanup()
+
+    @patch('src.x_poster.post_to_x', return_value=POSTED)
+    @patch('src.research_topic.generate_character_post', side_effect=_fake_phase2)
+    @patch('src.research_topic.research_topic_phase1', side_effect=_fake_phase1)
+    def test_batch_generates_and_posts_all(self, mock_phase1, mock_phase2, mock_post):
+        bot_main.CONCEPT_GENERATION_THRESHOLD = 100
+        bot_main.run_batch_cycle(5)
+        self.assertEqual(mock_phase1.call_count, 5)
+        self.assertEqual(mock_post.call_count, 5)
+        self.assertEqual(bot_main.get_current_post_count(), 5)
+        self.assertEqual(bot_main.post_queue.get_stats(bot_main.POST_QUEUE_PATH)["depth"], 0)
+        # 3クラスタから5件選ぶ場合、全クラスタが一度は選ばれる
+        themes = {call.args[0]["theme"] for call in mock_phase1.call_args_list}
+        self.assertEqual(themes, {"テーマ1", "テーマ2", "テーマ3"})
+        # フェーズ2にもトピックを渡す（ペルソナの抜粋の検索に使う）
+        self.assertEqual({call.kwargs["topic"]["theme"] for call in mock_phase2.call_args_list}, themes)
+
+    @patch('src.main.run_conceptualize_cycle')
+    @patch('src.x_poster.post_to_x', return_value=POSTED)
+    @patch('src.research_topic.generate_character_post', side_effect=_fake_phase2)
+    @patch('src.research_topic.research_topic_phase1', side_effect=_fake_phase1)
+    def test_threshold_triggers_conceptualization_mid_batch(self, mock_phase1, mock_phase2, mock_post, mock_conceptualize):
+        bot_main.CONCEPT_GENERATION_THRESHOLD = 2
+        bot_main.run_batch_cycle(5)
+        self.assertEqual(mock_conceptualize.call_count, 2)
+        self.assertEqual(bot_main.get_current_post_count(), 1)
+        self.assertEqual(mock_post.call_count, 5)
+
+    @patch('src.main.run_conceptualize_cycle', side_effect=RuntimeError("高次概念の生成に失敗"))
+    @patch('src.x_poster.post_to_x', return_value=POSTED)
+    @patch('src.research_topic.generate_character_post', side_effect=_fake_phase2)
+    @patch('src.research_topic.research_topic_phase1', side_effect=_fake_phase1)
+    def test_failed_conceptualization_does_not_stop_the_batch(self, mock_phase1, mock_phase2, mock_post, mock_conceptualize):
+        bot_main.CONCEPT_GENERATION_THRESHOLD = 2
+        bot_main.run_batch_cycle(5)
+        # 失敗した概念化はバッチ内で再試行せず、残りの投稿を続ける（短期記憶も残す）
+        self.assertEqual(mock_conceptualize.call_count, 1)
+        self.assertEqual(mock_post.call_count, 5)
+        self.assertEqual(bot_main.get_current_post_count(), 5)
+
+    @patch('src.x_poster.post_to_x', return_value=POSTED)
+    @patch('src.research_topic.generate_character_post', side_effect=_fake_phase2)
+    @patch('src.research_topic.research_topic_phase1', side_effect=[_fake_phase1({"theme": "テーマ1"}), ValueError("壊れた応答")])
+    def test_publisher_is_closed_when_batch_fails(self, mock_phase1, mock_phase2, mock_post):
+        bot_main.CONCEPT_GENERATION_THRESHOLD = 100
+        with patch.object(bot_main.config, 'BATCH_RESEARCH_WORKERS', 1), \
+             patch.object(bot_main.post_queue.Publisher, 'close', autospec=True,
+                          side_effect=bot_main.post_queue.Publisher.close) as mock_close:
+            with self.assertRaises(ValueError):
+                bot_main.run_batch_cycle(2)
+        mock_close.assert_called_once()
+
+    @patch('src.x_poster.post_to_x', return_value=POSTED)
+    @patch('src.research_topic.generate_character_post')
+    @patch('src.research_topic.research_topic_phase1', side_effect=_fake_phase1)
+    def test_batch_skips_duplicate_tweets(self, mock_phase1, mock_phase2, mock_post):
+        # 全テーマで同じツイートが生成される場合、最初の1件だけを投稿し、残りは書き直しても重複するのでスキップする
+        bot_main.CONCEPT_GENERATION_THRESHOLD = 100
+        mock_phase2.return_value = {"tweet": "自己実現とは、与えられた役割を超えて自ら問いを立てることかもしれません。", "thought_process": {}}
+        with patch.object(bot_main.config, 'DUPLICATE_CHECK_ENABLED', True), \
+             patch.object(bot_main.config, 'DUPLICATE_MAX_REGENERATIONS', 1):
+            bot_main.run_batch_cycle(3)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(bot_main.get_current_post_count(), 1)
+        # 重複した2件は1回ずつ書き直す（トピックも渡す）
+        self.assertEqual(mock_phase2.call_count, 5)
+        self.assertTrue(all(call.kwargs.get("topic") for call in mock_phase2.call_args_list))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# test/test_duplicate_index.py
+import os
+import sys
+import tempfile
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import duplicate_index, knowledge_log, gemini_client, main
+from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior, CHARACTER_JSON
+
+TWEET = "自己実現とは、与えられた役割を超えて自ら問いを立てることなのかもしれません。学び続けることが成長の証だと考えています。"
+NEAR_DUPLICATE = "自己実現とは、与えられた役割を超えて、自ら問いを立てることなのかもしれませんね！ 学び続けることが成長の証だと考えています。 https://example.com"
+DIFFERENT = "量子コンピュータの実用化には、量子ビットのエラー訂正という大きな壁が残っています。"
+
+def _entry(tweet: str) -> dict:
+    return {"theme": "テーマ", "character_post": {"tweet": tweet}}
+
+class TestDuplicateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, 'all_knowledge_log.json')
+        self.index_path = os.path.join(self.tmp_dir.name, 'duplicate_index.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_near_duplicates_are_found(self):
+        index = duplicate_index.DuplicateIndex()
+        index.add(TWEET)
+        match = index.find_duplicate(NEAR_DUPLICATE, max_distance=0.3)
+        self.assertIsNotNone(match)
+        self.assertGreater(match[0], 0.7)
+        self.assertIsNone(index.find_duplicate(DIFFERENT, max_distance=0.3))
+        self.assertEqual(index.query("", max_distance=0.3), [])
+
+    def test_index_catches_up_with_appended_entries(self):
+        knowledge_log.append_entry(self.log_path, _entry(TWEET))
+        index = duplicate_index.load_index(self.log_path, self.index_path)
+        self.assertEqual(len(index), 1)
+        first_offset = index.log_offset
+        knowledge_log.append_entry(self.log_path, _entry(DIFFERENT))
+        index = duplicate_index.load_index(self.log_path, self.index_path)
+        self.assertEqual(len(index), 2)
+        self.assertGreater(index.log_offset, first_offset)
+        self.assertIsNotNone(index.find_duplicate(DIFFERENT, max_distance=0.1))
+
+    def test_partial_last_line_is_read_later(self):
+        knowledge_log.append_entry(self.log_path, _entry(TWEET))
+        jsonl_path = knowledge_log.jsonl_path_for(self.log_path)
+        complete_size = os.path.getsize(jsonl_path)
+        with open(jsonl_path, 'a', encoding='utf-8') as f:
+            f.write('{"character_post": {"tweet": "' + DIFFERENT)
+        index = duplicate_index.load_index(self.log_path, self.index_path)
+        self.assertEqual((len(index), index.log_offset), (1, complete_size))
+        with open(jsonl_path, 'a', encoding='utf-8') as f:
+            f.write('"}}\n')
+        index = duplicate_index.load_index(self.log_path, self.index_path)
+        self.assertEqual(len(index), 2)
+
+    def test_duplicate_tweet_is_regenerated_then_skipped(self):
+        original = (config.RESPONSE_CACHE_ENABLED, config.PERSONA_CONTEXT_CACHE, config.DUPLICATE_MAX_REGENERATIONS)
+        config.RESPONSE_CACHE_ENABLED = False
+        config.PERSONA_CONTEXT_CACHE = False
+        config.DUPLICATE_MAX_REGENERATIONS = 1
+        behavior = FakeGeminiBehavior(base_latency=0, per_token_latency=0)
+        gemini_client.set_client(FakeGeminiClient(behavior))
+        try:
+            index = duplicate_index.DuplicateIndex()
+            index.add(CHARACTER_JSON["tweet"])
+            rich_content = {"research_summary": {"summary": "要約"}, "character_post": dict(CHARACTER_JSON)}
+            self.assertIsNone(main.ensure_unique_tweet(index, rich_content))
+            self.assertEqual(behavior.calls, {"research_phase2": 1})
+            unique = {"research_summary": {"summary": "要約"}, "character_post": {"tweet": DIFFERENT}}
+            self.assertIs(main.ensure_unique_tweet(index, unique), unique)
+        finally:
+            config.RESPONSE_CACHE_ENABLED, config.PERSONA_CONTEXT_CACHE, config.DUPLICATE_MAX_REGENERATIONS = original
+            gemini_client.set_client(None)
+
+if __name__ == '__main__':
+    unittest.main()
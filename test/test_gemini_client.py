@@ -0,0 +1,73 @@
+# test/test_gemini_client.py
+import os
+import sys
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import gemini_client
+
+class _StubGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestGeminiClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGeminiHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.original_base_url = config.GEMINI_BASE_URL
+        config.GEMINI_BASE_URL = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        gemini_client.reset_client()
+        gemini_client.reset_stats()
+
+    def tearDown(self):
+        gemini_client.reset_client()
+        config.GEMINI_BASE_URL = self.original_base_url
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_client_and_connection_are_reused(self):
+        """複数回の呼び出しで、クライアントとTCP接続が1つだけ使われること"""
+        for _ in range(3):
+            response = gemini_client.get_client().models.generate_content(model=config.MODEL_NAME, contents="hi")
+            self.assertEqual(response.text, "ok")
+        stats = gemini_client.get_stats()
+        self.assertEqual(stats["clients_created"], 1)
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections_opened"], 1)
+
+    def test_sync_callers_share_one_async_pool(self):
+        """run_sync 経由の非同期呼び出しも、1つの接続プールを再利用すること"""
+        async def _call():
+            client = gemini_client.get_async_client()
+            response = await client.models.generate_content(model=config.MODEL_NAME, contents="hi")
+            return response.text
+        for _ in range(3):
+            self.assertEqual(gemini_client.run_sync(_call()), "ok")
+        stats = gemini_client.get_stats()
+        self.assertEqual(stats["clients_created"], 1)
+        self.assertEqual(stats["connections_opened"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
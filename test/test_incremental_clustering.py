@@ -0,0 +1,174 @@
+# test/test_incremental_clustering.py
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import incremental_clustering, cluster_document, gemini_client, local_clustering
+from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior
+
+QUANTUM = [
+    "量子コンピュータは量子ビットの重ね合わせを利用して計算を行う。",
+    "量子ビットのエラー訂正は量子コンピュータ実用化の鍵となる。",
+    "量子コンピュータの量子ビットは超伝導回路で作られることが多い。",
+]
+MASLOW = [
+    "マズローの欲求階層説では自己実現が最上位の欲求とされる。",
+    "自己実現欲求は承認欲求が満たされた後に現れるとマズローは述べた。",
+    "マズローは自己実現した人の特徴として創造性を挙げた。",
+]
+COOKING = [
+    "味噌汁の出汁は昆布と鰹節から丁寧に取るのが基本だ。",
+    "昆布と鰹節の合わせ出汁は和食の味の土台になる。",
+    "鰹節を削りたてで使うと出汁の香りが格段に良くなる。",
+    "味噌は火を止めてから溶くと風味が飛ばない。",
+]
+
+class TestIncrementalClustering(unittest.TestCase):
+
+    SETTINGS = ("CLUSTER_COUNT", "LOCAL_CLUSTER_LABELING", "RESPONSE_CACHE_ENABLED", "CLUSTERING_ENGINE",
+                "CLUSTERING_INCREMENTAL", "CLUSTER_DRIFT_THRESHOLD", "CLUSTER_MERGE_THRESHOLD", "CLUSTER_RELABEL_THRESHOLD")
+
+    def setUp(self):
+        self.original = {name: getattr(config, name) for name in self.SETTINGS}
+        config.CLUSTER_COUNT = 2
+        config.LOCAL_CLUSTER_LABELING = False
+        config.RESPONSE_CACHE_ENABLED = False
+        config.CLUSTER_DRIFT_THRESHOLD = 0.15
+        config.CLUSTER_MERGE_THRESHOLD = 0.85
+        config.CLUSTER_RELABEL_THRESHOLD = 0.05
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp_dir.name, 'cluster_state.npz')
+
+    def tearDown(self):
+        for name, value in self.original.items():
+            setattr(config, name, value)
+        gemini_client.set_client(None)
+        self.tmp_dir.cleanup()
+
+    def _members(self):
+        """クラスターごとの代表パッセージ（テストのクラスターは小さいので全メンバー）"""
+        state = incremental_clustering.load_state(self.state_path)
+        return {c["cluster_id"]: c["samples"] for c in state["clusters"]}
+
+    def _counts(self):
+        state = incremental_clustering.load_state(self.state_path)
+        return {c["cluster_id"]: c["count"] for c in state["clusters"]}
+
+    def test_state_round_trip(self):
+        incremental_clustering.update_clusters(QUANTUM + MASLOW, self.state_path)
+        state = incremental_clustering.load_state(self.state_path)
+        self.assertEqual(state["next_cluster_id"], 3)
+        self.assertEqual(state["centroids"].shape[0], 2)
+        self.assertIsNotNone(state["idf"])
+
+    def test_new_passages_join_existing_clusters_with_stable_ids(self):
+        first = incremental_clustering.update_clusters(QUANTUM[:2] + MASLOW[:2], self.state_path)
+        before = self._members()
+        second = incremental_clustering.update_clusters(QUANTUM[:2] + MASLOW[:2] + [QUANTUM[2], MASLOW[2]], self.state_path)
+        after = self._members()
+        self.assertEqual([c["cluster_id"] for c in first["clusters"]], [c["cluster_id"] for c in second["clusters"]])
+        for cluster_id, members in before.items():
+            self.assertTrue(set(members) <= set(after[cluster_id]))
+        self.assertEqual(sorted(self._counts().values()), [3, 3])
+        quantum_id = next(i for i, m in after.items() if QUANTUM[0] in m)
+        self.assertIn(QUANTUM[2], after[quantum_id])
+        self.assertNotIn(MASLOW[2], after[quantum_id])
+
+    def test_only_changed_clusters_are_relabeled(self):
+        incremental_clustering.update_clusters(QUANTUM[:2] + MASLOW[:2], self.state_path)
+        config.LOCAL_CLUSTER_LABELING = True
+        behavior = FakeGeminiBehavior(base_latency=0, per_token_latency=0)
+        gemini_client.set_client(FakeGeminiClient(behavior))
+        incremental_clustering.update_clusters(QUANTUM[:2] + MASLOW[:2], self.state_path)
+        self.assertEqual(behavior.calls, {})
+        data = incremental_clustering.update_clusters(QUANTUM + MASLOW[:2], self.state_path)
+        self.assertEqual(behavior.calls, {"cluster_label": 1})
+        self.assertEqual(sum(c["theme"] == "自己実現と学習" for c in data["clusters"]), 1)
+
+    def test_drift_splits_with_a_new_id(self):
+        incremental_clustering.update_clusters(QUANTUM + MASLOW, self.state_path)
+        config.CLUSTER_MERGE_THRESHOLD = 1.1
+        data = incremental_clustering.update_clusters(QUANTUM + MASLOW + COOKING, self.state_path)
+        self.assertEqual([c["cluster_id"] for c in data["clusters"]], [1, 2, 3])
+        members = self._members()
+        cooking_ids = {i for i, m in members.items() if any(p in m for p in COOKING)}
+        self.assertEqual(len(cooking_ids), 1)
+        self.assertEqual(cooking_ids, {3})
+
+    def test_slow_drift_over_several_cycles_splits(self):
+        incremental_clustering.update_clusters(QUANTUM + MASLOW, self.state_path)
+        baseline = {c["cluster_id"]: c["cohesion"] for c in incremental_clustering.load_state(self.state_path)["clusters"]}
+        config.CLUSTER_MERGE_THRESHOLD = 1.1
+        # 1件ずつでは閾値に届かないが、基準の凝集度はラベルを付け直しても変えないので、2回目で分割される
+        incremental_clustering.update_clusters(QUANTUM + MASLOW + COOKING[:1], self.state_path)
+        state = incremental_clustering.load_state(self.state_path)
+        self.assertEqual(len(state["clusters"]), 2)
+        self.assertEqual({c["cluster_id"]: c["cohesion"] for c in state["clusters"]}, baseline)
+        data = incremental_clustering.update_clusters(QUANTUM + MASLOW + COOKING[:2], self.state_path)
+        self.assertEqual([c["cluster_id"] for c in data["clusters"]], [1, 2, 3])
+        self.assertEqual(set(self._members()[3]), set(COOKING[:2]))
+
+    def test_clusters_that_barely_move_keep_their_labels(self):
+        passages = [f"量子ビット{i}番の実験では量子もつれを観測した。" for i in range(30)] + MASLOW
+        incremental_clustering.update_clusters(passages, self.state_path)
+        config.CLUSTER_MERGE_THRESHOLD = 1.1
+        config.LOCAL_CLUSTER_LABELING = True
+        behavior = FakeGeminiBehavior(base_latency=0, per_token_latency=0)
+        gemini_client.set_client(FakeGeminiClient(behavior))
+        incremental_clustering.update_clusters(passages + ["量子ビット30番の実験では量子もつれを観測した。"], self.state_path)
+        self.assertEqual(behavior.calls, {})
+        self.assertEqual(sum(self._counts().values()), 34)
+
+    def test_similar_clusters_are_merged_into_the_older_id(self):
+        incremental_clustering.update_clusters(QUANTUM + MASLOW, self.state_path)
+        state = incremental_clustering.load_state(self.state_path)
+        state["centroids"][1] = state["centroids"][0]
+        incremental_clustering.save_state(self.state_path, state)
+        data = incremental_clustering.update_clusters(QUANTUM + MASLOW + ["量子ビットの研究は進んでいる。"], self.state_path)
+        self.assertEqual([c["cluster_id"] for c in data["clusters"]], [1])
+        self.assertEqual(self._counts()[1], 7)
+
+    def test_cluster_knowledge_text_uses_state_when_incremental(self):
+        config.CLUSTERING_ENGINE = "local"
+        config.CLUSTERING_INCREMENTAL = True
+        text = "\n".join(QUANTUM + MASLOW)
+        cluster_document.cluster_knowledge_text(text, [], self.state_path)
+        self.assertTrue(os.path.exists(self.state_path))
+        data = cluster_document.cluster_knowledge_text(text, ["量子ビットの研究は進んでいる。"], self.state_path)
+        self.assertTrue(any("量子ビットの研究は進んでいる。" in m for m in self._members().values()))
+        self.assertEqual(len(data["clusters"]), len(np.unique([c["cluster_id"] for c in data["clusters"]])))
+
+    def test_state_keeps_statistics_not_every_passage(self):
+        passages = [f"量子ビット{i}番の実験では量子もつれを観測した。" for i in range(30)] + MASLOW
+        incremental_clustering.update_clusters(passages, self.state_path)
+        size = os.path.getsize(self.state_path)
+        more = [f"量子ビット{i}番の実験では量子もつれを観測した。" for i in range(30, 90)]
+        transformed = []
+        original_transform = local_clustering.HashingVectorizer.transform
+        def _transform(vectorizer, texts):
+            transformed.append(len(texts))
+            return original_transform(vectorizer, texts)
+        with patch.object(local_clustering.HashingVectorizer, 'transform', _transform):
+            incremental_clustering.update_clusters(passages + more, self.state_path)
+        # 新しいパッセージだけをベクトル化する（既存メンバーや代表パッセージはベクトル化し直さない）
+        self.assertEqual(transformed, [len(more)])
+        state = incremental_clustering.load_state(self.state_path)
+        self.assertNotIn("members", state["clusters"][0])
+        self.assertTrue(all(len(c["samples"]) <= incremental_clustering.SAMPLE_SIZE for c in state["clusters"]))
+        self.assertEqual(sum(c["count"] for c in state["clusters"]), 90 + len(MASLOW))
+        self.assertEqual(len(state["known"]), 90 + len(MASLOW))
+        # パッセージを3倍にしても、状態ファイルは本文の分だけ大きくならない
+        self.assertLess(os.path.getsize(self.state_path), size + 60 * 16)
+
+if __name__ == '__main__':
+    unittest.main()
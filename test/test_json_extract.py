@@ -0,0 +1,70 @@
+# test/test_json_extract.py
+import os
+import sys
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from src import json_extract
+
+class TestJsonExtract(unittest.TestCase):
+
+    def test_fenced_and_unfenced_output(self):
+        self.assertEqual(json_extract.extract_json('```json\n{"a": 1}\n```'), {"a": 1})
+        self.assertEqual(json_extract.extract_json('{"a": 1}'), {"a": 1})
+        self.assertEqual(json_extract.extract_json('結果です。\n{"a": {"b": [1, 2]}}\n以上です。'), {"a": {"b": [1, 2]}})
+
+    def test_json_starting_with_fence_letters_is_kept(self):
+        """lstrip("```json") のように、先頭の文字を削ってしまわないこと"""
+        text = '```json\n{"json": "nested ```json fence``` in a string", "n": "}"}\n```'
+        self.assertEqual(
+            json_extract.extract_json(text),
+            {"json": "nested ```json fence``` in a string", "n": "}"},
+        )
+
+    def test_skips_non_json_braces(self):
+        text = 'テンプレート {theme} を埋めました。\n```json\n{"theme": "AI"}\n```'
+        self.assertEqual(json_extract.extract_json(text), {"theme": "AI"})
+
+    def test_streaming_chunks(self):
+        extractor = json_extract.StreamingJsonExtractor()
+        chunks = ['```json\n{"tweet": "こん', 'にちは", "thought', '_process": {"a": "}"}', '}\n``` 余計な文']
+        results = [extractor.feed(chunk) for chunk in chunks]
+        self.assertEqual(results[:3], [None, None, None])
+        self.assertEqual(results[3], {"tweet": "こんにちは", "thought_process": {"a": "}"}})
+
+    def test_streaming_waits_for_truncated_literal(self):
+        # 外側のオブジェクトが途中のリテラルで止まっていても、内側のオブジェクトを返さない
+        extractor = json_extract.StreamingJsonExtractor()
+        self.assertIsNone(extractor.feed('{"b": {"c": 1}, "a": tr'))
+        self.assertEqual(extractor.feed('ue}'), {"b": {"c": 1}, "a": True})
+
+    def test_many_non_json_braces(self):
+        text = "テンプレート {theme} の例です。" * 20000 + '```json\n{"theme": "AI"}\n```'
+        self.assertEqual(json_extract.extract_json(text), {"theme": "AI"})
+        extractor = json_extract.StreamingJsonExtractor()
+        for i in range(0, len(text), 64):
+            extractor.feed(text[i:i + 64])
+        self.assertEqual(extractor.close(), {"theme": "AI"})
+
+    def test_error_reports_position(self):
+        text = '```json\n{\n  "a": 1,\n  "b": oops\n}\n```'
+        with self.assertRaises(json_extract.JsonExtractionError) as ctx:
+            json_extract.extract_json(text)
+        self.assertEqual(ctx.exception.line, 4)
+        self.assertIsNotNone(ctx.exception.position)
+        self.assertIsInstance(ctx.exception, ValueError)
+
+    def test_truncated_output(self):
+        with self.assertRaises(json_extract.JsonExtractionError) as ctx:
+            json_extract.extract_json('```json\n{"a": "途中で')
+        self.assertEqual(ctx.exception.position, 8)
+
+    def test_find_string_field_waits_for_closing_quote(self):
+        self.assertIsNone(json_extract.find_string_field('{"tweet": "途中', "tweet"))
+        self.assertEqual(json_extract.find_string_field('{"tweet": "引用\\"あり\\"です", "x', "tweet"), '引用"あり"です')
+
+if __name__ == '__main__':
+    unittest.main()
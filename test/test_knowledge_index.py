@@ -0,0 +1,123 @@
+# test/test_knowledge_index.py
+import os
+import sys
+import json
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src import knowledge_index, knowledge_log, x_poster
+
+def _entry(i: int, theme: str, tweet: str, days_ago: int = 0) -> dict:
+    return {
+        "topic_id": i % 3 + 1,
+        "theme": theme,
+        "created_at": (datetime.now() - timedelta(days=days_ago)).isoformat(),
+        "research_summary": {"overview": f"{theme}の概要", "details": "詳細", "trends": ""},
+        "character_post": {"tweet": tweet},
+    }
+
+class TestKnowledgeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, 'all_knowledge_log.json')
+        self.db_path = os.path.join(self.tmp_dir.name, 'index.sqlite3')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _append(self, *entries):
+        for entry in entries:
+            knowledge_log.append_entry(self.log_path, entry)
+
+    def test_queries_use_indexed_columns(self):
+        self._append(
+            _entry(0, "自己実現", "自己実現について考えました。", days_ago=10),
+            _entry(1, "量子コンピュータ", "量子ビットは面白いですね。", days_ago=3),
+            _entry(2, "自己実現", "学び続けることが成長です。", days_ago=1),
+        )
+        index = knowledge_index.open_index(self.log_path, self.db_path)
+        self.assertEqual(index.count(), 3)
+        self.assertEqual([e["character_post"]["tweet"] for e in index.by_theme("自己実現")],
+                         ["学び続けることが成長です。", "自己実現について考えました。"])
+        self.assertEqual(len(index.by_topic(2)), 1)
+        self.assertEqual(len(index.since(days=7)), 2)
+        self.assertEqual(index.latest_tweet(), "学び続けることが成長です。")
+        with index._connect() as conn:
+            plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN SELECT entry FROM entries WHERE theme = ?", ("x",)))
+        self.assertIn("idx_entries_theme", plan)
+
+    def test_full_text_search(self):
+        self._append(_entry(0, "自己実現", "マズローの欲求階層について。"), _entry(1, "量子", "量子ビットのエラー訂正について。"))
+        index = knowledge_index.open_index(self.log_path, self.db_path)
+        self.assertEqual([e["theme"] for e in index.search("エラー訂正")], ["量子"])
+        self.assertEqual([e["theme"] for e in index.search("量子")], ["量子"])   # trigram より短い語
+        self.assertEqual([e["theme"] for e in index.search("自己実現の概要")], ["自己実現"])
+        self.assertEqual(index.search("存在しない語句"), [])
+
+    def test_sync_only_reads_appended_entries(self):
+        self._append(_entry(0, "A", "一件目のツイート。"))
+        index = knowledge_index.open_index(self.log_path, self.db_path)
+        self.assertEqual(index.sync(), 0)
+        self._append(_entry(1, "B", "二件目のツイート。"))
+        self.assertEqual(index.sync(), 1)
+        self.assertEqual(index.count(), 2)
+
+    def test_concurrent_syncs_do_not_import_the_same_entries_twice(self):
+        self._append(_entry(0, "量子", "最初のツイートです。"))
+        knowledge_index.open_index(self.log_path, self.db_path)
+        self._append(*[_entry(i, "自己実現", f"{i}件目のツイートです。") for i in range(5)])
+        original = knowledge_log.iter_entries_since
+        other = threading.Thread(target=lambda: knowledge_index.KnowledgeIndex(self.log_path, self.db_path).sync())
+
+        def _iter_while_other_syncs(path, offset):
+            # 1つ目の同期が末尾を読んでいる間に、別の接続から同期を始める
+            if not other.is_alive() and other.ident is None:
+                other.start()
+                other.join(timeout=0.5)
+            yield from original(path, offset)
+
+        with patch.object(knowledge_index.knowledge_log, 'iter_entries_since', side_effect=_iter_while_other_syncs):
+            knowledge_index.KnowledgeIndex(self.log_path, self.db_path).sync()
+            other.join()
+        index = knowledge_index.open_index(self.log_path, self.db_path)
+        self.assertEqual(index.count(), 6)
+        self.assertEqual(len(index.search("件目のツイート")), 5)
+
+    def test_legacy_json_is_imported_and_reimported_when_changed(self):
+        json_path = os.path.join(self.tmp_dir.name, 'knowledge_entries.json')
+        entries = [{"theme": "旧", "generated_tweet": "旧形式のツイート。", "created_at": "2025-07-01T00:00:00"}]
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({"knowledge_entries": entries}, f, ensure_ascii=False)
+        index = knowledge_index.open_index(json_path, self.db_path)
+        self.assertEqual(index.latest_tweet(), "旧形式のツイート。")
+        self.assertEqual(index.sync(), 0)
+        entries.append({"theme": "新", "tweet": "追加したツイート。", "created_at": "2025-07-02T00:00:00"})
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({"knowledge_entries": entries}, f, ensure_ascii=False)
+        self.assertEqual(index.sync(), 2)
+        self.assertEqual(index.latest_tweet(), "追加したツイート。")
+        # 旧形式のファイルを JSON Lines に移行しない
+        self.assertFalse(os.path.exists(knowledge_log.jsonl_path_for(json_path)))
+
+    def test_get_latest_tweet_uses_index(self):
+        original = knowledge_index.INDEX_DIR
+        knowledge_index.INDEX_DIR = os.path.join(self.tmp_dir.name, 'index')
+        try:
+            self._append(_entry(0, "A", "最初のツイート。"), _entry(1, "B", "最新のツイート。"))
+            self.assertEqual(x_poster.get_latest_tweet(self.log_path), "最新のツイート。")
+            with self.assertRaises(FileNotFoundError):
+                x_poster.get_latest_tweet(os.path.join(self.tmp_dir.name, 'missing.json'))
+        finally:
+            knowledge_index.INDEX_DIR = original
+
+if __name__ == '__main__':
+    unittest.main()
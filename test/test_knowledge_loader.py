@@ -0,0 +1,117 @@
+# test/test_knowledge_loader.py
+import os
+import sys
+import json
+import time
+import tempfile
+import unittest
+import importlib.util
+from unittest.mock import patch
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import knowledge_loader, from_docx_import_Document, cluster_document
+
+HAS_DOCX = importlib.util.find_spec("docx") is not None
+
+class TestKnowledgeLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmp_dir.name, 'sources')
+        os.makedirs(os.path.join(self.source_dir, 'notes'))
+        self.original = (knowledge_loader.TEXT_DIR, config.KNOWLEDGE_LOADER_WORKERS)
+        knowledge_loader.TEXT_DIR = os.path.join(self.tmp_dir.name, 'cache')
+        config.KNOWLEDGE_LOADER_WORKERS = 2
+        knowledge_loader.reset_stats()
+        self._write('a.txt', "一行目\n二行目\n")
+        self._write(os.path.join('notes', 'b.md'), "# 見出し\n本文です。\n")
+        self._write('ignored.json', "{}")
+
+    def tearDown(self):
+        knowledge_loader.TEXT_DIR, config.KNOWLEDGE_LOADER_WORKERS = self.original
+        knowledge_loader.reset_stats()
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.source_dir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_loads_all_supported_documents(self):
+        # 2件以上の解析はプロセスプールで行う（1コアの環境でもプールを通す）
+        with patch.object(knowledge_loader.os, 'cpu_count', return_value=2):
+            documents = knowledge_loader.load_documents(self.source_dir)
+        self.assertEqual([os.path.basename(d["path"]) for d in documents], ["a.txt", "b.md"])
+        self.assertEqual(documents[0]["text"], "一行目\n二行目\n")
+        self.assertEqual(knowledge_loader.get_stats()["parsed"], 2)
+        self.assertEqual(knowledge_loader.load_documents(os.path.join(self.tmp_dir.name, 'missing')), [])
+
+    def test_default_directory_holds_the_knowledge_base(self):
+        self.assertEqual(knowledge_loader.knowledge_base_dir(), os.path.join(project_root, 'data', 'knowledge_base'))
+        self.assertTrue(os.path.isdir(knowledge_loader.knowledge_base_dir()))
+
+    def test_generated_files_are_not_loaded(self):
+        self._write('concept_summary.md', "# 概念の要約\n新しい概念\n")
+        self._write('persona.txt', "ペルソナ本文\n")
+        self._write('knowledge.jsonl', '{"tweet": "記録"}\n')
+        self.assertEqual(
+            [os.path.basename(p) for p in knowledge_loader.list_documents(self.source_dir)], ["a.txt", "b.md"]
+        )
+        # ペルソナはベースファイルとして一度だけ、概念の要約は読み込まない
+        combined = from_docx_import_Document.get_combined_knowledge_text(
+            os.path.join(self.source_dir, 'persona.txt'), os.path.join(self.tmp_dir.name, 'none.json'), self.source_dir
+        )
+        self.assertEqual(combined.count("ペルソナ本文"), 1)
+        self.assertNotIn("新しい概念", combined)
+        self.assertNotIn("記録", combined)
+
+    def test_only_changed_files_are_parsed_again(self):
+        knowledge_loader.load_documents(self.source_dir)
+        knowledge_loader.reset_stats()
+        second = knowledge_loader.load_documents(self.source_dir)
+        self.assertEqual(knowledge_loader.get_stats()["parsed"], 0)
+        self.assertEqual(second[0]["text"], "一行目\n二行目\n")
+        time.sleep(0.01)
+        self._write('a.txt', "書き換えた内容\n")
+        knowledge_loader.reset_stats()
+        third = knowledge_loader.load_documents(self.source_dir)
+        stats = knowledge_loader.get_stats()
+        self.assertEqual((stats["parsed"], stats["cache_hits"]), (1, 1))
+        self.assertEqual(third[0]["text"], "書き換えた内容\n")
+
+    def test_cache_is_content_addressed(self):
+        knowledge_loader.load_documents(self.source_dir)
+        # 同じ内容のファイルが増えても、解析し直さない
+        self._write('copy.txt', "一行目\n二行目\n")
+        knowledge_loader.reset_stats()
+        documents = knowledge_loader.load_documents(self.source_dir)
+        self.assertEqual(knowledge_loader.get_stats()["parsed"], 0)
+        self.assertEqual(documents[0]["sha256"], documents[1]["sha256"])
+        manifest = json.loads(open(knowledge_loader.manifest_path(), encoding='utf-8').read())
+        self.assertEqual(len(manifest), 3)
+
+    @unittest.skipUnless(HAS_DOCX, "python-docx が必要です")
+    def test_docx_keeps_every_paragraph(self):
+        from docx import Document
+        document = Document()
+        for text in ["最初の段落", "", "二つ目の段落", "三つ目の段落"]:
+            document.add_paragraph(text)
+        path = os.path.join(self.source_dir, 'persona.docx')
+        document.save(path)
+        self.assertEqual(cluster_document.read_text_from_file(path), "最初の段落\n二つ目の段落\n三つ目の段落")
+        combined = from_docx_import_Document.get_combined_knowledge_text(path, os.path.join(self.tmp_dir.name, 'none.json'), self.source_dir)
+        self.assertEqual(combined.split("\n")[:3], ["最初の段落", "二つ目の段落", "三つ目の段落"])
+        self.assertIn("本文です。", combined)
+
+    def test_unsupported_or_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            cluster_document.read_text_from_file(os.path.join(self.source_dir, 'missing.txt'))
+        with self.assertRaises(ValueError):
+            cluster_document.read_text_from_file(os.path.join(self.source_dir, 'ignored.json'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# test/test_knowledge_log.py
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from src import knowledge_log
+
+class TestKnowledgeLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self.tmp_dir.name, 'all_knowledge_log.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_migrates_existing_json_on_first_append(self):
+        """旧形式のJSONログが自動で移行され、その後ろに追記されること"""
+        with open(self.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"knowledge_entries": [{"theme": "旧1"}, {"theme": "旧2"}]}, f, ensure_ascii=False)
+
+        knowledge_log.append_entry(self.json_path, {"theme": "新規"})
+
+        self.assertTrue(os.path.exists(knowledge_log.jsonl_path_for(self.json_path)))
+        themes = [e["theme"] for e in knowledge_log.iter_entries(self.json_path)]
+        self.assertEqual(themes, ["旧1", "旧2", "新規"])
+
+    def test_ignores_truncated_last_line(self):
+        """書き込み途中の最終行は読み飛ばされること"""
+        knowledge_log.append_entry(self.json_path, {"theme": "A"})
+        with open(knowledge_log.jsonl_path_for(self.json_path), 'a', encoding='utf-8') as f:
+            f.write('{"theme": "途中')
+        self.assertEqual(knowledge_log.load_entries(self.json_path), [{"theme": "A"}])
+
+    def test_compact_writes_legacy_shape(self):
+        """compact() で従来形式のJSONが書き出されること"""
+        knowledge_log.append_entry(self.json_path, {"theme": "A"})
+        knowledge_log.append_entry(self.json_path, {"theme": "B"})
+        self.assertEqual(knowledge_log.compact(self.json_path), 2)
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(data, {"knowledge_entries": [{"theme": "A"}, {"theme": "B"}]})
+
+if __name__ == '__main__':
+    unittest.main()
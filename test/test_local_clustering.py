@@ -0,0 +1,77 @@
+# test/test_local_clustering.py
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import local_clustering, cluster_document, gemini_client
+from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior
+
+PERSONA_PATH = os.path.join(project_root, 'data', 'knowledge_base', 'persona.txt')
+
+TEXTS = (
+    ["量子コンピュータは量子ビットの重ね合わせを利用して計算を行う。"] * 3
+    + ["量子ビットのエラー訂正は量子コンピュータ実用化の鍵となる。"] * 2
+    + ["マズローの欲求階層説では自己実現が最上位の欲求とされる。"] * 3
+    + ["自己実現欲求は承認欲求が満たされた後に現れるとマズローは述べた。"] * 2
+)
+
+class TestLocalClustering(unittest.TestCase):
+
+    def setUp(self):
+        self.original = (config.LOCAL_CLUSTER_LABELING, config.RESPONSE_CACHE_ENABLED, config.CLUSTERING_ENGINE)
+        config.RESPONSE_CACHE_ENABLED = False
+
+    def tearDown(self):
+        config.LOCAL_CLUSTER_LABELING, config.RESPONSE_CACHE_ENABLED, config.CLUSTERING_ENGINE = self.original
+        gemini_client.set_client(None)
+
+    def test_vectors_are_normalized_and_deterministic(self):
+        first = local_clustering.HashingVectorizer().fit_transform(TEXTS)
+        second = local_clustering.HashingVectorizer().fit_transform(TEXTS)
+        np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-5)
+        np.testing.assert_array_equal(first, second)
+
+    def test_kmeans_separates_topics(self):
+        vectors = local_clustering.HashingVectorizer().fit_transform(TEXTS)
+        labels, centers = local_clustering.kmeans(vectors, 2)
+        self.assertEqual(centers.shape[0], 2)
+        self.assertEqual(len(set(labels[:5])), 1)
+        self.assertEqual(len(set(labels[5:])), 1)
+        self.assertNotEqual(labels[0], labels[5])
+
+    def test_output_matches_activity_clusters_schema(self):
+        with open(PERSONA_PATH, 'r', encoding='utf-8') as f:
+            text = f.read()
+        config.LOCAL_CLUSTER_LABELING = False
+        first = local_clustering.cluster_text(text, n_clusters=10)
+        second = local_clustering.cluster_text(text, n_clusters=10)
+        self.assertEqual(first, second)
+        self.assertEqual([c["cluster_id"] for c in first["clusters"]], list(range(1, 11)))
+        for cluster in first["clusters"]:
+            self.assertEqual(set(cluster), {"cluster_id", "theme", "summary", "keywords"})
+            self.assertTrue(cluster["theme"])
+            self.assertIsInstance(cluster["keywords"], list)
+
+    def test_gemini_is_used_only_for_labels(self):
+        config.LOCAL_CLUSTER_LABELING = True
+        config.CLUSTERING_ENGINE = "local"
+        behavior = FakeGeminiBehavior(base_latency=0, per_token_latency=0)
+        gemini_client.set_client(FakeGeminiClient(behavior))
+        data = local_clustering.cluster_passages(TEXTS, n_clusters=2)
+        self.assertEqual(len(data["clusters"]), 2)
+        self.assertEqual(data["clusters"][0]["theme"], "自己実現と学習")
+        self.assertEqual(behavior.calls, {"cluster_label": 2})
+        # CLUSTERING_ENGINE=local では cluster_knowledge_text もローカルエンジンを使う
+        data = cluster_document.cluster_knowledge_text("\n".join(TEXTS))
+        self.assertEqual(behavior.calls, {"cluster_label": 2 + len(data["clusters"])})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# test/test_map_reduce.py
+import os
+import sys
+import json
+import tempfile
+import threading
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import map_reduce, concept_generator, gemini_client
+from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior
+
+class TestMapReduce(unittest.TestCase):
+
+    def test_estimate_tokens(self):
+        self.assertEqual(map_reduce.estimate_tokens("自己実現"), 4)
+        self.assertEqual(map_reduce.estimate_tokens("abcdefgh"), 2)
+
+    def test_chunks_keep_order_and_respect_limit(self):
+        texts = [f"記録{i}：" + "あ" * 30 for i in range(20)]
+        chunks = map_reduce.chunk_texts(texts, 100, separator="\n")
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(map_reduce.estimate_tokens(c) <= 100 for c in chunks))
+        self.assertEqual("\n".join(chunks), "\n".join(texts))
+
+    def test_oversized_text_is_split(self):
+        chunks = map_reduce.chunk_texts(["い" * 250], 100)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual("".join(chunks), "い" * 250)
+
+    def test_small_input_is_returned_unchanged(self):
+        calls = []
+        result = map_reduce.reduce_to_fit(["a", "b"], lambda *args: calls.append(args), "test", max_tokens=100, separator="\n")
+        self.assertEqual(result, "a\nb")
+        self.assertEqual(calls, [])
+
+    def test_chunks_are_summarized_in_parallel(self):
+        active, peak, lock = [0], [0], threading.Lock()
+        barrier = threading.Barrier(2, timeout=2)
+
+        def _summarize(chunk_text, index, total):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            barrier.wait()
+            with lock:
+                active[0] -= 1
+            return f"要約{index}/{total}"
+
+        texts = ["う" * 60 for _ in range(4)]
+        result = map_reduce.reduce_to_fit(texts, _summarize, "test", max_tokens=130, workers=2)
+        self.assertEqual(result, "要約1/2\n\n要約2/2")
+        self.assertEqual(peak[0], 2)
+
+    def test_generate_new_concept_uses_map_reduce_for_large_histories(self):
+        original = (config.RESPONSE_CACHE_ENABLED, config.MAP_REDUCE_CHUNK_TOKENS)
+        config.RESPONSE_CACHE_ENABLED = False
+        config.MAP_REDUCE_CHUNK_TOKENS = 2000
+        behavior = FakeGeminiBehavior(base_latency=0, per_token_latency=0)
+        gemini_client.set_client(FakeGeminiClient(behavior))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            knowledge_file = os.path.join(tmp_dir, 'recent_knowledge.json')
+            entries = [{"theme": f"テーマ{i}", "generated_tweet": "ツイート", "details": "詳細" * 200} for i in range(30)]
+            with open(knowledge_file, 'w', encoding='utf-8') as f:
+                json.dump({"knowledge_entries": entries}, f, ensure_ascii=False)
+            try:
+                concept = concept_generator.generate_new_concept(
+                    knowledge_file, os.path.join(tmp_dir, 'summary.md'), os.path.join(tmp_dir, 'concepts.json')
+                )
+            finally:
+                config.RESPONSE_CACHE_ENABLED, config.MAP_REDUCE_CHUNK_TOKENS = original
+                gemini_client.set_client(None)
+        self.assertEqual(concept["concept_name"], "自律的成長ループ")
+        self.assertGreater(behavior.calls["map_summary"], 1)
+        self.assertEqual(behavior.calls["concept_summary"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
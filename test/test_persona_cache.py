@@ -0,0 +1,91 @@
+# test/test_persona_cache.py
+import os
+import sys
+import time
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import persona_cache
+
+class _FakeCaches:
+    """genai の client.caches のローカルスタブ。"""
+
+    def __init__(self, fail=False):
+        self.created = []
+        self.remote = []
+        self.fail = fail
+
+    def create(self, model, config):
+        if self.fail:
+            raise RuntimeError("caching is not supported for this model")
+        self.created.append(config.system_instruction)
+        cache = SimpleNamespace(
+            name=f"cachedContents/{len(self.created)}", display_name=config.display_name,
+            model=f"models/{model}", expire_time=time.time() + int(config.ttl.rstrip("s")),
+        )
+        self.remote.append(cache)
+        return cache
+
+    def list(self):
+        return list(self.remote)
+
+class TestPersonaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.persona_path = os.path.join(self.tmp_dir.name, 'persona.txt')
+        with open(self.persona_path, 'w', encoding='utf-8') as f:
+            f.write("丁寧なですます調で話すAIキャラクター")
+        self.original = (persona_cache.REGISTRY_PATH, config.PERSONA_CONTEXT_CACHE)
+        persona_cache.REGISTRY_PATH = os.path.join(self.tmp_dir.name, 'registry.json')
+        config.PERSONA_CONTEXT_CACHE = True
+
+    def tearDown(self):
+        persona_cache.REGISTRY_PATH, config.PERSONA_CONTEXT_CACHE = self.original
+        self.tmp_dir.cleanup()
+
+    def test_cache_is_created_once_per_persona_hash(self):
+        client = SimpleNamespace(caches=_FakeCaches())
+        first = persona_cache.get_cached_content_name(client, "model-a", self.persona_path)
+        second = persona_cache.get_cached_content_name(client, "model-a", self.persona_path)
+        self.assertEqual(first, second)
+        self.assertEqual(len(client.caches.created), 1)
+        self.assertIn("丁寧なですます調", client.caches.created[0])
+
+    def test_persona_change_invalidates_cache(self):
+        client = SimpleNamespace(caches=_FakeCaches())
+        first = persona_cache.get_cached_content_name(client, "model-a", self.persona_path)
+        # mtime の分解能に依存しないよう、サイズも変える
+        time.sleep(0.01)
+        with open(self.persona_path, 'w', encoding='utf-8') as f:
+            f.write("新しいペルソナ定義です。")
+        second = persona_cache.get_cached_content_name(client, "model-a", self.persona_path)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(client.caches.created), 2)
+
+    def test_reuses_server_side_cache_without_registry(self):
+        client = SimpleNamespace(caches=_FakeCaches())
+        first = persona_cache.get_cached_content_name(client, "model-a", self.persona_path)
+        # CACHE_DIR を持ち越さない実行（GitHub Actions など）を再現する
+        os.remove(persona_cache.REGISTRY_PATH)
+        second = persona_cache.get_cached_content_name(client, "model-a", self.persona_path)
+        self.assertEqual(first, second)
+        self.assertEqual(len(client.caches.created), 1)
+        # 期限切れ間近のキャッシュは使わない
+        os.remove(persona_cache.REGISTRY_PATH)
+        client.caches.remote[0].expire_time = time.time() + 30
+        self.assertNotEqual(persona_cache.get_cached_content_name(client, "model-a", self.persona_path), first)
+
+    def test_falls_back_when_caching_is_unsupported(self):
+        client = SimpleNamespace(caches=_FakeCaches(fail=True))
+        self.assertIsNone(persona_cache.get_cached_content_name(client, "model-b", self.persona_path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# test/test_persona_index.py
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import persona_index, research_topic, gemini_client
+from benchmarks.fake_gemini import FakeGeminiClient
+
+PERSONA = (
+    "序論カルマは海洋都市リュケイオンの市長ロボットです。丁寧なですます調で話します。"
+    "I. 家事の能力カルマは料理と掃除が得意で、家事全般を完璧にこなします。洗濯物をたたむのも好きです。"
+    "II. 算数が苦手計算は不得意で、簡単な足し算でも間違えることがあります。"
+    "III. リーダーシップA-ナンバーズを率いるリーダーとして、仲間を守る責任を負っています。"
+    "IV. 結論カルマは機械と人間らしさが融合した存在です。"
+)
+
+class TestPersonaIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.persona_path = os.path.join(self.tmp_dir.name, 'persona.txt')
+        with open(self.persona_path, 'w', encoding='utf-8') as f:
+            f.write(PERSONA)
+        self.original = (persona_index.INDEX_DIR, config.PERSONA_PASSAGE_CHARS, config.PERSONA_TOP_K)
+        persona_index.INDEX_DIR = os.path.join(self.tmp_dir.name, 'index')
+        config.PERSONA_PASSAGE_CHARS = 60
+        config.PERSONA_TOP_K = 1
+        persona_index._indexes.clear()
+
+    def tearDown(self):
+        persona_index.INDEX_DIR, config.PERSONA_PASSAGE_CHARS, config.PERSONA_TOP_K = self.original
+        persona_index._indexes.clear()
+        self.tmp_dir.cleanup()
+
+    def test_split_sections_on_numbered_headings(self):
+        sections = persona_index.split_sections(PERSONA)
+        self.assertEqual(len(sections), 5)
+        self.assertTrue(sections[1].startswith("I. 家事"))
+        self.assertTrue(sections[4].startswith("IV. 結論"))
+
+    def test_excerpt_keeps_core_and_relevant_section(self):
+        excerpt = persona_index.excerpt_persona(self.persona_path, "料理や掃除などの家事")
+        self.assertIn("市長ロボット", excerpt)     # 序論
+        self.assertIn("融合した存在", excerpt)     # 結論
+        self.assertIn("料理と掃除", excerpt)
+        self.assertNotIn("足し算", excerpt)
+        self.assertNotIn("A-ナンバーズ", excerpt)
+        self.assertLess(len(excerpt), len(PERSONA))
+
+    def test_index_is_cached_on_disk_by_persona_hash(self):
+        first = persona_index.get_index(self.persona_path)
+        cached_files = os.listdir(persona_index.INDEX_DIR)
+        self.assertEqual(len(cached_files), 1)
+        persona_index._indexes.clear()
+        second = persona_index.get_index(self.persona_path)
+        self.assertEqual(second["passages"], first["passages"])
+        # ペルソナを書き換えると別の索引を作る
+        time.sleep(0.01)
+        with open(self.persona_path, 'w', encoding='utf-8') as f:
+            f.write(PERSONA + "V. 追記新しい章です。")
+        persona_index.get_index(self.persona_path)
+        self.assertEqual(len(os.listdir(persona_index.INDEX_DIR)), 2)
+
+    def test_phase2_prompt_uses_excerpt(self):
+        original = (research_topic.PERSONA_FILE_PATH, config.PERSONA_EXCERPT, config.RESPONSE_CACHE_ENABLED)
+        research_topic.PERSONA_FILE_PATH = self.persona_path
+        config.PERSONA_EXCERPT, config.RESPONSE_CACHE_ENABLED = True, False
+        client = FakeGeminiClient()
+        prompts = []
+        original_begin = client.behavior.begin
+        client.behavior.begin = lambda site, prompt: prompts.append(prompt) or original_begin(site, prompt)
+        gemini_client.set_client(client)
+        try:
+            research_topic.generate_character_post({"overview": "A-ナンバーズのリーダー論", "details": "", "trends": ""})
+        finally:
+            gemini_client.set_client(None)
+            research_topic.PERSONA_FILE_PATH, config.PERSONA_EXCERPT, config.RESPONSE_CACHE_ENABLED = original
+        self.assertNotIn("cache_create", client.behavior.calls)
+        self.assertIn("抜粋", prompts[0])
+        self.assertIn("A-ナンバーズを率いる", prompts[0])
+        self.assertNotIn("料理と掃除", prompts[0])
+
+    def test_sync_phase2_uses_topic_keywords_for_excerpt(self):
+        original = (research_topic.PERSONA_FILE_PATH, config.PERSONA_EXCERPT, config.RESPONSE_CACHE_ENABLED)
+        research_topic.PERSONA_FILE_PATH = self.persona_path
+        config.PERSONA_EXCERPT, config.RESPONSE_CACHE_ENABLED = True, False
+        client = FakeGeminiClient()
+        prompts = []
+        original_begin = client.behavior.begin
+        client.behavior.begin = lambda site, prompt: prompts.append(prompt) or original_begin(site, prompt)
+        gemini_client.set_client(client)
+        try:
+            research_topic.generate_character_post(
+                {"overview": "今日の話題です。", "details": "", "trends": ""},
+                topic={"theme": "料理と掃除", "keywords": ["家事", "洗濯物"]},
+            )
+        finally:
+            gemini_client.set_client(None)
+            research_topic.PERSONA_FILE_PATH, config.PERSONA_EXCERPT, config.RESPONSE_CACHE_ENABLED = original
+        self.assertIn("料理と掃除が得意", prompts[0])
+        self.assertNotIn("A-ナンバーズを率いる", prompts[0])
+
+if __name__ == '__main__':
+    unittest.main()
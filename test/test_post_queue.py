@@ -0,0 +1,120 @@
+# test/test_post_queue.py
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import post_queue, x_poster
+from benchmarks.fake_x import FakeXServer
+
+def _post(text):
+    return x_poster.post_to_x(text, bearer_token="test-token")
+
+class TestPostQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.tmp_dir.name, 'post_queue.json')
+        self.original = {
+            name: getattr(config, name)
+            for name in ["X_API_BASE_URL", "X_POST_RETRY_BASE_DELAY_SECONDS", "X_POST_MAX_ATTEMPTS", "X_POST_MIN_INTERVAL_SECONDS"]
+        }
+        config.X_POST_RETRY_BASE_DELAY_SECONDS = 0
+        config.X_POST_MIN_INTERVAL_SECONDS = 0
+
+    def tearDown(self):
+        for name, value in self.original.items():
+            setattr(config, name, value)
+        self.tmp_dir.cleanup()
+
+    def _serve(self, **kwargs) -> FakeXServer:
+        server = FakeXServer(latency=0, **kwargs).start()
+        self.addCleanup(server.stop)
+        config.X_API_BASE_URL = server.base_url
+        return server
+
+    def test_queue_survives_restart_and_posts_in_order(self):
+        for i in range(3):
+            post_queue.enqueue(self.queue_path, f"ツイート{i}")
+        # 別のプロセスで再開した場合と同じく、ファイルだけから送り出す
+        server = self._serve()
+        summary = post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)
+        self.assertEqual(summary["posted"], 3)
+        self.assertEqual([t["text"] for t in server.tweets], ["ツイート0", "ツイート1", "ツイート2"])
+        stats = post_queue.get_stats(self.queue_path)
+        self.assertEqual((stats["depth"], stats["sent"]), (0, 3))
+        self.assertEqual(stats["rate_limit"]["remaining"], 97)
+
+    def test_rate_limited_items_wait_for_reset(self):
+        server = self._serve(rate_limit=1, reset_after=1)
+        post_queue.enqueue(self.queue_path, "一件目")
+        post_queue.enqueue(self.queue_path, "二件目")
+        summary = post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)
+        # 残りが0になったら reset まで送らない（429 を受けるまで送り続けない）
+        self.assertEqual(summary["posted"], 1)
+        self.assertEqual(server.requests, 1)
+        stats = post_queue.get_stats(self.queue_path)
+        self.assertEqual((stats["depth"], stats["ready"]), (1, 1))
+        self.assertEqual(stats["rate_limit"]["remaining"], 0)
+        # 送信スレッドは reset を待ってから残りを送る
+        publisher = post_queue.Publisher(self.queue_path, _post).start()
+        deadline = time.time() + 10
+        while len(server.tweets) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        publisher.close(10)
+        self.assertEqual([t["text"] for t in server.tweets], ["一件目", "二件目"])
+
+    def test_429_defers_until_reset(self):
+        self._serve(statuses=[429])
+        post_queue.enqueue(self.queue_path, "制限中のツイート")
+        summary = post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)
+        self.assertEqual(summary, {"posted": 0, "retry": 1, "dead": 0})
+        stats = post_queue.get_stats(self.queue_path)
+        self.assertEqual((stats["depth"], stats["ready"]), (1, 0))
+        self.assertGreater(stats["rate_limit"]["reset"], time.time())
+        queue = post_queue._read(self.queue_path)
+        # レート制限は失敗回数に数えない
+        self.assertEqual(queue["items"][0]["attempts"], 0)
+
+    def test_transient_errors_are_retried(self):
+        server = self._serve(statuses=[503, 503])
+        post_queue.enqueue(self.queue_path, "再送するツイート")
+        summary = post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)
+        self.assertEqual(summary, {"posted": 1, "retry": 2, "dead": 0})
+        self.assertEqual(server.requests, 3)
+
+    def test_rejected_and_exhausted_items_are_kept_as_dead(self):
+        config.X_POST_MAX_ATTEMPTS = 2
+        self._serve(statuses=[403, 503, 503])
+        post_queue.enqueue(self.queue_path, "重複ツイート")
+        post_queue.enqueue(self.queue_path, "送れないツイート")
+        summary = post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)
+        self.assertEqual(summary, {"posted": 0, "retry": 1, "dead": 2})
+        queue = post_queue._read(self.queue_path)
+        self.assertEqual([item["text"] for item in queue["dead"]], ["重複ツイート", "送れないツイート"])
+        self.assertIn("rejected 403", queue["dead"][0]["last_error"])
+
+    def test_pacing_spreads_sends_over_the_window(self):
+        queue = post_queue._empty_queue()
+        now = time.time()
+        queue["items"] = [{"id": i, "text": f"ツイート{i}"} for i in range(10)]
+        queue["rate_limit"] = {"limit": 50, "remaining": 5, "reset": now + 100}
+        self.assertAlmostEqual(post_queue._send_interval(queue, now), 20)
+        queue["rate_limit"]["remaining"] = 20
+        self.assertEqual(post_queue._send_interval(queue, now), 0)
+
+    def test_stats_report_depth_and_age(self):
+        post_queue.enqueue(self.queue_path, "古いツイート")
+        stats = post_queue.get_stats(self.queue_path, now=time.time() + 60)
+        self.assertEqual(stats["depth"], 1)
+        self.assertGreaterEqual(stats["oldest_age_seconds"], 60)
+
+if __name__ == '__main__':
+    unittest.main()
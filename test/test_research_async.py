@@ -0,0 +1,100 @@
+# test/test_research_async.py
+import os
+import sys
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import gemini_client, research_topic
+
+PHASE1_TEXT = '```json\n{"overview": "概要", "details": "詳細", "trends": "動向"}\n```'
+PHASE2_TEXT = '```json\n{"tweet": "丁寧なツイートです。", "thought_process": {}}\n```'
+
+class _FakeAsyncChat:
+    def __init__(self, owner, config):
+        self.owner = owner
+        self.is_research = bool(config and 'tools' in config)
+
+    async def send_message(self, prompt):
+        self.owner.active += 1
+        self.owner.max_active = max(self.owner.max_active, self.owner.active)
+        try:
+            await asyncio.sleep(self.owner.delay)
+        finally:
+            self.owner.active -= 1
+        return SimpleNamespace(text=PHASE1_TEXT if self.is_research else PHASE2_TEXT)
+
+    async def send_message_stream(self, prompt):
+        owner = self.owner
+        async def _chunks():
+            for i, chunk in enumerate(owner.stream_chunks):
+                owner.chunks_sent = i + 1
+                yield SimpleNamespace(text=chunk)
+        return _chunks()
+
+class _FakeClient:
+    """chats / aio.chats だけを持つ偽の genai.Client。"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.chunks_sent = 0
+        self.stream_chunks = ['```json\n{"tweet": "丁寧な', 'ツイートです。", "thought_', 'process": {"reasoning": "理由"}}\n```']
+        chats = SimpleNamespace(create=lambda model, config=None: _FakeAsyncChat(self, config))
+        self.aio = SimpleNamespace(chats=chats)
+
+class TestResearchAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.original_cache = (config.PERSONA_CONTEXT_CACHE, config.RESPONSE_CACHE_ENABLED)
+        config.PERSONA_CONTEXT_CACHE = False
+        config.RESPONSE_CACHE_ENABLED = False
+
+    def tearDown(self):
+        config.PERSONA_CONTEXT_CACHE, config.RESPONSE_CACHE_ENABLED = self.original_cache
+        gemini_client.set_client(None)
+
+    def test_sync_wrapper_returns_rich_content(self):
+        gemini_client.set_client(_FakeClient())
+        result = research_topic.generate_rich_content_from_topic({"theme": "テーマ", "keywords": ["a"]})
+        self.assertEqual(result["research_summary"]["overview"], "概要")
+        self.assertEqual(result["character_post"]["tweet"], "丁寧なツイートです。")
+
+    def test_concurrency_limit_is_respected(self):
+        fake = _FakeClient(delay=0.02)
+        gemini_client.set_client(fake)
+        topics = [{"theme": f"テーマ{i}", "keywords": []} for i in range(6)]
+        results = asyncio.run(research_topic.agenerate_rich_contents(topics, concurrency=2))
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(isinstance(r, dict) for r in results))
+        self.assertEqual(fake.max_active, 2)
+
+    def test_phase_timeout_raises_connection_error(self):
+        gemini_client.set_client(_FakeClient(delay=1.0))
+        with self.assertRaises(ConnectionError):
+            asyncio.run(research_topic.aresearch_topic_phase1({"theme": "テーマ"}, timeout=0.05))
+
+    def test_streaming_delivers_tweet_before_thought_process(self):
+        fake = _FakeClient()
+        gemini_client.set_client(fake)
+        delivered = []
+        result = research_topic.generate_rich_content_from_topic(
+            {"theme": "テーマ"},
+            on_tweet=lambda tweet: delivered.append((tweet, fake.chunks_sent, threading.current_thread().name))
+        )
+        # ツイートは2チャンク目を受け取った時点（思考過程の完了前）で渡される
+        self.assertEqual([d[:2] for d in delivered], [("丁寧なツイートです。", 2)])
+        # 投稿の開始（ファイルI/O）は共有のイベントループのスレッドでは行わない
+        self.assertNotEqual(delivered[0][2], "gemini-loop")
+        self.assertEqual(result["character_post"]["thought_process"], {"reasoning": "理由"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# test/test_response_cache.py
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import response_cache
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.object(response_cache, 'CACHE_DB_PATH', os.path.join(self.tmp_dir.name, 'cache.sqlite3')),
+            patch.object(config, 'RESPONSE_CACHE_ENABLED', True),
+            patch.object(config, 'RESPONSE_CACHE_TTLS', {"short": 60, "long": 3600}),
+        ]
+        for p in self.patches:
+            p.start()
+        response_cache.reset_stats()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp_dir.cleanup()
+
+    def test_hit_and_miss_statistics(self):
+        self.assertIsNone(response_cache.get("long", "model", "prompt"))
+        response_cache.put("long", "model", "prompt", "応答")
+        self.assertEqual(response_cache.get("long", "model", "prompt"), "応答")
+        # モデル名や追加のキー材料が違えば別のエントリになる
+        self.assertIsNone(response_cache.get("long", "other-model", "prompt"))
+        self.assertIsNone(response_cache.get("long", "model", "prompt", extra="persona-v2"))
+        self.assertEqual(response_cache.get_stats(), {"long": {"hits": 1, "misses": 3}})
+
+    def test_entries_expire_after_ttl(self):
+        with patch('src.response_cache.time.time', return_value=1000.0):
+            response_cache.put("short", "model", "prompt", "応答")
+        with patch('src.response_cache.time.time', return_value=1059.0):
+            self.assertEqual(response_cache.get("short", "model", "prompt"), "応答")
+        with patch('src.response_cache.time.time', return_value=1061.0):
+            self.assertIsNone(response_cache.get("short", "model", "prompt"))
+
+    def test_lru_eviction_keeps_recently_used(self):
+        with patch.object(config, 'RESPONSE_CACHE_MAX_BYTES', 25):
+            with patch('src.response_cache.time.time', return_value=1.0):
+                response_cache.put("long", "model", "a", "x" * 10)
+            with patch('src.response_cache.time.time', return_value=2.0):
+                response_cache.put("long", "model", "b", "y" * 10)
+            with patch('src.response_cache.time.time', return_value=3.0):
+                response_cache.get("long", "model", "a")
+            with patch('src.response_cache.time.time', return_value=4.0):
+                response_cache.put("long", "model", "c", "z" * 10)
+                self.assertIsNotNone(response_cache.get("long", "model", "a"))
+                self.assertIsNone(response_cache.get("long", "model", "b"))
+                self.assertIsNotNone(response_cache.get("long", "model", "c"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# test/test_retry.py
+import os
+import sys
+import time
+import unittest
+
+import httpx
+from google.genai import errors
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import retry, gemini_client, research_topic
+from benchmarks.fake_gemini import FakeGeminiClient, FakeGeminiBehavior
+
+def _api_error(code: int, retry_after: str | None = None, retry_delay: str | None = None):
+    details = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay}] if retry_delay else []
+    headers = {"retry-after": retry_after} if retry_after else {}
+    return errors.APIError(
+        code,
+        {"error": {"code": code, "message": "error", "status": "UNAVAILABLE", "details": details}},
+        response=httpx.Response(code, headers=headers),
+    )
+
+class _Flaky:
+    """指定した例外を順に送出し、尽きたら "ok" を返す関数。"""
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return "ok"
+
+class TestRetry(unittest.TestCase):
+
+    SETTINGS = ("GEMINI_RETRY_MAX_ATTEMPTS", "GEMINI_RETRY_BASE_DELAY_SECONDS", "GEMINI_RETRY_MAX_DELAY_SECONDS",
+                "GEMINI_RETRY_BUDGET_SECONDS", "GEMINI_CIRCUIT_FAILURE_THRESHOLD", "GEMINI_CIRCUIT_COOLDOWN_SECONDS")
+
+    def setUp(self):
+        self.original = {name: getattr(config, name) for name in self.SETTINGS}
+        config.GEMINI_RETRY_MAX_ATTEMPTS = 4
+        config.GEMINI_RETRY_BASE_DELAY_SECONDS = 0.001
+        config.GEMINI_RETRY_MAX_DELAY_SECONDS = 5
+        config.GEMINI_RETRY_BUDGET_SECONDS = 10
+        config.GEMINI_CIRCUIT_FAILURE_THRESHOLD = 5
+        config.GEMINI_CIRCUIT_COOLDOWN_SECONDS = 60
+        retry.reset()
+
+    def tearDown(self):
+        for name, value in self.original.items():
+            setattr(config, name, value)
+        retry.reset()
+        gemini_client.set_client(None)
+
+    def test_retries_transient_errors_until_success(self):
+        fn = _Flaky([_api_error(503), _api_error(429), TimeoutError()])
+        self.assertEqual(retry.call(fn), "ok")
+        self.assertEqual(fn.calls, 4)
+        self.assertEqual(retry.get_state()["consecutive_failures"], 0)
+
+    def test_client_errors_are_not_retried(self):
+        fn = _Flaky([_api_error(400)])
+        with self.assertRaises(errors.APIError):
+            retry.call(fn)
+        self.assertEqual(fn.calls, 1)
+
+    def test_server_hints_are_honored(self):
+        self.assertEqual(retry.backoff_delay(1, _api_error(429, retry_after="2")), 2.0)
+        self.assertEqual(retry.backoff_delay(1, _api_error(429, retry_delay="3s")), 3.0)
+        # ヒントも上限で頭打ちにする
+        self.assertEqual(retry.backoff_delay(1, _api_error(429, retry_after="120")), 5)
+
+    def test_budget_stops_retries(self):
+        config.GEMINI_RETRY_BUDGET_SECONDS = 1
+        fn = _Flaky([_api_error(429, retry_after="2"), _api_error(429)])
+        started = time.monotonic()
+        with self.assertRaises(errors.APIError):
+            retry.call(fn)
+        self.assertEqual(fn.calls, 1)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        config.GEMINI_RETRY_MAX_ATTEMPTS = 1
+        config.GEMINI_CIRCUIT_FAILURE_THRESHOLD = 2
+        config.GEMINI_CIRCUIT_COOLDOWN_SECONDS = 0.05
+        for _ in range(2):
+            with self.assertRaises(errors.APIError):
+                retry.call(_Flaky([_api_error(503)]))
+        fn = _Flaky([])
+        with self.assertRaises(retry.CircuitOpenError):
+            retry.call(fn)
+        self.assertEqual(fn.calls, 0)
+        time.sleep(0.06)
+        self.assertEqual(retry.call(fn), "ok")
+        self.assertIsNone(retry.get_state()["opened_at"])
+
+    def test_research_pipeline_survives_injected_failures(self):
+        original = (config.PERSONA_CONTEXT_CACHE, config.RESPONSE_CACHE_ENABLED)
+        config.PERSONA_CONTEXT_CACHE = False
+        config.RESPONSE_CACHE_ENABLED = False
+        try:
+            behavior = FakeGeminiBehavior(base_latency=0, per_token_latency=0, failures=[_api_error(503), _api_error(429)])
+            gemini_client.set_client(FakeGeminiClient(behavior))
+            result = research_topic.generate_rich_content_from_topic({"theme": "テーマ", "keywords": []})
+        finally:
+            config.PERSONA_CONTEXT_CACHE, config.RESPONSE_CACHE_ENABLED = original
+        self.assertIn("tweet", result["character_post"])
+        self.assertEqual(behavior.calls["research_phase1"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# test/test_startup_profile.py
+import os
+import sys
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src import startup_profile
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   json.decoder
+import time:       300 |        420 | json
+import time:      2000 |       2000 |     google.genai.types
+import time:       500 |       2500 |   google.genai
+"""
+
+class TestStartupProfile(unittest.TestCase):
+
+    def test_parse_and_group(self):
+        timings = startup_profile.parse_importtime(SAMPLE)
+        self.assertEqual(timings["json"], (300, 420))
+        self.assertEqual(startup_profile.group_by_package(timings), {"json": 420, "google": 2500})
+        self.assertEqual(startup_profile.loaded_deferred_modules(timings), ["google.genai"])
+
+    def test_main_does_not_import_heavy_libraries_at_startup(self):
+        timings = startup_profile.measure_imports("src.main")
+        deferred = startup_profile.loaded_deferred_modules(timings)
+        # .env がある環境では config が python-dotenv を読み込むため対象外にする
+        if os.path.exists(os.path.join(project_root, '.env')):
+            deferred = [m for m in deferred if m != "dotenv"]
+        self.assertEqual(deferred, [])
+
+if __name__ == '__main__':
+    unittest.main()
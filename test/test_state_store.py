@@ -0,0 +1,101 @@
+# test/test_state_store.py
+import os
+import sys
+import json
+import stat
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+from src import state_store
+
+def _append_many(path: str, worker_id: int, count: int):
+    for i in range(count):
+        state_store.append_knowledge_entry(path, {"worker": worker_id, "i": i})
+
+class TestStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'recent_knowledge.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_atomic_write_leaves_no_temp_files(self):
+        state_store.atomic_write_json(self.path, {"knowledge_entries": [1, 2]})
+        self.assertEqual(state_store.read_json(self.path), {"knowledge_entries": [1, 2]})
+        leftovers = [n for n in os.listdir(self.tmp_dir.name) if n.endswith('.tmp')]
+        self.assertEqual(leftovers, [])
+
+    @unittest.skipUnless(os.name == 'posix', "POSIX の権限ビットが必要です")
+    def test_atomic_write_keeps_file_permissions(self):
+        mode = lambda path: stat.S_IMODE(os.stat(path).st_mode)
+        # 新しいファイルは umask を適用した 0666（mkstemp の 0600 のままにしない）
+        state_store.atomic_write_json(self.path, {"a": 1})
+        self.assertEqual(mode(self.path), 0o666 & ~state_store._UMASK)
+        # 既存ファイルは書き直しても権限を保つ
+        os.chmod(self.path, 0o664)
+        state_store.atomic_write_json(self.path, {"a": 2})
+        self.assertEqual(mode(self.path), 0o664)
+
+    def test_corrupt_json_is_not_treated_as_empty(self):
+        """壊れたJSONは空扱いされず、上書きもされないこと"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"knowledge_entries": [{"theme": "途中')
+        with self.assertRaises(ValueError):
+            state_store.append_knowledge_entry(self.path, {"theme": "新規"})
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith('{"knowledge_entries": [{"theme"'))
+
+    def test_concurrent_appends_are_not_lost(self):
+        """複数プロセスからの同時追記で件数が失われないこと"""
+        workers, per_worker = 4, 25
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_append_many, self.path, w, per_worker) for w in range(workers)]
+            for future in futures:
+                future.result()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)["knowledge_entries"]
+        self.assertEqual(len(entries), workers * per_worker)
+
+    def test_streaming_reader_matches_json_load(self):
+        entries = [{"theme": f"テーマ{i}", "n": i * 1.5, "tags": ["a", {"b": None}], "text": "あ" * 500} for i in range(50)]
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"version": {"x": [1, 2]}, "knowledge_entries": entries, "after": True}, f, ensure_ascii=False, indent=2)
+        # 小さいチャンクで読んでも、マルチバイト文字や数値の途中で切れずに同じ結果になる
+        self.assertEqual(list(state_store.iter_json_array(self.path, "knowledge_entries", chunk_size=7)), entries)
+        self.assertEqual(list(state_store.iter_knowledge_entries(os.path.join(self.tmp_dir.name, 'missing.json'))), [])
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"knowledge_entries": [{"theme": "途中')
+        with self.assertRaises(ValueError):
+            list(state_store.iter_knowledge_entries(self.path))
+
+    def test_count_and_last_entry_come_from_the_sidecar(self):
+        for i in range(3):
+            state_store.append_knowledge_entry(self.path, {"i": i})
+        self.assertEqual(state_store.count_knowledge_entries(self.path), 3)
+        self.assertEqual(state_store.last_knowledge_entry(self.path), {"i": 2})
+        state_store.update_knowledge_entries(self.path, lambda entries: entries[2:])
+        self.assertEqual(state_store.count_knowledge_entries(self.path), 1)
+        # サイドカーが最新なら本体は解析しない（同じサイズ・更新時刻のまま中身を壊しても件数が読める）
+        size, mtime_ns = state_store.read_json(state_store.knowledge_meta_path(self.path))["stamp"]
+        with open(self.path, 'r+b') as f:
+            f.write(b' ' * size)
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(state_store.count_knowledge_entries(self.path), 1)
+
+    def test_sidecar_is_rebuilt_when_file_changes_elsewhere(self):
+        state_store.append_knowledge_entry(self.path, {"i": 0})
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"knowledge_entries": [{"i": 0}, {"i": 1}, {"i": 2}, {"i": 3}]}, f)
+        self.assertEqual(state_store.count_knowledge_entries(self.path), 4)
+        self.assertEqual(state_store.last_knowledge_entry(self.path), {"i": 3})
+        self.assertEqual(state_store.count_knowledge_entries(os.path.join(self.tmp_dir.name, 'missing.json')), 0)
+
+if __name__ == '__main__':
+    unittest.main()
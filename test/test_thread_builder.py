@@ -0,0 +1,96 @@
+# test/test_thread_builder.py
+import os
+import sys
+import tempfile
+import unittest
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import thread_builder, post_queue, x_poster
+from benchmarks.fake_x import FakeXServer
+
+SUMMARY = {
+    "overview": "量子コンピュータは量子ビットを使って計算する機械です。" * 6,
+    "details": "重ね合わせともつれを利用します。特定の問題では古典計算機より速く解けると期待されています。" * 4,
+    "trends": "",
+}
+
+def _post(text, **kwargs):
+    return x_poster.post_to_x(text, bearer_token="test-token", **kwargs)
+
+class TestThreadBuilder(unittest.TestCase):
+
+    def test_weighted_length_counts_cjk_double(self):
+        self.assertEqual(thread_builder.weighted_length("abc"), 3)
+        self.assertEqual(thread_builder.weighted_length("あいう"), 6)
+        self.assertEqual(thread_builder.weighted_length("見て https://example.com/a/very/long/path"), 4 + 1 + 23)
+        self.assertTrue(thread_builder.fits("あ" * 140))
+        self.assertFalse(thread_builder.fits("あ" * 141))
+
+    def test_split_keeps_sentences_whole(self):
+        text = "一文目です。" * 30
+        posts = thread_builder.split_text(text, 100)
+        self.assertEqual("".join(posts), text)
+        for post in posts:
+            self.assertLessEqual(thread_builder.weighted_length(post), 100)
+            self.assertTrue(post.endswith("。"))
+
+    def test_long_sentence_is_split_at_commas(self):
+        posts = thread_builder.split_text("長い、" * 40 + "文。", 50)
+        self.assertTrue(all(thread_builder.weighted_length(p) <= 50 for p in posts))
+        self.assertTrue(posts[0].endswith("、"))
+
+    def test_build_thread_covers_research_within_limit(self):
+        posts = thread_builder.build_thread("量子の世界は面白い！", SUMMARY, max_posts=10)
+        self.assertGreater(len(posts), 2)
+        self.assertTrue(posts[0].startswith("量子の世界は面白い！"))
+        self.assertTrue(posts[0].endswith(f"(1/{len(posts)})"))
+        self.assertTrue(any(p.startswith("【詳細】") for p in posts))
+        self.assertTrue(all(thread_builder.fits(p) for p in posts))
+        # 調査レポートの文が1つも欠けない
+        joined = "".join(posts)
+        for sentence in ["特定の問題では古典計算機より速く解けると期待されています。"]:
+            self.assertIn(sentence, joined)
+        self.assertEqual(len(thread_builder.build_thread("短いツイート", SUMMARY, max_posts=2)), 2)
+
+    def test_short_tweet_without_summary_is_unchanged(self):
+        self.assertEqual(thread_builder.build_thread("短いツイート"), ["短いツイート"])
+
+
+class TestThreadPosting(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.tmp_dir.name, 'post_queue.json')
+        self.original_base_url = config.X_API_BASE_URL
+        self.server = FakeXServer(latency=0, rate_limit=1).start()
+        config.X_API_BASE_URL = self.server.base_url
+
+    def tearDown(self):
+        self.server.stop()
+        config.X_API_BASE_URL = self.original_base_url
+        self.tmp_dir.cleanup()
+
+    def test_thread_is_chained_and_resumes_after_interruption(self):
+        post_queue.enqueue(self.queue_path, "1件目", replies=["2件目", "3件目"])
+        # レート制限で1件目の後に止まる
+        self.assertEqual(post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)["posted"], 1)
+        stats = post_queue.get_stats(self.queue_path)
+        self.assertEqual((stats["depth"], stats["pending_posts"]), (1, 2))
+        # 次の実行（制限の解除後）で続きから送る
+        self.server.rate_limit, self.server.window_count = 100, 0
+        post_queue._update(self.queue_path, lambda queue: queue.update(rate_limit=None))
+        self.assertEqual(post_queue.publish_pending(self.queue_path, timeout=10, poster=_post)["posted"], 2)
+        tweets = self.server.tweets
+        self.assertEqual([t["text"] for t in tweets], ["1件目", "2件目", "3件目"])
+        self.assertNotIn("reply", tweets[0])
+        self.assertEqual(tweets[1]["reply"], {"in_reply_to_tweet_id": "1001"})
+        self.assertEqual(tweets[2]["reply"], {"in_reply_to_tweet_id": "1002"})
+        self.assertEqual(post_queue.get_stats(self.queue_path)["depth"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
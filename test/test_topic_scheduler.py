@@ -0,0 +1,119 @@
+# test/test_topic_scheduler.py
+import os
+import sys
+import json
+import tempfile
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import topic_scheduler, post_queue, x_poster
+from src import main as bot_main
+from benchmarks.fake_x import FakeXServer
+
+CLUSTERS = [{"cluster_id": i, "theme": f"テーマ{i}", "summary": "", "keywords": []} for i in range(1, 6)]
+
+class TestTopicScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp_dir.name, 'topic_schedule.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _ids(self, topics):
+        return [t["cluster_id"] for t in topics]
+
+    def test_lru_visits_every_cluster_before_repeating(self):
+        first = [topic_scheduler.select_topic(self.state_path, CLUSTERS, "lru")["cluster_id"] for _ in range(5)]
+        self.assertEqual(sorted(first), [1, 2, 3, 4, 5])
+        # 実行をまたいでも、最も古く選ばれたものから再開する
+        self.assertEqual(self._ids(topic_scheduler.select_topics(self.state_path, CLUSTERS, 2, "lru")), first[:2])
+
+    def test_new_clusters_are_picked_first(self):
+        topic_scheduler.select_topics(self.state_path, CLUSTERS, 5, "lru")
+        clusters = CLUSTERS + [{"cluster_id": 6, "theme": "新テーマ"}]
+        self.assertEqual(topic_scheduler.select_topic(self.state_path, clusters, "lru")["cluster_id"], 6)
+
+    def test_weighted_round_robin_follows_weights(self):
+        clusters = [{"cluster_id": 1, "weight": 3}, {"cluster_id": 2, "weight": 1}]
+        picks = self._ids(topic_scheduler.select_topics(self.state_path, clusters, 8, "weighted_round_robin"))
+        self.assertEqual(Counter(picks), {1: 6, 2: 2})
+        # 重みの大きいクラスターも連続しすぎないよう分散される
+        self.assertNotEqual(picks[:4], [1, 1, 1, 1])
+
+    def test_bandit_prefers_rewarded_clusters(self):
+        topic_scheduler.select_topics(self.state_path, CLUSTERS, 5, "bandit")
+        for cluster in CLUSTERS:
+            topic_scheduler.record_reward(self.state_path, cluster["cluster_id"], 10.0 if cluster["cluster_id"] == 3 else 0.0)
+        picks = self._ids(topic_scheduler.select_topics(self.state_path, CLUSTERS, 10, "bandit"))
+        self.assertEqual(Counter(picks).most_common(1)[0][0], 3)
+
+    def test_state_is_keyed_by_cluster_id(self):
+        topic_scheduler.select_topics(self.state_path, CLUSTERS, 3, "lru")
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.assertEqual(set(state["clusters"]), {"1", "2", "3", "4", "5"})
+        self.assertEqual(sum(s["count"] for s in state["clusters"].values()), 3)
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            topic_scheduler.select_topic(self.state_path, CLUSTERS, "unknown")
+
+
+class TestEngagementRewards(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = FakeXServer(latency=0).start()
+        self.paths = {
+            "TOPIC_SCHEDULE_PATH": os.path.join(self.tmp_dir.name, 'topic_schedule.json'),
+            "POST_QUEUE_PATH": os.path.join(self.tmp_dir.name, 'post_queue.json'),
+        }
+        self.patches = [
+            patch.multiple(bot_main, **self.paths),
+            patch.multiple(config, X_API_BASE_URL=self.server.base_url, TOPIC_SCHEDULER="bandit", TOPIC_REWARD_MIN_AGE_SECONDS=0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def _post(self, text, **kwargs):
+        return x_poster.post_to_x(text, bearer_token="test-token", **kwargs)
+
+    def test_engagement_of_posted_tweets_becomes_reward(self):
+        queue_path = self.paths["POST_QUEUE_PATH"]
+        for cluster in CLUSTERS:
+            post_queue.enqueue(queue_path, f"ツイート{cluster['cluster_id']}", bot_main.topic_meta(cluster))
+        post_queue.publish_pending(queue_path, timeout=10, poster=self._post)
+        topic_scheduler.select_topics(self.paths["TOPIC_SCHEDULE_PATH"], CLUSTERS, 5, "bandit")
+        # 3件目（cluster_id 3）のツイートだけ反応が多い
+        self.server.metrics["1003"] = {"like_count": 40, "retweet_count": 10, "reply_count": 2, "quote_count": 1}
+        with patch.object(x_poster, 'get_signer', return_value=None):
+            bot_main.collect_engagement_rewards()
+            # 記録済みの投稿は二度数えない
+            self.assertEqual(post_queue.posted_awaiting_metrics(queue_path, 0), [])
+        with open(self.paths["TOPIC_SCHEDULE_PATH"], 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.assertEqual(state["clusters"]["3"]["reward_count"], 1)
+        self.assertGreater(state["clusters"]["3"]["reward_sum"], state["clusters"]["1"]["reward_sum"])
+        picks = self._ids(topic_scheduler.select_topics(self.paths["TOPIC_SCHEDULE_PATH"], CLUSTERS, 10, "bandit"))
+        self.assertEqual(Counter(picks).most_common(1)[0][0], 3)
+
+    def _ids(self, topics):
+        return [t["cluster_id"] for t in topics]
+
+if __name__ == '__main__':
+    unittest.main()
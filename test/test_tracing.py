@@ -0,0 +1,99 @@
+# test/test_tracing.py
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from concurrent.futures import ThreadPoolExecutor
+from src import tracing, state_store, gemini_client
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self.tmp_dir.name, 'metrics.jsonl')
+        self.original = (config.TRACE_ENABLED, config.TRACE_METRICS_FILE)
+        config.TRACE_ENABLED = True
+        config.TRACE_METRICS_FILE = self.metrics_file
+        tracing.reset()
+
+    def tearDown(self):
+        config.TRACE_ENABLED, config.TRACE_METRICS_FILE = self.original
+        tracing.reset()
+        self.tmp_dir.cleanup()
+
+    def test_span_records_usage_bytes_and_writes_jsonl(self):
+        path = os.path.join(self.tmp_dir.name, 'state.json')
+        response = SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=120, candidates_token_count=30))
+        with tracing.span("cycle.test"):
+            with tracing.span("stage", theme="テーマ"):
+                tracing.record_usage(response)
+                state_store.atomic_write_json(path, {"a": 1})
+                state_store.read_json(path)
+                tracing.record_retry()
+        with open(self.metrics_file, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["name"] for r in records], ["stage", "cycle.test"])
+        stage = records[0]
+        self.assertEqual(stage["parent"], "cycle.test")
+        self.assertEqual((stage["prompt_tokens"], stage["response_tokens"]), (120, 30))
+        self.assertEqual(stage["bytes_written"], os.path.getsize(path))
+        self.assertEqual(stage["bytes_read"], os.path.getsize(path))
+        self.assertEqual(stage["retries"], 1)
+        self.assertEqual(stage["attrs"], {"theme": "テーマ"})
+        # 内側の段階で記録した値は外側の段階には加算されない
+        self.assertEqual(records[1]["bytes_written"], 0)
+
+    def test_error_is_recorded_and_reraised(self):
+        with self.assertRaises(ConnectionError):
+            with tracing.span("failing"):
+                raise ConnectionError("timeout")
+        summary = tracing.summarize()
+        self.assertEqual(summary["failing"]["errors"], 1)
+
+    def test_concurrent_tasks_do_not_share_spans(self):
+        async def _stage(tokens: int):
+            with tracing.span("phase"):
+                await asyncio.sleep(0.01)
+                tracing.record_usage(SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=tokens)))
+
+        async def _run():
+            await asyncio.gather(_stage(1), _stage(10), _stage(100))
+
+        asyncio.run(_run())
+        tokens = sorted(s.prompt_tokens for s in tracing.get_spans())
+        self.assertEqual(tokens, [1, 10, 100])
+
+    def test_thread_pool_and_background_loop_keep_the_parent_span(self):
+        def _map(index: int):
+            with tracing.span("stage.map"):
+                tracing.record_bytes_read(index)
+
+        async def _call():
+            with tracing.span("gemini.call"):
+                tracing.record_bytes_read(7)
+
+        with tracing.span("stage"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(tracing.bind(_map), [1, 2, 3]))
+                # 作業スレッドで段階の外に記録したバイト数は、呼び出し元の段階に加算される
+                executor.submit(tracing.bind(tracing.record_bytes_read), 5).result()
+            gemini_client.run_sync(_call())
+        spans = {s.name: s for s in tracing.get_spans()}
+        self.assertEqual(spans["stage.map"].parent, "stage")
+        self.assertEqual(spans["gemini.call"].parent, "stage")
+        self.assertEqual(spans["gemini.call"].bytes_read, 7)
+        self.assertEqual(spans["stage"].bytes_read, 5)
+        self.assertEqual(sorted(s.bytes_read for s in tracing.get_spans() if s.name == "stage.map"), [1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
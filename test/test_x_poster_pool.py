@@ -0,0 +1,64 @@
+# test/test_x_poster_pool.py
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# プロジェクトのルートディレクトリをシステムパスに追加
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import config
+from src import x_poster
+from benchmarks.fake_x import FakeXServer
+
+class TestXPosterPool(unittest.TestCase):
+
+    def setUp(self):
+        self.original_base_url = config.X_API_BASE_URL
+        self.server = FakeXServer(latency=0).start()
+        config.X_API_BASE_URL = self.server.base_url
+        x_poster.reset_session()
+        x_poster.reset_stats()
+
+    def tearDown(self):
+        x_poster.reset_session()
+        self.server.stop()
+        config.X_API_BASE_URL = self.original_base_url
+
+    def test_posts_reuse_one_connection(self):
+        for i in range(3):
+            self.assertTrue(x_poster.post_to_x(f"ツイート{i}", bearer_token="test-token")["ok"])
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(x_poster.get_stats(), {"sessions_created": 1, "connections_opened": 1, "requests": 3})
+
+    def test_post_many_stops_sending_after_rate_limit(self):
+        self.server.rate_limit = 2
+        results = x_poster.post_many(["一", "二", "三", "四"], bearer_token="test-token")
+        self.assertEqual([r["status"] for r in results], ["posted", "posted", "rate_limited", "rate_limited"])
+        self.assertEqual(results[0]["tweet_id"], "1001")
+        # 429 を受けた後は送らない
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+
+    @patch.multiple(x_poster, api_key="key", api_secret="secret", access_token="token", access_token_secret="token-secret")
+    def test_signer_is_reused(self):
+        self.assertIs(x_poster.get_signer(), x_poster.get_signer())
+        self.assertTrue(x_poster.post_to_x("署名付きのツイート")["ok"])
+        self.assertEqual(x_poster.get_stats()["sessions_created"], 1)
+
+    def test_hung_endpoint_times_out(self):
+        original = config.X_POST_TIMEOUT_SECONDS
+        config.X_POST_TIMEOUT_SECONDS = 0.1
+        self.server.latency = 1
+        try:
+            result = x_poster.post_to_x("応答の無いツイート", bearer_token="test-token")
+        finally:
+            config.X_POST_TIMEOUT_SECONDS = original
+        self.assertEqual(result["status"], "error")
+        self.assertTrue(result["retryable"])
+
+if __name__ == '__main__':
+    unittest.main()